@@ -1,7 +1,24 @@
 import sys
 from unittest.mock import MagicMock
 
+import pytest
+
 # Mock external/side-effectful modules before any test imports lambda_function
 # or shared.config, to prevent module-level S3 client initialisation.
 sys.modules.setdefault("shared.aws", MagicMock())
 sys.modules.setdefault("dotenv", MagicMock())
+
+
+@pytest.fixture(autouse=True)
+def _clear_module_caches():
+    """Module-level caches must not leak state between tests."""
+    from shared.hedging import _clear_hedging_state
+    from shared.presigned_urls import _clear_presigned_url_cache
+    from shared.snapshot_cache import _clear_snapshot_cache
+    from shared.sigv4 import _clear_signing_keys
+
+    _clear_presigned_url_cache()
+    _clear_snapshot_cache()
+    _clear_hedging_state()
+    _clear_signing_keys()
+    yield
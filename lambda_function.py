@@ -1,13 +1,62 @@
+import gzip
 import json
 import os
 import re
-from datetime import date, timedelta
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
 
-from shared.http_utils import build_response
-from shared.config import CINEMAS, ROUTE_TYPES
-from routes.get_listings import get_listings
+from shared.http_utils import (
+    build_response,
+    build_raw_response,
+    build_streamed_response,
+    build_redirect_response,
+    cache_headers,
+    canonical_query_string,
+    accepts_gzip,
+)
+from shared.config import (
+    CINEMAS,
+    ROUTE_TYPES,
+    CANONICAL_QUERY_REDIRECT,
+    MAX_DATE_RANGE_DAYS,
+    LISTINGS_TIMEZONE,
+    UPCOMING_DEFAULT_HOURS,
+    UPCOMING_MAX_HOURS,
+    SEARCH_DEFAULT_LIMIT,
+    SEARCH_MAX_LIMIT,
+    IMAGE_SIZE_VARIANTS,
+    PREFETCH_ON_INIT,
+    PREFETCH_CINEMAS,
+)
+from shared.data_types import DateRange
+from shared.listings_delta import _parse_listings_version
+from shared.materialized import MaterializedResponse, _get_materialized_response
+from shared.listings_utils import (
+    RESPONSE_FORMATS,
+    _parse_fields_param,
+    _get_cinemas_raw_listings,
+    _is_error_entry,
+)
+from shared.snapshot_cache import _wait_for_background_refreshes
+from shared.deadline import request_deadline
+from shared.memory_profile import memory_profile, _memory_checkpoint
+from shared.profiling import sampled_profile
+from routes.get_listings import (
+    get_listings,
+    get_listings_changes,
+    get_listings_version,
+)
 from routes.get_image_listings import get_image_listings
-from routes.get_pan_cinema_listings import handle_pan_cinema_listings_route
+from routes.get_upcoming_showings import get_upcoming_showings
+from routes.search_listings import search_listings
+from routes.search_listings.utils import _get_search_index
+from routes.get_image_listings.utils import _get_cinemas_good_images
+from routes.get_pan_cinema_listings import (
+    get_pan_cinema_listings,
+    get_pan_cinema_film_ids,
+    handle_pan_cinema_listings_route,
+)
 
 
 def _as_list(value):
@@ -18,10 +67,268 @@ def _as_list(value):
     return []
 
 
+def _query_param(qs_single: dict, qs_multi: dict, name: str):
+    value = qs_multi.get(name, None)
+    if value is None:
+        value = qs_single.get(name)
+    return value
+
+
+def _canonical_list(values: list[str]) -> list[str]:
+    """Sorted and de-duplicated, so equivalent queries share one cache key."""
+    return sorted(set(values))
+
+
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _is_iso_date(value) -> bool:
+    return isinstance(value, str) and _ISO_DATE_RE.match(value) is not None
+
+
+def _listings_today(now: datetime | None = None) -> date:
+    """Today's date in LISTINGS_TIMEZONE (the host runs in UTC)."""
+    if now is None:
+        now = datetime.now(ZoneInfo(LISTINGS_TIMEZONE))
+    return now.astimezone(ZoneInfo(LISTINGS_TIMEZONE)).date()
+
+
+def _parse_date_range(qs_single: dict) -> DateRange | None:
+    """
+    Resolve `from`/`to`/`days=N` into an inclusive DateRange. `from` defaults
+    to today in LISTINGS_TIMEZONE; `days` counts from `from` and can't be
+    combined with `to`.
+
+    Returns:
+        DateRange | None: None if no range param was given
+
+    Raises:
+        ValueError: malformed, reversed or over-long range
+        OverflowError: range runs past the last representable date
+    """
+    raw_from = (qs_single.get("from") or "").strip()
+    raw_to = (qs_single.get("to") or "").strip()
+    raw_days = (qs_single.get("days") or "").strip()
+    if not (raw_from or raw_to or raw_days):
+        return None
+
+    if raw_to and raw_days:
+        raise ValueError("'to' and 'days' can't be combined")
+    for value in (raw_from, raw_to):
+        if value and not _is_iso_date(value):
+            raise ValueError(f"Invalid date: {value!r}")
+
+    start = date.fromisoformat(raw_from) if raw_from else _listings_today()
+    if raw_days:
+        days = int(raw_days)
+        if days < 1:
+            raise ValueError("'days' must be at least 1")
+        if days > MAX_DATE_RANGE_DAYS:
+            raise ValueError(f"Date range longer than {MAX_DATE_RANGE_DAYS} days")
+        end = start + timedelta(days=days - 1)
+    elif raw_to:
+        end = date.fromisoformat(raw_to)
+    else:
+        end = start
+
+    if end < start:
+        raise ValueError("'to' is before 'from'")
+    if (end - start).days + 1 > MAX_DATE_RANGE_DAYS:
+        raise ValueError(f"Date range longer than {MAX_DATE_RANGE_DAYS} days")
+
+    return DateRange(start.isoformat(), end.isoformat())
+
+
+_SHOWING_START_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+def _parse_showing_window(qs_single: dict, now: datetime | None = None) -> tuple[str, str]:
+    """
+    Resolve `start` (YYYY-MM-DDTHH:MM, default now in LISTINGS_TIMEZONE) and
+    `hours` into the [start, end) window for upcoming_showings.
+
+    Raises:
+        ValueError: malformed start, hours outside 1..UPCOMING_MAX_HOURS, or a
+            window running past the last representable datetime
+    """
+    raw_start = (qs_single.get("start") or "").strip()
+    raw_hours = (qs_single.get("hours") or "").strip()
+
+    if raw_start:
+        start = datetime.strptime(raw_start, _SHOWING_START_FORMAT)
+    else:
+        start = now or datetime.now(ZoneInfo(LISTINGS_TIMEZONE))
+
+    hours = int(raw_hours) if raw_hours else UPCOMING_DEFAULT_HOURS
+    if not 1 <= hours <= UPCOMING_MAX_HOURS:
+        raise ValueError(f"'hours' must be between 1 and {UPCOMING_MAX_HOURS}")
+
+    try:
+        end = start + timedelta(hours=hours)
+    except OverflowError as e:
+        raise ValueError(f"Window end out of range: {e}") from None
+    return start.strftime(_SHOWING_START_FORMAT), end.strftime(_SHOWING_START_FORMAT)
+
+
+def _canonical_listings_query(
+    route_type: str,
+    cinemas: list[str] | str,
+    dates: list[str],
+    date_range: DateRange | None,
+    fields: tuple[str, ...] | None = None,
+    since: str | None = None,
+    image_size: str | None = None,
+    response_format: str | None = None,
+    range_params: dict | None = None,
+) -> str:
+    """
+    Canonical query string of a listings / visual_listings request, from
+    already-canonical params (`cinemas` is "all" for the full set). Used for
+    redirects and as the materialized response key.
+
+    `date_range` is written as absolute `from`/`to`, unless `range_params`
+    (see `_redirect_range_params`) gives the range's params to use instead.
+    """
+    if range_params is None:
+        range_params = {
+            "from": date_range.start if date_range else None,
+            "to": date_range.end if date_range else None,
+        }
+    return canonical_query_string(
+        {
+            "route_type": route_type,
+            "cinemas": cinemas,
+            "dates": dates,
+            **range_params,
+            "fields": fields,
+            "since": since,
+            "image_size": image_size,
+            "format": response_format,
+        }
+    )
+
+
+def _redirect_range_params(qs_single: dict, date_range: DateRange | None) -> dict:
+    """
+    Range params for a canonical redirect. A range without `from` starts
+    today, so it keeps its `days`/`to` rather than being pinned to today's
+    dates by a long-cached 301.
+    """
+    if date_range is None:
+        return {}
+    if (qs_single.get("from") or "").strip():
+        return {"from": date_range.start, "to": date_range.end}
+    raw_days = (qs_single.get("days") or "").strip()
+    if raw_days:
+        return {"days": str(int(raw_days))}
+    return {"to": date_range.end}
+
+
+def _materialized_http_response(
+    route_type: str, materialized: MaterializedResponse, request_headers
+) -> dict:
+    body, content_encoding = materialized.body, materialized.content_encoding
+    if content_encoding == "gzip" and not accepts_gzip(request_headers):
+        body, content_encoding = gzip.decompress(body), None
+
+    valid_for = None
+    if materialized.expires_at is not None:
+        valid_for = materialized.expires_at - time.time()
+    headers = cache_headers(route_type, valid_for=valid_for)
+    headers.update(materialized.headers or {})
+    return build_raw_response(
+        200, body, content_encoding=content_encoding, headers=headers
+    )
+
+
+def _parse_search_limit(qs_single: dict) -> int:
+    raw_limit = (qs_single.get("limit") or "").strip()
+    limit = int(raw_limit) if raw_limit else SEARCH_DEFAULT_LIMIT
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise ValueError(f"'limit' must be between 1 and {SEARCH_MAX_LIMIT}")
+    return limit
+
+
+# ===== PREFETCH / WARM-UP =====
+def _prefetch(cinemas: list[str]) -> dict:
+    """
+    Load listings, image key sets (+ presigned URLs) and the pan-cinema file
+    for `cinemas` into the module caches. Failures are logged, not raised.
+    """
+    started = time.perf_counter()
+    listings = _get_cinemas_raw_listings(cinemas)
+    for cinema_listings in listings.values():
+        if isinstance(cinema_listings, dict) and "error" not in cinema_listings:
+            _get_search_index(cinema_listings)
+    images = _get_cinemas_good_images(cinemas)
+    pan_cinema_listings = get_pan_cinema_listings()
+    get_pan_cinema_film_ids()
+    # Stale entries were refreshed in background threads; finish them before
+    # the container is frozen between invocations
+    _wait_for_background_refreshes(timeout=10)
+
+    failed = sorted(
+        {c for c, v in listings.items() if isinstance(v, dict) and "error" in v}
+        | {c for c, v in images.items() if isinstance(v, dict) and "error" in v}
+    )
+    summary = {
+        "cinemas": len(cinemas),
+        "failed_cinemas": failed,
+        "pan_cinema_loaded": "error" not in pan_cinema_listings,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000),
+    }
+    print("Prefetch complete:", summary)
+    return summary
+
+
+def _is_warmup_event(event) -> bool:
+    """Scheduled pings: EventBridge rules, serverless-plugin-warmup, or {"warmup": true}."""
+    return bool(
+        event.get("warmup")
+        or event.get("source") in ("aws.events", "serverless-plugin-warmup")
+        or event.get("detail-type") == "Scheduled Event"
+    )
+
+
+if PREFETCH_ON_INIT and PREFETCH_CINEMAS:
+    _prefetch(PREFETCH_CINEMAS)
+
+
+def _is_partial(server_response_data) -> bool:
+    """True if some cinemas missed the request deadline or failed to load."""
+    if not isinstance(server_response_data, dict):
+        return False
+    return (
+        bool(server_response_data.get("timed_out_cinemas"))
+        or bool(server_response_data.get("failed_cinemas"))
+        or any(_is_error_entry(v) for v in server_response_data.values())
+    )
+
+
+def _response_headers(route_type: str, server_response_data) -> dict:
+    # Partial responses must not be cached in place of the complete one
+    if _is_partial(server_response_data):
+        print("Returning partial response: some cinemas timed out or failed to load")
+        return {"Cache-Control": "no-store"}
+    return cache_headers(route_type)
+
+
 # ===== MAIN HANDLER =====
+@sampled_profile
 def lambda_handler(event, context):
     print("Lambda triggered with event:", json.dumps(event))
 
+    if _is_warmup_event(event):
+        print("Warm-up event received — refreshing caches")
+        return {"warmed": True, **_prefetch(PREFETCH_CINEMAS)}
+
+    # S3 work stops waiting shortly before the invocation would time out;
+    # whatever loaded by then is returned
+    with request_deadline(context):
+        return _handle_http_request(event)
+
+
+def _handle_http_request(event):
     method = (
         event.get("httpMethod")
         or event.get("requestContext", {}).get("http", {}).get("method")
@@ -44,36 +351,229 @@ def lambda_handler(event, context):
         return build_response(400, {"error": "Invalid 'route_type' parameter"})
 
     if route_type == "pan_cinema_listings":
-        return handle_pan_cinema_listings_route(qs_single)
-
-    raw_cinemas = qs_multi.get("cinemas", None)
-    if raw_cinemas is None:
-        raw_cinemas = qs_single.get("cinemas")
-    cinemas = _as_list(raw_cinemas)
+        with memory_profile(route_type):
+            response = handle_pan_cinema_listings_route(qs_single, event.get("headers"))
+            _memory_checkpoint("respond")
+        return response
 
-    raw_dates = qs_multi.get("dates", None)
-    if raw_dates is None:
-        raw_dates = qs_single.get("dates")
-    dates = _as_list(raw_dates)
+    cinemas = _as_list(_query_param(qs_single, qs_multi, "cinemas"))
+    requested_all_cinemas = cinemas == ["all"]
+    # search defaults to every cinema; other routes must name theirs
+    if requested_all_cinemas or (route_type == "search" and not cinemas):
+        cinemas = list(CINEMAS)
+    dates = _as_list(_query_param(qs_single, qs_multi, "dates"))
 
     if not cinemas or any(c not in CINEMAS for c in cinemas):
         print("Invalid or missing cinemas param:", cinemas)
         return build_response(400, {"error": "Missing or invalid 'cinemas' parameter"})
 
-    if not dates or not all(
-        isinstance(d, str) and re.match(r"^\d{4}-\d{2}-\d{2}$", d) for d in dates
+    if route_type == "upcoming_showings":
+        try:
+            start, end = _parse_showing_window(qs_single)
+        except ValueError as e:
+            print("Invalid showing window params:", e)
+            return build_response(400, {"error": "Invalid 'start'/'hours' parameters"})
+
+        with memory_profile(route_type):
+            print("Processing upcoming showings for cinemas:", cinemas)
+            server_response_data = get_upcoming_showings(
+                _canonical_list(cinemas), start, end
+            )
+            response = build_response(
+                200,
+                server_response_data,
+                headers=_response_headers(route_type, server_response_data),
+            )
+            del server_response_data
+            _memory_checkpoint("serialize")
+        return response
+
+    try:
+        date_range = _parse_date_range(qs_single)
+    except (ValueError, OverflowError) as e:
+        print("Invalid date range params:", e)
+        return build_response(400, {"error": "Invalid 'from'/'to'/'days' parameters"})
+
+    if date_range is not None and dates:
+        print("Both dates and a date range given")
+        return build_response(
+            400, {"error": "Use either 'dates' or 'from'/'to'/'days', not both"}
+        )
+
+    # Dates are optional for search (no filter); required everywhere else
+    dates_optional = route_type == "search" and not dates
+    if date_range is None and not dates_optional and (
+        not dates or not all(_is_iso_date(d) for d in dates)
     ):
         print("Invalid or missing dates param:", dates)
         return build_response(400, {"error": "Missing or invalid 'dates' parameter"})
 
-    if route_type == "listings":
-        print("Processing standard listings for cinemas:", cinemas)
-        server_response_data = get_listings(cinemas, dates)
-    else:
-        print("Processing visual listings for cinemas:", cinemas)
-        server_response_data = get_image_listings(cinemas, dates)
+    raw_fields = _query_param(qs_single, qs_multi, "fields")
+    try:
+        fields = _parse_fields_param(raw_fields)
+    except ValueError as e:
+        print("Invalid fields param:", e)
+        return build_response(400, {"error": "Invalid 'fields' parameter"})
+
+    if route_type == "search":
+        query = (qs_single.get("q") or "").strip()
+        try:
+            limit = _parse_search_limit(qs_single)
+        except ValueError as e:
+            print("Invalid limit param:", e)
+            return build_response(400, {"error": "Invalid 'limit' parameter"})
+        if not query:
+            print("Missing search query")
+            return build_response(400, {"error": "Missing 'q' parameter"})
+
+        with memory_profile(route_type):
+            print(f"Searching {query!r} in cinemas:", cinemas)
+            server_response_data = search_listings(
+                query,
+                _canonical_list(cinemas),
+                date_range if date_range is not None else _canonical_list(dates),
+                fields=fields,
+                limit=limit,
+            )
+            response = build_response(
+                200,
+                server_response_data,
+                headers=_response_headers(route_type, server_response_data),
+            )
+            del server_response_data
+            _memory_checkpoint("serialize")
+        return response
+
+    since = (qs_single.get("since") or "").strip() or None
+    if since is not None:
+        if route_type != "listings":
+            return build_response(
+                400, {"error": "'since' is only supported for listings"}
+            )
+        try:
+            _parse_listings_version(since)
+        except ValueError as e:
+            print("Invalid since param:", e)
+            return build_response(400, {"error": "Invalid 'since' parameter"})
 
-    return build_response(200, server_response_data)
+    image_size = (qs_single.get("image_size") or "").strip() or None
+    if image_size == "original":
+        image_size = None
+    if image_size is not None and (
+        route_type != "visual_listings" or image_size not in IMAGE_SIZE_VARIANTS
+    ):
+        print("Invalid image_size param:", image_size)
+        return build_response(400, {"error": "Invalid 'image_size' parameter"})
+
+    response_format = (qs_single.get("format") or "").strip() or None
+    if response_format == "verbose":
+        response_format = None
+    if response_format is not None and response_format not in RESPONSE_FORMATS:
+        print("Invalid format param:", response_format)
+        return build_response(400, {"error": "Invalid 'format' parameter"})
+    if response_format is not None and since is not None:
+        return build_response(
+            400, {"error": "'format' can't be combined with 'since'"}
+        )
+
+    canonical_cinemas = _canonical_list(cinemas)
+    canonical_dates = _canonical_list(dates)
+    # The full set is always spelled "all" so it has a single cache key
+    canonical_cinemas_param = (
+        "all" if len(canonical_cinemas) == len(CINEMAS) else canonical_cinemas
+    )
+    # Redirects keep an explicit list explicit: a cached 301 to "all" would
+    # silently add any cinema later added to CINEMAS
+    received_cinemas_param = "all" if requested_all_cinemas else cinemas
+    redirect_cinemas_param = "all" if requested_all_cinemas else canonical_cinemas
+    canonical_qs = _canonical_listings_query(
+        route_type,
+        canonical_cinemas_param,
+        canonical_dates,
+        date_range,
+        fields=fields,
+        since=since,
+        image_size=image_size,
+        response_format=response_format,
+    )
+    if CANONICAL_QUERY_REDIRECT and (
+        received_cinemas_param != redirect_cinemas_param
+        or dates != canonical_dates
+        or _as_list(raw_fields) != list(fields or [])
+    ):
+        redirect_qs = _canonical_listings_query(
+            route_type,
+            redirect_cinemas_param,
+            canonical_dates,
+            date_range,
+            fields=fields,
+            since=since,
+            image_size=image_size,
+            response_format=response_format,
+            range_params=_redirect_range_params(qs_single, date_range),
+        )
+        print("Redirecting to canonical query:", redirect_qs)
+        return build_redirect_response(f"?{redirect_qs}")
+
+    if since is None:
+        materialized = _get_materialized_response(canonical_qs)
+        if materialized is not None:
+            print("Serving materialized response for:", canonical_qs)
+            return _materialized_http_response(
+                route_type, materialized, event.get("headers")
+            )
+
+    cinemas = canonical_cinemas
+    dates = date_range if date_range is not None else canonical_dates
+
+    with memory_profile(route_type):
+        if route_type == "listings":
+            server_response_data = None
+            if since is not None:
+                print(f"Processing listings changes since {since} for cinemas:", cinemas)
+                server_response_data = get_listings_changes(
+                    cinemas, dates, since, fields=fields
+                )
+            if server_response_data is not None:
+                version = server_response_data["version"]
+            else:
+                # Read before the listings: if they move on in between, the
+                # client's next `since` diff re-sends changes it already has
+                # rather than missing some
+                version = get_listings_version(cinemas)
+                print("Processing standard listings for cinemas:", cinemas)
+                server_response_data = get_listings(
+                    cinemas, dates, fields=fields, response_format=response_format
+                )
+            headers = _response_headers(route_type, server_response_data)
+            if version:
+                headers["X-Listings-Version"] = version
+                headers["Access-Control-Expose-Headers"] = "X-Listings-Version"
+        else:
+            print("Processing visual listings for cinemas:", cinemas)
+            server_response_data = get_image_listings(
+                cinemas,
+                dates,
+                fields=fields,
+                image_size=image_size,
+                response_format=response_format,
+            )
+            headers = _response_headers(route_type, server_response_data)
+
+        # Written cinema by cinema, releasing each one once it's in the body
+        # (compact responses nest the cinemas one level down, under their own
+        # `listings` dict, which is released the same way)
+        response = build_streamed_response(
+            200,
+            server_response_data,
+            headers=headers,
+            request_headers=event.get("headers"),
+            release=True,
+            depth=2 if response_format else 1,
+        )
+        del server_response_data
+        _memory_checkpoint("serialize")
+    return response
 
 
 # ===== LOCAL TESTING =====
@@ -85,7 +585,9 @@ if __name__ == "__main__":
         except ValueError:
             return d  # already an ISO date string
 
-    def _q_params_to_test_event(route_type, cinemas=None, dates=None, film_id=None):
+    def _q_params_to_test_event(
+        route_type, cinemas=None, dates=None, film_id=None, fields=None
+    ):
         qs = {"route_type": route_type}
         if cinemas:
             qs["cinemas"] = cinemas
@@ -93,6 +595,8 @@ if __name__ == "__main__":
             qs["dates"] = [_resolve_date(d) for d in dates]
         if film_id:
             qs["id"] = film_id
+        if fields:
+            qs["fields"] = fields
         return {"httpMethod": "GET", "queryStringParameters": qs}
 
     route_type = os.getenv("ROUTE_TYPE", "listings")
@@ -100,8 +604,11 @@ if __name__ == "__main__":
     cinemas = CINEMAS if cinemas_raw == ["all"] else cinemas_raw
     dates = _as_list(os.getenv("DATES") or "0,1")
     film_id = os.getenv("FILM_ID") or None
+    fields = os.getenv("FIELDS") or None
 
-    event = _q_params_to_test_event(route_type, cinemas or None, dates or None, film_id=film_id)
+    event = _q_params_to_test_event(
+        route_type, cinemas or None, dates or None, film_id=film_id, fields=fields
+    )
     print(f"\n=== Testing route: {route_type} ===")
     response = lambda_handler(event, context=None)
     print(json.dumps(response, indent=2))
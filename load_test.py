@@ -0,0 +1,446 @@
+"""
+Concurrent load test for lambda_handler.
+
+Replays a weighted mix of invoke events (listings, visual_listings,
+pan_cinema_listings with/without id, invalid params) against lambda_handler
+in-process, with every S3 call served by LocalS3 — an in-memory stand-in with
+injectable latency. Reports throughput, p50/p95/p99 latency and error rates
+per scenario.
+
+    python load_test.py --requests 2000 --concurrency 16 --latency-ms 30
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest.mock import patch
+
+# Build a plain boto3 client (no SSO profile) — LocalS3 replaces it anyway
+os.environ.setdefault("AWS_EXECUTION_ENV", "load_test")
+
+import lambda_function  # noqa: E402
+from shared.config import (  # noqa: E402
+    CINEMAS,
+    IMAGE_BUCKET,
+    LISTING_BUCKET,
+    PAN_CINEMA_LISTINGS_KEY,
+    get_cinemas_active_listings_path,
+    get_cinemas_image_folder_path,
+)
+from shared.hedging import _clear_hedging_state, _hedging_stats  # noqa: E402
+from shared.presigned_urls import _clear_presigned_url_cache  # noqa: E402
+from shared.snapshot_cache import _clear_snapshot_cache  # noqa: E402
+
+# Every module that binds `s3` from shared.config at import time
+S3_CLIENT_MODULES = [
+    "shared.config",
+    "shared.listings_utils",
+    "routes.get_image_listings.utils",
+    "routes.get_pan_cinema_listings",
+    "shared.materialized",
+]
+
+DEFAULT_MIX = {
+    "listings": 35,
+    "visual_listings": 25,
+    "pan_cinema_all": 10,
+    "pan_cinema_id": 15,
+    "pan_cinema_missing_id": 5,
+    "upcoming_showings": 10,
+    "invalid": 10,
+}
+
+
+# ===== LOCAL S3 STAND-IN =====
+class LocalS3:
+    """
+    In-memory S3 client covering the calls the server makes. Each call sleeps
+    for `latency_ms` ± `jitter_ms`; with probability `tail_probability` it
+    sleeps `tail_latency_ms` instead, to model slow outliers.
+    """
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            def __init__(self, key):
+                super().__init__(f"NoSuchKey: {key}")
+                self.response = {"Error": {"Code": "NoSuchKey"}}
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        tail_latency_ms: float = 0.0,
+        tail_probability: float = 0.0,
+        seed: int = 0,
+    ):
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tail_latency_ms = tail_latency_ms
+        self.tail_probability = tail_probability
+        self.calls: dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket: str, Key: str, Body):
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        self.objects[(Bucket, Key)] = Body
+
+    def _simulate_call(self, operation: str):
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            if self._rng.random() < self.tail_probability:
+                delay_ms = self.tail_latency_ms
+            else:
+                delay_ms = self._rng.gauss(self.latency_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def get_object(self, Bucket: str, Key: str, **kwargs):
+        self._simulate_call("get_object")
+        body = self.objects.get((Bucket, Key))
+        if body is None:
+            raise self.exceptions.NoSuchKey(Key)
+        return {
+            "Body": io.BytesIO(body),
+            "ETag": f'"{hashlib.md5(body).hexdigest()}"',
+            "ContentLength": len(body),
+        }
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = "", MaxKeys: int = 1000, **kwargs):
+        self._simulate_call("list_objects_v2")
+        keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix))
+        start = int(kwargs.get("ContinuationToken") or 0)
+        page = keys[start : start + MaxKeys]
+        response = {"Contents": [{"Key": k} for k in page], "IsTruncated": False}
+        if start + MaxKeys < len(keys):
+            response["IsTruncated"] = True
+            response["NextContinuationToken"] = str(start + MaxKeys)
+        return response
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=300, **kwargs):
+        return f"https://{Params['Bucket']}.local/{Params['Key']}?expires={ExpiresIn}"
+
+
+@contextlib.contextmanager
+def local_s3_installed(s3: LocalS3):
+    """Route every S3 call (and presigning) made by the server through `s3`."""
+    with contextlib.ExitStack() as stack:
+        for module in S3_CLIENT_MODULES:
+            stack.enter_context(patch(f"{module}.s3", s3))
+        stack.enter_context(
+            patch(
+                "shared.presigned_urls._generate_presigned_url",
+                lambda client, bucket, key, expires_in=300: client.generate_presigned_url(
+                    "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires_in
+                ),
+            )
+        )
+        yield s3
+
+
+# ===== SYNTHETIC DATA =====
+def _when_entry(show_date: date, showtimes: list[str]) -> dict:
+    return {
+        "date": show_date.isoformat(),
+        "structured_date_strings": {
+            "Weekday": show_date.strftime("%A"),
+            "Month": show_date.strftime("%B"),
+            "day_str": f"{show_date.day}th",
+        },
+        "year": show_date.year,
+        "month": show_date.month,
+        "day": show_date.day,
+        "showtimes": showtimes,
+    }
+
+
+def build_dataset(
+    s3: LocalS3,
+    films_per_cinema: int = 40,
+    days: int = 14,
+    image_fraction: float = 0.7,
+    seed: int = 0,
+) -> dict:
+    """
+    Populate `s3` with listings, good/ images and a pan-cinema file.
+
+    Returns:
+        dict: {"dates": [...], "film_ids": [...]} for building events
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    show_dates = [today + timedelta(days=i) for i in range(days)]
+    pan_cinema = {}
+
+    for cinema in CINEMAS:
+        listings = {}
+        for n in range(films_per_cinema):
+            title = f"Film {n:03d} at {cinema}" if n % 3 else f"Film {n:03d}"
+            db_id = 1000 + n
+            when = [
+                _when_entry(d, sorted(rng.sample(["12:00", "14:30", "18:15", "20:45"], 2)))
+                for d in show_dates
+                if rng.random() < 0.5
+            ]
+            listings[title] = {
+                "description": "A film. " * 40,
+                "screen": "Screen 1",
+                "screeningType": rng.choice(["standard", "35mm", "IMAX"]),
+                "url": f"https://example.com/{cinema}/{n}",
+                "when": when,
+                "image_to_download": "https://example.com/poster.jpg",
+                "isImageGood": True,
+                "s3ImageURL": "",
+                "_additional_info": {
+                    "directors": [f"Director {n}"],
+                    "cast": [f"Actor {n}", f"Actor {n + 1}"],
+                    "countries": ["UK"],
+                    "db_id": db_id,
+                },
+            }
+            pan_cinema.setdefault(str(db_id), {})[cinema] = listings[title]
+            if rng.random() < image_fraction:
+                image_name = title.lower().replace(" ", "_")
+                s3.put_object(
+                    Bucket=IMAGE_BUCKET,
+                    Key=f"{get_cinemas_image_folder_path(cinema)}{image_name}.jpg",
+                    Body=b"jpg",
+                )
+
+        s3.put_object(
+            Bucket=LISTING_BUCKET,
+            Key=get_cinemas_active_listings_path(cinema),
+            Body=json.dumps(listings),
+        )
+
+    s3.put_object(
+        Bucket=LISTING_BUCKET, Key=PAN_CINEMA_LISTINGS_KEY, Body=json.dumps(pan_cinema)
+    )
+    return {"dates": [d.isoformat() for d in show_dates], "film_ids": sorted(pan_cinema)}
+
+
+# ===== EVENTS =====
+def _get_event(qs: dict) -> dict:
+    return {"httpMethod": "GET", "queryStringParameters": qs, "headers": {}}
+
+
+def build_event(scenario: str, rng: random.Random, dataset: dict) -> dict:
+    dates = dataset["dates"]
+    if scenario in ("listings", "visual_listings"):
+        cinemas = rng.sample(CINEMAS, rng.randint(1, len(CINEMAS)))
+        start = rng.randrange(len(dates))
+        return _get_event(
+            {
+                "route_type": scenario,
+                "cinemas": ",".join(cinemas),
+                "dates": ",".join(dates[start : start + rng.randint(1, 7)]),
+            }
+        )
+    if scenario == "pan_cinema_all":
+        return _get_event({"route_type": "pan_cinema_listings"})
+    if scenario == "pan_cinema_id":
+        return _get_event(
+            {"route_type": "pan_cinema_listings", "id": rng.choice(dataset["film_ids"])}
+        )
+    if scenario == "pan_cinema_missing_id":
+        return _get_event({"route_type": "pan_cinema_listings", "id": "999999999"})
+    if scenario == "upcoming_showings":
+        return _get_event(
+            {
+                "route_type": "upcoming_showings",
+                "cinemas": "all",
+                "start": f"{rng.choice(dates)}T{rng.randint(10, 22):02d}:00",
+                "hours": str(rng.randint(1, 6)),
+            }
+        )
+    if scenario == "invalid":
+        return rng.choice(
+            [
+                _get_event({"route_type": "listings", "cinemas": "nowhere", "dates": dates[0]}),
+                _get_event({"route_type": "listings", "cinemas": CINEMAS[0], "dates": "tomorrow"}),
+                _get_event({"route_type": "not_a_route"}),
+                _get_event({"route_type": "pan_cinema_listings", "id": "abc"}),
+            ]
+        )
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+# Expected status codes; anything else (or an exception) counts as an error
+EXPECTED_STATUS = {
+    "listings": {200},
+    "visual_listings": {200},
+    "pan_cinema_all": {200},
+    "pan_cinema_id": {200},
+    "pan_cinema_missing_id": {404},
+    "upcoming_showings": {200},
+    "invalid": {400},
+}
+
+
+# ===== RUN / REPORT =====
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def _summarize(latencies_ms: list[float], errors: int, elapsed_s: float) -> dict:
+    ordered = sorted(latencies_ms)
+    return {
+        "requests": len(ordered),
+        "throughput_rps": round(len(ordered) / elapsed_s, 1) if elapsed_s else 0.0,
+        "p50_ms": round(_percentile(ordered, 50), 2),
+        "p95_ms": round(_percentile(ordered, 95), 2),
+        "p99_ms": round(_percentile(ordered, 99), 2),
+        "error_rate": round(errors / len(ordered), 4) if ordered else 0.0,
+    }
+
+
+def run_load_test(
+    requests: int = 1000,
+    concurrency: int = 8,
+    mix: dict | None = None,
+    s3: LocalS3 | None = None,
+    films_per_cinema: int = 40,
+    days: int = 14,
+    seed: int = 0,
+    quiet: bool = True,
+    hedged: bool = False,
+) -> dict:
+    """
+    Fire `requests` events drawn from `mix` at lambda_handler from
+    `concurrency` threads, starting from empty caches.
+
+    Returns:
+        dict: {"overall": {...}, "scenarios": {scenario: {...}}, "s3_calls": {...},
+               "hedging": {...}}
+    """
+    mix = mix or DEFAULT_MIX
+    s3 = s3 or LocalS3(seed=seed)
+    rng = random.Random(seed)
+    dataset = build_dataset(s3, films_per_cinema=films_per_cinema, days=days, seed=seed)
+
+    scenarios = rng.choices(list(mix), weights=list(mix.values()), k=requests)
+    events = [(scenario, build_event(scenario, rng, dataset)) for scenario in scenarios]
+    results: list[tuple[str, float, bool]] = []
+    results_lock = threading.Lock()
+
+    def _invoke(scenario_event):
+        scenario, event = scenario_event
+        started = time.perf_counter()
+        try:
+            response = lambda_function.lambda_handler(event, None)
+            ok = response.get("statusCode") in EXPECTED_STATUS[scenario]
+        except Exception:
+            ok = False
+        latency_ms = (time.perf_counter() - started) * 1000
+        with results_lock:
+            results.append((scenario, latency_ms, ok))
+
+    _clear_snapshot_cache()
+    _clear_presigned_url_cache()
+    _clear_hedging_state()
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(local_s3_installed(s3))
+        stack.enter_context(patch("shared.hedging.HEDGED_GETS_ENABLED", hedged))
+        if quiet:
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(_invoke, events))
+        elapsed_s = time.perf_counter() - started
+
+    report = {
+        "overall": _summarize(
+            [latency for _, latency, _ in results],
+            sum(1 for _, _, ok in results if not ok),
+            elapsed_s,
+        ),
+        "scenarios": {},
+        "s3_calls": dict(s3.calls),
+        "hedging": _hedging_stats(),
+    }
+    for scenario in mix:
+        scenario_results = [(lat, ok) for s, lat, ok in results if s == scenario]
+        if scenario_results:
+            report["scenarios"][scenario] = _summarize(
+                [lat for lat, _ in scenario_results],
+                sum(1 for _, ok in scenario_results if not ok),
+                elapsed_s,
+            )
+    return report
+
+
+def _print_report(report: dict):
+    columns = ["requests", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate"]
+    print(f"{'scenario':<24}" + "".join(f"{c:>16}" for c in columns))
+    rows = list(report["scenarios"].items()) + [("overall", report["overall"])]
+    for name, stats in rows:
+        print(f"{name:<24}" + "".join(f"{stats[c]:>16}" for c in columns))
+    print("S3 calls:", report["s3_calls"])
+    print("Hedging:", report["hedging"])
+
+
+def _parse_mix(raw: str) -> dict:
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in EXPECTED_STATUS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="mean S3 call latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--tail-latency-ms", type=float, default=0.0)
+    parser.add_argument("--tail-probability", type=float, default=0.0)
+    parser.add_argument("--films-per-cinema", type=int, default=40)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hedge", action="store_true", help="enable hedged S3 GETs")
+    parser.add_argument(
+        "--mix",
+        type=_parse_mix,
+        default=DEFAULT_MIX,
+        help="weighted scenarios, e.g. listings=50,visual_listings=30,invalid=20",
+    )
+    args = parser.parse_args()
+
+    local_s3 = LocalS3(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tail_latency_ms=args.tail_latency_ms,
+        tail_probability=args.tail_probability,
+        seed=args.seed,
+    )
+    _print_report(
+        run_load_test(
+            requests=args.requests,
+            concurrency=args.concurrency,
+            mix=args.mix,
+            s3=local_s3,
+            films_per_cinema=args.films_per_cinema,
+            days=args.days,
+            seed=args.seed,
+            hedged=args.hedge,
+        )
+    )
@@ -0,0 +1,111 @@
+"""
+Offline materializer for hot listings responses.
+
+Runs the listings and visual_listings routes for the hot query set (all
+cinemas × today, tomorrow and the next 7 days) and writes each serialized
+response to the materialized store, keyed by its canonical query string.
+lambda_handler then serves an exact match with one read and only runs the
+pipeline on a miss. Run it on a schedule shorter than
+MATERIALIZED_MAX_AGE_SECONDS:
+
+    python materialize.py --store s3
+    python materialize.py --store ./materialized --today 2025-06-01
+"""
+
+import argparse
+import gzip
+import json
+import time
+from datetime import date, timedelta
+
+import lambda_function
+from shared.config import CINEMAS, MATERIALIZED_STORE
+from shared.data_types import DateRange
+from shared.materialized import MaterializedResponse, _put_materialized_responses
+from shared.presigned_urls import _presigned_urls_valid_for
+from routes.get_listings import get_listings, get_listings_version
+from routes.get_image_listings import get_image_listings
+
+MATERIALIZED_ROUTE_TYPES = ("listings", "visual_listings")
+
+
+def hot_queries(today: date) -> list[tuple[str, list[str] | DateRange]]:
+    """(route_type, dates) for every hot query: today, tomorrow, next 7 days."""
+    tomorrow = today + timedelta(days=1)
+    date_sets = [
+        [today.isoformat()],
+        [tomorrow.isoformat()],
+        DateRange(today.isoformat(), (today + timedelta(days=6)).isoformat()),
+    ]
+    return [(route, dates) for route in MATERIALIZED_ROUTE_TYPES for dates in date_sets]
+
+
+def _materialize_query(
+    route_type: str, dates: list[str] | DateRange, compress: bool
+) -> MaterializedResponse | None:
+    generated_at = time.time()
+    cinemas = sorted(set(CINEMAS))
+    headers, expires_at = {}, None
+    if route_type == "listings":
+        # Read before the listings, as lambda_function does
+        version = get_listings_version(cinemas)
+        data = get_listings(cinemas, dates)
+        if version:
+            headers["X-Listings-Version"] = version
+            headers["Access-Control-Expose-Headers"] = "X-Listings-Version"
+    else:
+        data = get_image_listings(cinemas, dates)
+        expires_at = generated_at + _presigned_urls_valid_for(generated_at)
+
+    if lambda_function._is_partial(data):
+        return None  # never pin a partial response; requests recompute instead
+
+    body = json.dumps(data).encode("utf-8")
+    return MaterializedResponse(
+        body=gzip.compress(body) if compress else body,
+        content_encoding="gzip" if compress else None,
+        headers=headers or None,
+        generated_at=generated_at,
+        expires_at=expires_at,
+    )
+
+
+def materialize(today: date, store: str, compress: bool = True) -> dict:
+    """Compute and write every hot query's response. Returns {canonical query: size}."""
+    entries = {}
+    for route_type, dates in hot_queries(today):
+        date_range = dates if isinstance(dates, DateRange) else None
+        canonical_qs = lambda_function._canonical_listings_query(
+            route_type, "all", [] if date_range else dates, date_range
+        )
+        entry = _materialize_query(route_type, dates, compress)
+        if entry is None:
+            print(f"Skipping {canonical_qs}: partial response")
+            continue
+        entries[canonical_qs] = entry
+        print(f"Materialized {canonical_qs}: {len(entry.body)} bytes")
+
+    _put_materialized_responses(entries, store)
+    return {qs: len(entry.body) for qs, entry in entries.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--store",
+        default=MATERIALIZED_STORE,
+        help='"s3" or a local directory (default: MATERIALIZED_STORE)',
+    )
+    parser.add_argument("--no-gzip", action="store_true", help="store bodies uncompressed")
+    parser.add_argument(
+        "--today", type=date.fromisoformat, default=None, help="ISO date (default: today in LISTINGS_TIMEZONE)"
+    )
+    args = parser.parse_args()
+    if not args.store:
+        parser.error("no store given and MATERIALIZED_STORE is not set")
+
+    materialize(args.today or lambda_function._listings_today(), args.store, compress=not args.no_gzip)
+
+
+if __name__ == "__main__":
+    main()
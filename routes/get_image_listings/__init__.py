@@ -2,28 +2,74 @@ from shared.listings_utils import (
     _get_cinemas_raw_listings,
     _filter_cinemas_listings_by_dates,
     _redact_listings_fields,
+    _listing_counts_by_cinema,
+    DateTable,
+    _compile_when_encoder,
+    _compact_response,
 )
+from shared.memory_profile import _memory_checkpoint
 from routes.get_image_listings.utils import (
     _get_cinemas_good_images,
     _match_and_attach_images_to_listings,
+    _get_cinema_image_match_index,
 )
 
 
-def get_image_listings(cinemas: list[str], dates: list[str]) -> dict:
+def get_image_listings(
+    cinemas: list[str],
+    dates: list[str],
+    fields: tuple[str, ...] | None = None,
+    image_size: str | None = None,
+    response_format: str | None = None,
+) -> dict:
+    # Each stage's input is released as soon as the next stage has been built,
+    # and only per-cinema counts are logged (printing whole dicts costs as much
+    # memory as the payload itself).
     listings_by_cinema = _get_cinemas_raw_listings(cinemas)
-    print("Listings by cinema:", listings_by_cinema)
+    print("Listings by cinema:", _listing_counts_by_cinema(listings_by_cinema))
+    _memory_checkpoint("load_listings")
+
     listings_by_cinema_date_filtered = _filter_cinemas_listings_by_dates(
         listings_by_cinema, dates
     )
-    print("Filtered listings by cinema:", listings_by_cinema_date_filtered)
-    images_by_cinema = _get_cinemas_good_images(cinemas)
-    print("Images by cinema:", images_by_cinema)
+    del listings_by_cinema
+    print(
+        "Filtered listings by cinema:",
+        _listing_counts_by_cinema(listings_by_cinema_date_filtered),
+    )
+    _memory_checkpoint("filter_dates")
+
+    images_by_cinema = _get_cinemas_good_images(cinemas, image_size=image_size)
+    print("Images by cinema:", _listing_counts_by_cinema(images_by_cinema))
+    _memory_checkpoint("load_images")
+
     listings_with_good_images = _match_and_attach_images_to_listings(
-        listings_by_cinema_date_filtered, images_by_cinema, cinemas
+        listings_by_cinema_date_filtered,
+        images_by_cinema,
+        cinemas,
+        match_index_for=_get_cinema_image_match_index,
     )
-    print("Listings with good images:", listings_with_good_images)
+    del listings_by_cinema_date_filtered, images_by_cinema
+    print(
+        "Listings with good images:",
+        _listing_counts_by_cinema(listings_with_good_images),
+    )
+    _memory_checkpoint("match_images")
+
+    date_table = DateTable() if response_format else None
     redacted_listings_with_good_images = _redact_listings_fields(
-        listings_with_good_images
+        listings_with_good_images,
+        fields=fields,
+        encode_when=_compile_when_encoder(response_format, date_table),
+    )
+    del listings_with_good_images
+    print(
+        "Redacted listings with good images:",
+        _listing_counts_by_cinema(redacted_listings_with_good_images),
     )
-    print("Redacted listings with good images:", redacted_listings_with_good_images)
+    _memory_checkpoint("redact")
+    if response_format:
+        return _compact_response(
+            redacted_listings_with_good_images, response_format, date_table
+        )
     return redacted_listings_with_good_images
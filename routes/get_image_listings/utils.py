@@ -1,64 +1,181 @@
+import json
 import os
 import re
+from bisect import bisect_left
+from collections import Counter
+from datetime import date
+from functools import partial
+from typing import NamedTuple
 
-from shared.aws import _generate_presigned_url
-from shared.config import s3, IMAGE_BUCKET, get_cinemas_image_folder_path
+from shared.listings_utils import _normalize_name, _is_error_entry
+from shared.deadline import _map_with_deadline, _timed_out_entry
+from shared.presigned_urls import _get_presigned_urls
+from shared.hedging import _hedged_get_object
+from shared.snapshot_cache import Snapshot, _get_snapshot, _get_derived
+from shared.config import (
+    s3,
+    IMAGE_BUCKET,
+    IMAGE_MANIFESTS_ENABLED,
+    IMAGES_CACHE_TTL_SECONDS,
+    IMAGE_SIZE_VARIANTS,
+    IMAGE_VARIANT_PREFER_WEBP,
+    IMAGE_FUZZY_MATCH_THRESHOLD,
+    get_cinemas_image_folder_path,
+    get_cinemas_image_manifest_path,
+)
 
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
 
-def _normalize_name(name: str) -> str:
-    name = name.lower().strip()
-    name = re.sub(r"[^a-z0-9]+", "_", name)
-    return name.strip("_")
 
+def _read_cinema_image_manifest(cinema: str) -> list[str] | None:
+    """
+    Read the image keys from a cinema's `good/manifest.json`.
 
-def _get_cinemas_good_images(cinemas: list[str], expires_in: int = 300) -> dict:
-    cinemas_good_images = {}
+    Manifest format (written by the image pipeline):
+        {"images": [{"key": "film_a.jpg", "etag": "9b2cf535f27731c974343645a3985328"}, ...]}
+    Keys may be relative to the good/ folder or full object keys.
 
-    for cinema in cinemas:
+    Returns:
+        list[str] | None: full object keys, or None if there is no usable manifest
+    """
+    if not IMAGE_MANIFESTS_ENABLED:
+        return None
+
+    manifest_key = get_cinemas_image_manifest_path(cinema)
+    try:
+        response = _hedged_get_object(s3, IMAGE_BUCKET, manifest_key)
+        manifest = json.loads(response["Body"].read().decode("utf-8"))
+    except Exception as e:
+        print(f"No usable image manifest for {cinema}, listing folder instead: {e}")
+        return None
+
+    entries = manifest.get("images") if isinstance(manifest, dict) else None
+    if not isinstance(entries, list):
+        print(f"Malformed image manifest for {cinema}, listing folder instead")
+        return None
+
+    images_folder = get_cinemas_image_folder_path(cinema)
+    keys = []
+    for entry in entries:
+        key = entry.get("key") if isinstance(entry, dict) else entry
+        if not isinstance(key, str) or not key:
+            continue
+        if not key.startswith(images_folder):
+            key = images_folder + key
+        keys.append(key)
+
+    return keys
+
+
+def _list_cinema_image_keys(cinema: str) -> list[str]:
+    images_folder = get_cinemas_image_folder_path(cinema)
+    keys = []
+    continuation_token = None
+
+    while True:
+        params = {
+            "Bucket": IMAGE_BUCKET,
+            "Prefix": images_folder,
+            "MaxKeys": 1000,
+        }
+        if continuation_token:
+            params["ContinuationToken"] = continuation_token
+
+        response = s3.list_objects_v2(**params)
+        keys.extend(obj["Key"] for obj in response.get("Contents", []))
+
+        if response.get("IsTruncated"):
+            continuation_token = response.get("NextContinuationToken")
+        else:
+            break
+
+    return keys
+
+
+def _load_cinema_image_keys(cinema: str) -> Snapshot:
+    keys = _read_cinema_image_manifest(cinema)
+    if keys is None:
+        keys = _list_cinema_image_keys(cinema)
+    return Snapshot(data=keys)
+
+
+def _get_cinema_image_keys(cinema: str) -> list[str]:
+    """Object keys in the cinema's good/ folder, cached for IMAGES_CACHE_TTL_SECONDS."""
+    snapshot = _get_snapshot(
+        f"images:{get_cinemas_image_folder_path(cinema)}",
+        lambda: _load_cinema_image_keys(cinema),
+        IMAGES_CACHE_TTL_SECONDS,
+    )
+    return snapshot.data
+
+
+def _group_image_keys(keys: list[str], images_folder: str) -> dict:
+    """
+    Split a cinema's good/ key set into the base images (directly in good/)
+    and, per IMAGE_SIZE_VARIANTS size, {normalized stem: variant key}.
+    """
+    base = []
+    variants = {size: {} for size in IMAGE_SIZE_VARIANTS}
+    for key in keys:
+        if not key.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        relative = key[len(images_folder):] if key.startswith(images_folder) else key
+        size, sep, name = relative.partition("/")
+        if not sep:
+            base.append(key)
+            continue
+        if size not in variants or "/" in name:
+            continue  # some other subfolder
+
+        norm_stem = _normalize_name(os.path.splitext(name)[0])
+        existing = variants[size].get(norm_stem)
+        is_webp = key.lower().endswith(".webp")
+        if existing is None or (IMAGE_VARIANT_PREFER_WEBP and is_webp):
+            variants[size][norm_stem] = key
+
+    return {"base": base, "variants": variants}
+
+
+def _get_cinema_good_images(cinema: str, image_size: str | None = None):
+    try:
+        keys = _get_cinema_image_keys(cinema)
         images_folder = get_cinemas_image_folder_path(cinema)
-        all_images = []
-        continuation_token = None
+        # Built once per cached key set, alongside it
+        grouped = _get_derived(
+            keys, "grouped", lambda k: _group_image_keys(k, images_folder)
+        )
+        variants = grouped["variants"].get(image_size, {}) if image_size else {}
 
-        try:
-            while True:
-                params = {
-                    "Bucket": IMAGE_BUCKET,
-                    "Prefix": images_folder,
-                    "MaxKeys": 1000,
-                }
-                if continuation_token:
-                    params["ContinuationToken"] = continuation_token
-
-                response = s3.list_objects_v2(**params)
-                contents = response.get("Contents", [])
-
-                for obj in contents:
-                    key = obj["Key"]
-                    if key.lower().endswith((".jpg", ".jpeg", ".png", ".webp")):
-                        filename = os.path.basename(key)
-                        presigned_url = _generate_presigned_url(
-                            s3, IMAGE_BUCKET, key, expires_in=expires_in
-                        )
-                        all_images.append(
-                            {
-                                "name": filename,  # base name for matching
-                                "url": presigned_url,  # for frontend download
-                            }
-                        )
-
-                if response.get("IsTruncated"):
-                    continuation_token = response.get("NextContinuationToken")
-                else:
-                    break
-
-            cinemas_good_images[cinema] = all_images
+        # (base name for matching, same stem in the requested size or the original)
+        images = []
+        for key in grouped["base"]:
+            name = os.path.basename(key)
+            images.append(
+                (name, variants.get(_normalize_name(os.path.splitext(name)[0]), key))
+            )
+        # URLs for frontend download, signed in one batch
+        urls = _get_presigned_urls(s3, IMAGE_BUCKET, [key for _, key in images])
 
-        except Exception as e:
-            cinemas_good_images[cinema] = {
-                "error": f"Failed to fetch good images for {cinema}: {str(e)}"
-            }
+        return [{"name": name, "url": urls[key]} for name, key in images]
 
-    return cinemas_good_images
+    except Exception as e:
+        return {"error": f"Failed to fetch good images for {cinema}: {str(e)}"}
+
+
+def _get_cinemas_good_images(cinemas: list[str], image_size: str | None = None) -> dict:
+    """
+    Good images per cinema, fetched concurrently within the request deadline.
+    With `image_size`, URLs point at that size variant where one exists.
+    """
+    fetched = _map_with_deadline(
+        partial(_get_cinema_good_images, image_size=image_size), cinemas
+    )
+    return {
+        cinema: fetched[cinema]
+        if cinema in fetched
+        else _timed_out_entry(f"Timed out fetching good images for {cinema}")
+        for cinema in cinemas
+    }
 
 
 def _filter_cinema_listings_by_images(
@@ -79,14 +196,184 @@ def _filter_cinema_listings_by_images(
     return filtered
 
 
+# ===== TITLE -> IMAGE MATCHING =====
+NGRAM_SIZE = 3
+# Fuzzy matching ignores a leading article, format tags, a trailing language
+# suffix and a release-year tag before it that listings add to titles and
+# image filenames don't (or vice versa)
+_FUZZY_LEADING_ARTICLES = {"the", "a", "an"}
+_FUZZY_IGNORED_TOKENS = {"35mm", "70mm", "16mm", "4k", "imax"}
+# "nosferatu_1922_en": the language goes before the year is looked for
+_FUZZY_LANGUAGE_SUFFIXES = {"en", "fr", "de", "es", "ja", "ko", "zh"}
+_EARLIEST_YEAR_TAG = 1888
+# "Blade Runner 2049" is a title, not a release year
+_LATEST_YEAR_TAG = date.today().year + 1
+# ii, iii, iv, ... (a lone i / v / x only after the first word: "I, Tonya",
+# "V for Vendetta")
+_ROMAN_NUMERAL_RE = re.compile(r"^(?=[ivx]+$)x{0,3}(ix|iv|v?i{0,3})$")
+
+
+class FuzzyName(NamedTuple):
+    key: str  # compared by n-grams
+    numbers: tuple[str, ...]  # sequel / part numbers, must match exactly
+    year: str | None  # trailing year tag (before any language suffix)
+
+
+class ImageMatchIndex(NamedTuple):
+    stems: list[str]  # normalized image stems, sorted for prefix lookups
+    names: list[FuzzyName]  # per stem
+    gram_counts: list[int]  # number of distinct n-grams per stem
+    postings: dict[str, list[int]]  # n-gram -> indexes into stems
+
+
+def _is_year_tag(token: str) -> bool:
+    return token.isdigit() and _EARLIEST_YEAR_TAG <= int(token) <= _LATEST_YEAR_TAG
+
+
+def _fuzzy_name(norm_name: str) -> FuzzyName:
+    tokens = [
+        token
+        for token in norm_name.split("_")
+        if token and token not in _FUZZY_IGNORED_TOKENS
+    ]
+    if len(tokens) > 1 and tokens[-1] in _FUZZY_LANGUAGE_SUFFIXES:
+        tokens.pop()
+    year = None
+    if len(tokens) > 1 and _is_year_tag(tokens[-1]):
+        year = tokens.pop()
+    if len(tokens) > 1 and tokens[0] in _FUZZY_LEADING_ARTICLES:
+        tokens = tokens[1:]
+    numbers = tuple(
+        token
+        for i, token in enumerate(tokens)
+        if token.isdigit() or (i > 0 and _ROMAN_NUMERAL_RE.match(token))
+    )
+    return FuzzyName("_".join(tokens) or norm_name, numbers, year)
+
+
+def _same_film_numbers(a: FuzzyName, b: FuzzyName) -> bool:
+    """
+    "Toy Story 3" is never "toy_story_2": numbers must be equal. A year tag
+    only counts when both sides have one.
+    """
+    return a.numbers == b.numbers and (a.year is None or b.year is None or a.year == b.year)
+
+
+def _ngrams(text: str) -> set[str]:
+    padded = f" {text} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def _build_image_match_index(norm_stems) -> ImageMatchIndex:
+    """N-gram index over one cinema's normalized image stems."""
+    stems = sorted(set(norm_stems))
+    names = []
+    gram_counts = []
+    postings = {}
+    for i, stem in enumerate(stems):
+        name = _fuzzy_name(stem)
+        names.append(name)
+        grams = _ngrams(name.key)
+        gram_counts.append(len(grams))
+        for gram in grams:
+            postings.setdefault(gram, []).append(i)
+    return ImageMatchIndex(stems, names, gram_counts, postings)
+
+
+def _get_cinema_image_match_index(cinema: str) -> ImageMatchIndex:
+    """
+    Match index over the cinema's base images, built once per cached image
+    key set alongside its grouping.
+    """
+    keys = _get_cinema_image_keys(cinema)
+    images_folder = get_cinemas_image_folder_path(cinema)
+    grouped = _get_derived(
+        keys, "grouped", lambda k: _group_image_keys(k, images_folder)
+    )
+    return _get_derived(
+        grouped,
+        "match_index",
+        lambda g: _build_image_match_index(
+            _normalize_name(os.path.splitext(os.path.basename(key))[0])
+            for key in g["base"]
+        ),
+    )
+
+
+def _prefix_match(index: ImageMatchIndex, norm_title: str) -> str | None:
+    """
+    First stem (alphabetically) starting with `norm_title`, e.g. "_en"
+    suffixes, with the same film numbers.
+    """
+    title_name = _fuzzy_name(norm_title)
+    i = bisect_left(index.stems, norm_title)
+    while i < len(index.stems) and index.stems[i].startswith(norm_title):
+        if _same_film_numbers(title_name, index.names[i]):
+            return index.stems[i]
+        i += 1
+    return None
+
+
+def _fuzzy_match(
+    index: ImageMatchIndex, norm_title: str, threshold: float
+) -> str | None:
+    """
+    Most similar stem by Dice coefficient over n-grams of the fuzzy keys,
+    if it reaches `threshold`. Only stems sharing an n-gram with the title
+    and the same film numbers are scored.
+    """
+    title_name = _fuzzy_name(norm_title)
+    query = _ngrams(title_name.key)
+    shared = Counter()
+    for gram in query:
+        for stem_index in index.postings.get(gram, ()):
+            shared[stem_index] += 1
+
+    best, best_score = None, threshold
+    for stem_index, count in shared.items():
+        if not _same_film_numbers(title_name, index.names[stem_index]):
+            continue
+        score = 2 * count / (len(query) + index.gram_counts[stem_index])
+        if score > best_score or (
+            score == best_score and (best is None or stem_index < best)
+        ):
+            best, best_score = stem_index, score
+    return index.stems[best] if best is not None else None
+
+
+def _cinema_match_index(cinema: str, image_map: dict, match_index_for) -> ImageMatchIndex:
+    """`match_index_for(cinema)` (a cached index) when given, else one built over `image_map`."""
+    if match_index_for is not None:
+        try:
+            return match_index_for(cinema)
+        except Exception as e:
+            print(f"No cached image match index for {cinema}, building one: {e}")
+    return _build_image_match_index(image_map)
+
+
 def _match_and_attach_images_to_listings(
-    listings_by_cinema: dict, images_by_cinema: dict, cinemas: list[str]
+    listings_by_cinema: dict,
+    images_by_cinema: dict,
+    cinemas: list[str],
+    match_index_for=None,
 ) -> dict:
+    """
+    Listings per cinema that have a good image, each with its `image_url`.
+    `match_index_for(cinema)` returns the cinema's cached ImageMatchIndex
+    for the prefix / fuzzy fallbacks (see `_get_cinema_image_match_index`);
+    without it one is built per cinema from `images_by_cinema`.
+    """
     listings_with_good_images = {}
 
     for cinema in cinemas:
         raw_cinema_listings = listings_by_cinema.get(cinema, {})
         images_info = images_by_cinema.get(cinema, [])
+        failed = next(
+            (e for e in (raw_cinema_listings, images_info) if _is_error_entry(e)), None
+        )
+        if failed is not None:
+            listings_with_good_images[cinema] = failed
+            continue
 
         # Build a map using only the stem (no extension) and normalized
         image_map = {}
@@ -99,23 +386,35 @@ def _match_and_attach_images_to_listings(
             image_map[norm_stem] = img["url"]
 
         filtered_listings = {}
+        index = None  # built on the first title without a direct match
         for title, listing_data in raw_cinema_listings.items():
             norm_title = _normalize_name(title)
 
-            # Direct match
+            # Direct match. Listings may be shared with the snapshot cache, so
+            # attach the URL to a copy rather than mutating them.
             if norm_title in image_map:
-                listing_data["image_url"] = image_map[norm_title]
-                filtered_listings[title] = listing_data
+                filtered_listings[title] = {
+                    **listing_data,
+                    "image_url": image_map[norm_title],
+                }
                 continue
 
-            # Fallback: some images may contain extra suffixes like "_en"
-            # Find any image whose normalized stem *starts with* the normalized title
-            # e.g., "kung_fu_panda" matches "kung_fu_panda_en"
-            for img_stem, url in image_map.items():
-                if img_stem.startswith(norm_title):
-                    listing_data["image_url"] = url
-                    filtered_listings[title] = listing_data
-                    break
+            # Fallbacks, in order: an image whose stem starts with the title
+            # ("kung_fu_panda" -> "kung_fu_panda_en"), then the most similar
+            # stem ignoring articles / format / year tags
+            # ("the_godfather_35mm" -> "godfather_1972"). Both need the same
+            # sequel numbers ("toy_story_3" never gets "toy_story_2").
+            if index is None:
+                index = _cinema_match_index(cinema, image_map, match_index_for)
+            img_stem = _prefix_match(index, norm_title)
+            if img_stem is None and IMAGE_FUZZY_MATCH_THRESHOLD <= 1:
+                img_stem = _fuzzy_match(index, norm_title, IMAGE_FUZZY_MATCH_THRESHOLD)
+            # The cached index can be a refresh ahead of this request's images
+            if img_stem is not None and img_stem in image_map:
+                filtered_listings[title] = {
+                    **listing_data,
+                    "image_url": image_map[img_stem],
+                }
 
         listings_with_good_images[cinema] = filtered_listings
 
@@ -1,15 +1,113 @@
 from shared.listings_utils import (
     _get_cinemas_raw_listings,
+    _get_cinemas_versioned_listings,
     _filter_cinemas_listings_by_dates,
     _redact_listings_fields,
+    _listing_counts_by_cinema,
+    DateTable,
+    _compile_when_encoder,
+    _compact_response,
 )
+from shared.listings_delta import (
+    _listings_version,
+    _parse_listings_version,
+    _version_tag,
+    _find_cinema_listings_version,
+    _diff_cinema_listings,
+)
+from shared.memory_profile import _memory_checkpoint
 
 
-def get_listings(cinemas: list[str], dates: list[str]) -> dict:
+def get_listings(
+    cinemas: list[str],
+    dates: list[str],
+    fields: tuple[str, ...] | None = None,
+    response_format: str | None = None,
+) -> dict:
+    # Each stage's input is released as soon as the next stage has been built,
+    # and only per-cinema counts are logged (printing whole dicts costs as much
+    # memory as the payload itself).
+    # With `response_format` ("compact" / "columnar"), `when` entries are
+    # encoded against a shared date table as they are projected.
     listings_by_cinema = _get_cinemas_raw_listings(cinemas)
-    print("Listings by cinema:", listings_by_cinema)
+    print("Listings by cinema:", _listing_counts_by_cinema(listings_by_cinema))
+    _memory_checkpoint("load_listings")
+
     filtered_by_dates = _filter_cinemas_listings_by_dates(listings_by_cinema, dates)
-    print("Filtered listings by cinema:", filtered_by_dates)
-    redacted_filtered = _redact_listings_fields(filtered_by_dates)
-    print("Redacted filtered listings:", redacted_filtered)
+    del listings_by_cinema
+    print("Filtered listings by cinema:", _listing_counts_by_cinema(filtered_by_dates))
+    _memory_checkpoint("filter_dates")
+
+    date_table = DateTable() if response_format else None
+    redacted_filtered = _redact_listings_fields(
+        filtered_by_dates,
+        fields=fields,
+        encode_when=_compile_when_encoder(response_format, date_table),
+    )
+    del filtered_by_dates
+    print("Redacted filtered listings:", _listing_counts_by_cinema(redacted_filtered))
+    _memory_checkpoint("redact")
+    if response_format:
+        return _compact_response(redacted_filtered, response_format, date_table)
     return redacted_filtered
+
+
+def get_listings_version(cinemas: list[str]) -> str:
+    """Version token of the listings currently served for `cinemas`."""
+    return _listings_version(_get_cinemas_versioned_listings(cinemas)[1])
+
+
+def _listings_view(cinema: str, listings: dict, dates, fields) -> dict:
+    """One cinema's listings exactly as get_listings would return them."""
+    filtered = _filter_cinemas_listings_by_dates({cinema: listings}, dates)
+    return _redact_listings_fields(filtered, fields=fields).get(cinema, {})
+
+
+def get_listings_changes(
+    cinemas: list[str],
+    dates: list[str],
+    since: str,
+    fields: tuple[str, ...] | None = None,
+) -> dict | None:
+    """
+    Changes to the listings response since version `since`:
+    {"since", "version", "changes": {cinema: {"added", "changed", "removed"}}}.
+
+    Returns None when a full response is needed instead: a cinema's old
+    version is no longer in the snapshot history, or it currently fails to
+    load.
+
+    Raises:
+        ValueError: if `since` is malformed
+    """
+    since_tags = _parse_listings_version(since)
+    listings_by_cinema, etags = _get_cinemas_versioned_listings(cinemas)
+    _memory_checkpoint("load_listings")
+
+    changes = {}
+    for cinema in cinemas:
+        etag, old_tag = etags.get(cinema), since_tags.get(cinema)
+        if not etag or not old_tag:
+            print(f"No version to diff for {cinema}, sending full listings")
+            return None
+        if _version_tag(etag) == old_tag:
+            continue
+
+        old_listings = _find_cinema_listings_version(cinema, old_tag)
+        if old_listings is None:
+            print(f"Version {old_tag} of {cinema} aged out, sending full listings")
+            return None
+        cinema_changes = _diff_cinema_listings(
+            _listings_view(cinema, old_listings, dates, fields),
+            _listings_view(cinema, listings_by_cinema[cinema], dates, fields),
+        )
+        if cinema_changes:
+            changes[cinema] = cinema_changes
+
+    del listings_by_cinema
+    print(
+        "Changed listings by cinema:",
+        {c: sum(len(part) for part in v.values()) for c, v in changes.items()},
+    )
+    _memory_checkpoint("diff")
+    return {"since": since, "version": _listings_version(etags), "changes": changes}
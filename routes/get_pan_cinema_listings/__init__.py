@@ -1,24 +1,141 @@
 import json
+from array import array
+from bisect import bisect_left
 
 from shared.data_types import PanCinemaCleanedCompactedListings
-from shared.config import s3, LISTING_BUCKET, PAN_CINEMA_LISTINGS_KEY
-from shared.http_utils import build_response
+from shared.config import (
+    s3,
+    LISTING_BUCKET,
+    PAN_CINEMA_LISTINGS_KEY,
+    PAN_CINEMA_LISTINGS_GZ_KEY,
+    PAN_CINEMA_SERVE_PRECOMPRESSED,
+    PAN_CINEMA_CACHE_TTL_SECONDS,
+    COMPACT_SNAPSHOTS,
+)
+from shared.http_utils import (
+    build_response,
+    build_raw_response,
+    build_streamed_response,
+    accepts_gzip,
+    cache_headers,
+)
+from shared.listings_utils import _parse_fields_param, _redact_listings_fields
+from shared.snapshot_cache import Snapshot, _get_snapshot, _get_derived
+from shared.compact_listings import _compact_listings_tree
+from shared.hedging import _hedged_get_object
+from shared.deadline import DeadlineExceeded, _call_with_deadline, _timed_out_entry
+
+
+def _get_pan_cinema_object(key: str) -> bytes:
+    """Raw bytes of a pan-cinema object, cached for PAN_CINEMA_CACHE_TTL_SECONDS."""
+
+    def _load() -> Snapshot:
+        response = _hedged_get_object(s3, LISTING_BUCKET, key)
+        return Snapshot(data=response["Body"].read(), etag=response.get("ETag"))
+
+    return _call_with_deadline(
+        _get_snapshot, key, _load, PAN_CINEMA_CACHE_TTL_SECONDS
+    ).data
+
+
+def _parse_pan_cinema_listings(raw: bytes) -> PanCinemaCleanedCompactedListings:
+    pan_cinema_listings = json.loads(raw.decode("utf-8"))
+    if COMPACT_SNAPSHOTS:
+        # {db_id: {cinema: listing}}
+        pan_cinema_listings = _compact_listings_tree(pan_cinema_listings, listing_depth=2)
+    return pan_cinema_listings
 
 
 def get_pan_cinema_listings() -> dict:
+    """Parsed pan-cinema listings; parsed once per cached snapshot and shared."""
     try:
-        response = s3.get_object(Bucket=LISTING_BUCKET, Key=PAN_CINEMA_LISTINGS_KEY)
-        pan_cinema_listings: PanCinemaCleanedCompactedListings = json.loads(
-            response["Body"].read().decode("utf-8")
+        raw = _get_pan_cinema_object(PAN_CINEMA_LISTINGS_KEY)
+        pan_cinema_listings: PanCinemaCleanedCompactedListings = _get_derived(
+            raw, "parsed", _parse_pan_cinema_listings
         )
         return pan_cinema_listings
+    except DeadlineExceeded:
+        return _timed_out_entry("Timed out loading pan cinema listings")
     except Exception as e:
         return {"error": f"Failed to load pan cinema listings: {str(e)}"}
 
 
-def handle_pan_cinema_listings_route(qs_single: dict) -> dict:
+def _object_keys(pairs: list) -> list:
+    return [key for key, _ in pairs]
+
+
+def _build_film_id_filter(raw: bytes) -> array:
+    """
+    Sorted film ids of the raw pan-cinema file: 8 bytes each, no per-id objects.
+
+    Decoded with a hook that keeps only each object's keys, so a film's
+    listings are dropped as soon as they're read and the file is never fully
+    parsed.
+    """
+    ids = []
+    for db_id in json.loads(raw.decode("utf-8"), object_pairs_hook=_object_keys):
+        try:
+            ids.append(int(db_id))
+        except (TypeError, ValueError):
+            continue  # can't match an `id` param, which must be an int
+    return array("q", sorted(ids))
+
+
+def get_pan_cinema_film_ids() -> array | dict:
+    """
+    Sorted ids of the films in the pan-cinema file, built from the raw bytes
+    once per cached snapshot. Answers unknown `id`s without parsing the
+    listings.
+    """
+    try:
+        raw = _get_pan_cinema_object(PAN_CINEMA_LISTINGS_KEY)
+        return _get_derived(raw, "film_ids", _build_film_id_filter)
+    except DeadlineExceeded:
+        return _timed_out_entry("Timed out loading pan cinema listings")
+    except Exception as e:
+        return {"error": f"Failed to load pan cinema film ids: {str(e)}"}
+
+
+def _has_film_id(film_ids: array, film_id: int) -> bool:
+    i = bisect_left(film_ids, film_id)
+    return i < len(film_ids) and film_ids[i] == film_id
+
+
+def get_pan_cinema_listings_raw(gzipped: bool = False) -> tuple[bytes, str | None]:
+    """
+    Read the pan-cinema file as stored, without parsing it.
+
+    When `gzipped` is set, the precompressed copy is tried first and the plain
+    file is used if it is missing.
+
+    Returns:
+        tuple: (raw body bytes, content encoding or None)
+
+    Raises:
+        Exception: any S3 error reading the plain file
+    """
+    if gzipped:
+        try:
+            return _get_pan_cinema_object(PAN_CINEMA_LISTINGS_GZ_KEY), "gzip"
+        except Exception as e:
+            print(f"pan_cinema_listings: no precompressed copy, serving plain: {e}")
+
+    return _get_pan_cinema_object(PAN_CINEMA_LISTINGS_KEY), None
+
+
+def _error_status(error: dict) -> int:
+    return 504 if error.get("timed_out") else 500
+
+
+def handle_pan_cinema_listings_route(qs_single: dict, headers: dict | None = None) -> dict:
     film_id_str = (qs_single.get("id") or "").strip()
 
+    try:
+        fields = _parse_fields_param(qs_single.get("fields"))
+    except ValueError as e:
+        print(f"pan_cinema_listings: invalid fields param: {e}")
+        return build_response(400, {"error": "Invalid 'fields' parameter"})
+
     if film_id_str:
         print(f"pan_cinema_listings: specific film id requested: {film_id_str}")
         try:
@@ -27,10 +144,16 @@ def handle_pan_cinema_listings_route(qs_single: dict) -> dict:
             print(f"pan_cinema_listings: invalid id param (not an int): {film_id_str!r}")
             return build_response(400, {"error": "Invalid 'id' parameter: must be an integer"})
 
+        film_ids = get_pan_cinema_film_ids()
+        # If the id filter couldn't be built, the full load below reports why
+        if isinstance(film_ids, array) and not _has_film_id(film_ids, film_id):
+            print(f"pan_cinema_listings: film id {film_id} not in id filter — returning 404")
+            return build_response(404, {"error": "Film Not showing on KL"})
+
         all_listings = get_pan_cinema_listings()
         if "error" in all_listings:
             print(f"pan_cinema_listings: failed to load listings: {all_listings}")
-            return build_response(500, all_listings)
+            return build_response(_error_status(all_listings), all_listings)
 
         film_listings = all_listings.get(str(film_id))
         if film_listings is None:
@@ -38,7 +161,45 @@ def handle_pan_cinema_listings_route(qs_single: dict) -> dict:
             return build_response(404, {"error": "Film Not showing on KL"})
 
         print(f"pan_cinema_listings: film id {film_id} found — returning CleanMatchedFilmsCinemaListings")
-        return build_response(200, film_listings)
+        if fields is not None:
+            film_listings = _redact_listings_fields(
+                {film_id_str: film_listings}, fields=fields
+            ).get(film_id_str, {})
+        return build_response(
+            200, film_listings, headers=cache_headers("pan_cinema_listings")
+        )
+    elif fields is not None:
+        print("pan_cinema_listings: no id param — returning projected listings")
+        all_listings = get_pan_cinema_listings()
+        if "error" in all_listings:
+            print(f"pan_cinema_listings: failed to load listings: {all_listings}")
+            return build_response(_error_status(all_listings), all_listings)
+        # {db_id: {cinema: listing}} has the same shape as {cinema: {title: listing}}.
+        # The projection is this request's own, so it's released film by film
+        # as it's serialized.
+        return build_streamed_response(
+            200,
+            _redact_listings_fields(all_listings, fields=fields),
+            headers=cache_headers("pan_cinema_listings"),
+            request_headers=headers,
+            release=True,
+        )
     else:
-        print("pan_cinema_listings: no id param — returning all listings")
-        return build_response(200, get_pan_cinema_listings())
+        print("pan_cinema_listings: no id param — passing through stored listings")
+        gzipped = PAN_CINEMA_SERVE_PRECOMPRESSED and accepts_gzip(headers)
+        try:
+            raw_body, content_encoding = get_pan_cinema_listings_raw(gzipped=gzipped)
+        except DeadlineExceeded:
+            error = _timed_out_entry("Timed out loading pan cinema listings")
+            print(f"pan_cinema_listings: failed to load listings: {error}")
+            return build_response(504, error)
+        except Exception as e:
+            error = {"error": f"Failed to load pan cinema listings: {str(e)}"}
+            print(f"pan_cinema_listings: failed to load listings: {error}")
+            return build_response(500, error)
+        return build_raw_response(
+            200,
+            raw_body,
+            content_encoding=content_encoding,
+            headers=cache_headers("pan_cinema_listings"),
+        )
@@ -0,0 +1,46 @@
+from heapq import merge
+
+from shared.listings_utils import (
+    _get_cinemas_raw_listings,
+    _showings_between,
+    _listing_counts_by_cinema,
+    _failed_cinemas,
+)
+from shared.memory_profile import _memory_checkpoint
+from shared.deadline import _is_timed_out
+
+
+def get_upcoming_showings(cinemas: list[str], start: str, end: str) -> dict:
+    """
+    Showings starting in [start, end) ("YYYY-MM-DDTHH:MM", local time) across
+    `cinemas`, in start order. Each cinema's snapshot keeps a sorted showtime
+    index, so this is a bisect + merge rather than a scan of every listing.
+    """
+    listings_by_cinema = _get_cinemas_raw_listings(cinemas)
+    print("Listings by cinema:", _listing_counts_by_cinema(listings_by_cinema))
+    _memory_checkpoint("load_listings")
+
+    timed_out = [c for c, listings in listings_by_cinema.items() if _is_timed_out(listings)]
+    failed = _failed_cinemas(listings_by_cinema)
+    per_cinema = []
+    for cinema, listings in listings_by_cinema.items():
+        if not isinstance(listings, dict) or "error" in listings:
+            continue
+        rows = _showings_between(listings, start, end)
+        per_cinema.append(
+            [(show_start, cinema, title, showtime) for show_start, title, showtime in rows]
+        )
+    del listings_by_cinema
+
+    showings = [
+        {"start": show_start, "cinema": cinema, "title": title, "showtime": showtime}
+        for show_start, cinema, title, showtime in merge(*per_cinema)
+    ]
+    print(f"Upcoming showings between {start} and {end}: {len(showings)}")
+    _memory_checkpoint("select_showings")
+    response = {"from": start, "to": end, "showings": showings}
+    if timed_out:
+        response["timed_out_cinemas"] = timed_out
+    if failed:
+        response["failed_cinemas"] = failed
+    return response
@@ -0,0 +1,68 @@
+from shared.config import SEARCH_DEFAULT_LIMIT
+from shared.data_types import DateRange
+from shared.listings_utils import (
+    _get_cinemas_raw_listings,
+    _filter_listing_by_dates,
+    _compile_listing_projector,
+    _listing_counts_by_cinema,
+    _failed_cinemas,
+)
+from shared.memory_profile import _memory_checkpoint
+from shared.deadline import _is_timed_out
+from routes.search_listings.utils import _get_search_index, _search_index
+
+
+def search_listings(
+    query: str,
+    cinemas: list[str],
+    dates: list[str] | DateRange | None = None,
+    fields: tuple[str, ...] | None = None,
+    limit: int = SEARCH_DEFAULT_LIMIT,
+) -> dict:
+    """
+    Listings whose title, directors or cast match `query`, best first, across
+    `cinemas`. With `dates`, listings are trimmed to (and must have) showings
+    on those dates.
+    """
+    listings_by_cinema = _get_cinemas_raw_listings(cinemas)
+    print("Listings by cinema:", _listing_counts_by_cinema(listings_by_cinema))
+    _memory_checkpoint("load_listings")
+
+    timed_out = [c for c, listings in listings_by_cinema.items() if _is_timed_out(listings)]
+    failed = _failed_cinemas(listings_by_cinema)
+    ranked = []
+    for cinema, listings in listings_by_cinema.items():
+        if not isinstance(listings, dict) or "error" in listings:
+            continue
+        scores = _search_index(_get_search_index(listings), query)
+        ranked.extend((-score, title, cinema) for title, score in scores.items())
+    ranked.sort()
+    _memory_checkpoint("search")
+
+    project = _compile_listing_projector(fields)
+    results = []
+    for neg_score, title, cinema in ranked:
+        if len(results) >= limit:
+            break
+        listing = listings_by_cinema[cinema][title]
+        if dates:
+            listing = _filter_listing_by_dates(listing, dates)
+            if listing is None:
+                continue
+        results.append(
+            {
+                "cinema": cinema,
+                "title": title,
+                "score": round(-neg_score, 2),
+                "listing": project(listing),
+            }
+        )
+    del listings_by_cinema
+    print(f"Search {query!r}: {len(ranked)} matches, returning {len(results)}")
+    _memory_checkpoint("redact")
+    response = {"query": query, "results": results}
+    if timed_out:
+        response["timed_out_cinemas"] = timed_out
+    if failed:
+        response["failed_cinemas"] = failed
+    return response
@@ -0,0 +1,108 @@
+from bisect import bisect_left
+from typing import NamedTuple
+
+from shared.listings_utils import _normalize_name
+from shared.snapshot_cache import _get_derived
+
+# Per-field weight of a matching token; a token found in several fields of the
+# same listing counts once, at its highest weight
+SEARCH_FIELD_WEIGHTS = {"title": 3.0, "directors": 2.0, "cast": 1.0}
+# The last query token also matches as a prefix ("kung fu pan"), at a discount
+PREFIX_MATCH_FACTOR = 0.5
+EXACT_TITLE_BONUS = 10.0
+TITLE_PREFIX_BONUS = 5.0
+
+
+class SearchIndex(NamedTuple):
+    postings: dict[str, dict[str, float]]  # token -> {title: weight}
+    tokens: list[str]  # sorted postings keys, for prefix lookups
+    norm_titles: dict[str, str]  # title -> _normalize_name(title)
+
+
+def _tokenize(text) -> list[str]:
+    if not isinstance(text, str):
+        return []
+    return [token for token in _normalize_name(text).split("_") if token]
+
+
+def _build_search_index(cinema_listings: dict) -> SearchIndex:
+    postings = {}
+    norm_titles = {}
+
+    def _add(tokens, title, weight):
+        for token in tokens:
+            titles = postings.setdefault(token, {})
+            if titles.get(title, 0) < weight:
+                titles[title] = weight
+
+    for title, listing_data in cinema_listings.items():
+        if not isinstance(listing_data, dict):
+            continue
+        norm_titles[title] = _normalize_name(title)
+        _add(_tokenize(title), title, SEARCH_FIELD_WEIGHTS["title"])
+
+        additional_info = listing_data.get("_additional_info")
+        if not isinstance(additional_info, dict):
+            continue
+        for field in ("directors", "cast"):
+            people = additional_info.get(field)
+            if not isinstance(people, list):
+                continue
+            for person in people:
+                _add(_tokenize(person), title, SEARCH_FIELD_WEIGHTS[field])
+
+    return SearchIndex(postings, sorted(postings), norm_titles)
+
+
+def _get_search_index(cinema_listings: dict) -> SearchIndex:
+    """
+    Inverted index for one cinema's listings snapshot. Built once per snapshot,
+    so a changed cinema file only rebuilds that cinema's index. The combined
+    snapshot keeps unchanged cinemas' objects across reloads, so the same
+    holds when listings come from it.
+    """
+    return _get_derived(cinema_listings, "search_index", _build_search_index)
+
+
+def _token_matches(index: SearchIndex, token: str, allow_prefix: bool) -> dict[str, float]:
+    if not allow_prefix:
+        return index.postings.get(token, {})
+
+    matches = {}
+    i = bisect_left(index.tokens, token)
+    while i < len(index.tokens) and index.tokens[i].startswith(token):
+        indexed_token = index.tokens[i]
+        factor = 1.0 if indexed_token == token else PREFIX_MATCH_FACTOR
+        for title, weight in index.postings[indexed_token].items():
+            matches[title] = max(matches.get(title, 0), weight * factor)
+        i += 1
+    return matches
+
+
+def _search_index(index: SearchIndex, query: str) -> dict[str, float]:
+    """
+    Score every listing matching all query tokens (the last one may be a
+    prefix). Whole-title and title-prefix matches rank first.
+    """
+    query_tokens = _tokenize(query)
+    if not query_tokens:
+        return {}
+
+    scores = None
+    for i, token in enumerate(query_tokens):
+        matches = _token_matches(index, token, allow_prefix=i == len(query_tokens) - 1)
+        if scores is None:
+            scores = dict(matches)
+        else:
+            scores = {t: s + matches[t] for t, s in scores.items() if t in matches}
+        if not scores:
+            return {}
+
+    norm_query = "_".join(query_tokens)
+    for title in scores:
+        norm_title = index.norm_titles.get(title, "")
+        if norm_title == norm_query:
+            scores[title] += EXACT_TITLE_BONUS
+        elif norm_title.startswith(norm_query):
+            scores[title] += TITLE_PREFIX_BONUS
+    return scores
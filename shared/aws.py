@@ -1,17 +1,29 @@
 import os
 import boto3
 from boto3.session import Session
+from botocore.config import Config
 
 
-def set_s3_client(aws_region: str):
+def set_s3_client(
+    aws_region: str,
+    connect_timeout: float = 60,
+    read_timeout: float = 60,
+    max_attempts: int = 3,
+):
+    # Per-call timeouts, so one slow S3 call can't eat the whole invocation
+    client_config = Config(
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries={"max_attempts": max_attempts, "mode": "standard"},
+    )
     # Use SSO profile when running locally, not lambda
     if os.getenv("AWS_EXECUTION_ENV") is None:
         print("🔹 Running locally with SSO profile")
         session = Session(profile_name="ronantfs")
-        s3 = session.client("s3", region_name=aws_region)
+        s3 = session.client("s3", region_name=aws_region, config=client_config)
     else:
         print("🔹 Running inside AWS Lambda environment")
-        s3 = boto3.client("s3", region_name=aws_region)
+        s3 = boto3.client("s3", region_name=aws_region, config=client_config)
     return s3
 
 
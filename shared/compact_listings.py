@@ -0,0 +1,78 @@
+import sys
+
+# Strings up to this length are interned (dates, "HH:MM", weekday/month
+# names, screening types, names); longer ones (descriptions) rarely repeat.
+_INTERN_MAX_LEN = 64
+
+
+def _share(value, table: dict):
+    """
+    Hash-cons a parsed JSON value: return (canonical value, hashable key),
+    where equal values share one object from `table`. Callers must treat
+    the result as immutable, since one object may appear in many places.
+    """
+    if isinstance(value, str):
+        if len(value) <= _INTERN_MAX_LEN:
+            value = sys.intern(value)
+        return value, value
+
+    if isinstance(value, dict):
+        items = []
+        key_parts = []
+        for k, v in value.items():
+            shared_v, v_key = _share(v, table)
+            k = sys.intern(k)
+            items.append((k, shared_v))
+            key_parts.append((k, v_key))
+        key = ("dict", tuple(key_parts))
+        canonical = table.get(key)
+        if canonical is None:
+            canonical = table[key] = dict(items)
+        return canonical, key
+
+    if isinstance(value, list):
+        shared_items = [_share(v, table) for v in value]
+        key = ("list", tuple(k for _, k in shared_items))
+        canonical = table.get(key)
+        if canonical is None:
+            canonical = table[key] = [v for v, _ in shared_items]
+        return canonical, key
+
+    # int / float / bool / None: type-tagged so True and 1 stay distinct;
+    # shares ints outside CPython's small-int cache (e.g. years)
+    key = (type(value).__name__, value)
+    return table.setdefault(key, value), key
+
+
+def _compact_listings_tree(data, listing_depth: int, table: dict | None = None):
+    """
+    Compact a parsed listings snapshot in place for caching.
+
+    Every listing's fields are hash-consed: repeated `when` entries,
+    `structured_date_strings`, showtime lists, cast/director lists and short
+    strings become one shared object per distinct value. Listing dicts
+    themselves stay distinct, so the result is the same plain-dict shape the
+    routes already serve (no conversion needed on the way out).
+
+    Args:
+        data: parsed JSON snapshot
+        listing_depth: dict levels above the listing dicts — 1 for
+            {title: listing}, 2 for {cinema: {title: listing}} or
+            {db_id: {cinema: listing}}
+
+    Returns:
+        the same `data` object
+    """
+    if table is None:
+        table = {}
+    if not isinstance(data, dict):
+        return data
+
+    for key, value in data.items():
+        if not isinstance(value, dict):
+            continue
+        if listing_depth > 1:
+            _compact_listings_tree(value, listing_depth - 1, table)
+        else:
+            data[key] = {sys.intern(k): _share(v, table)[0] for k, v in value.items()}
+    return data
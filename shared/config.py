@@ -28,15 +28,180 @@ CINEMAS = [
     "arthouse_crouch_end",
 ]
 
-ROUTE_TYPES = ["listings", "visual_listings", "pan_cinema_listings"]
+ROUTE_TYPES = [
+    "listings",
+    "visual_listings",
+    "pan_cinema_listings",
+    "upcoming_showings",
+    "search",
+]
 PAN_CINEMA_LISTINGS_KEY = f"{LISTING_PREFIX}/all/pan_cinema_listings.json"
+# Optional gzip copy written next to the pan-cinema file by the listings pipeline
+PAN_CINEMA_LISTINGS_GZ_KEY = f"{PAN_CINEMA_LISTINGS_KEY}.gz"
+PAN_CINEMA_SERVE_PRECOMPRESSED = (
+    os.getenv("PAN_CINEMA_SERVE_PRECOMPRESSED", "false").lower() == "true"
+)
+# Gzip listings / visual_listings / projected pan-cinema bodies while they are
+# serialized, for clients sending Accept-Encoding: gzip (API Gateway must
+# accept base64 binary bodies)
+STREAM_GZIP_RESPONSES = os.getenv("STREAM_GZIP_RESPONSES", "false").lower() == "true"
+
+# Optional single object holding every cinema's active listings, keyed by
+# cinema, written by the listings pipeline. Used for requests covering at least
+# COMBINED_LISTINGS_MIN_CINEMAS cinemas (default: all of them).
+ALL_CINEMAS_LISTINGS_KEY = f"{LISTING_PREFIX}/all/active_listings_by_cinema.json"
+COMBINED_LISTINGS_MIN_CINEMAS = int(
+    os.getenv("COMBINED_LISTINGS_MIN_CINEMAS", str(len(CINEMAS)))
+)
+
+# How long a parsed active_listings.json is reused before re-reading S3
+LISTINGS_CACHE_TTL_SECONDS = int(os.getenv("LISTINGS_CACHE_TTL_SECONDS", "60"))
+# How long image key sets (manifest or LIST) and the pan-cinema file are reused
+IMAGES_CACHE_TTL_SECONDS = int(os.getenv("IMAGES_CACHE_TTL_SECONDS", "300"))
+PAN_CINEMA_CACHE_TTL_SECONDS = int(os.getenv("PAN_CINEMA_CACHE_TTL_SECONDS", "60"))
+# Hash-cons cached snapshots (shared when entries, interned strings) so more
+# cinemas/dates fit in a warm container
+COMPACT_SNAPSHOTS = os.getenv("COMPACT_SNAPSHOTS", "true").lower() == "true"
+# Stale-while-revalidate: expired cached data this far past its TTL is served
+# immediately while a background thread refreshes it (0 disables)
+SNAPSHOT_MAX_STALE_SECONDS = int(os.getenv("SNAPSHOT_MAX_STALE_SECONDS", "300"))
+# Per-key exponential backoff after a failed S3 load
+SNAPSHOT_ERROR_BACKOFF_SECONDS = float(os.getenv("SNAPSHOT_ERROR_BACKOFF_SECONDS", "2"))
+SNAPSHOT_ERROR_BACKOFF_MAX_SECONDS = float(
+    os.getenv("SNAPSHOT_ERROR_BACKOFF_MAX_SECONDS", "120")
+)
+# Negative cache: a key that doesn't exist (NoSuchKey / 404) isn't asked for
+# again for this long, instead of backing off from SNAPSHOT_ERROR_BACKOFF_SECONDS
+SNAPSHOT_MISSING_TTL_SECONDS = float(os.getenv("SNAPSHOT_MISSING_TTL_SECONDS", "30"))
+# Previous versions (by ETag) kept per cached listings object, so listings
+# `since=` requests can be answered with a diff
+SNAPSHOT_HISTORY_SIZE = int(os.getenv("SNAPSHOT_HISTORY_SIZE", "5"))
+# Longest span accepted for from/to/days date-range queries
+MAX_DATE_RANGE_DAYS = int(os.getenv("MAX_DATE_RANGE_DAYS", "31"))
+
+# upcoming_showings: showtimes are local to LISTINGS_TIMEZONE; the window is
+# `hours` long (default/max below) from `start` (default now)
+LISTINGS_TIMEZONE = os.getenv("LISTINGS_TIMEZONE", "Europe/London")
+UPCOMING_DEFAULT_HOURS = int(os.getenv("UPCOMING_DEFAULT_HOURS", "3"))
+UPCOMING_MAX_HOURS = int(os.getenv("UPCOMING_MAX_HOURS", "48"))
+
+# search: results returned when no `limit` is given, and the largest `limit`
+SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", "20"))
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+
+# Warm set of cinemas loaded into the caches at container init (when
+# PREFETCH_ON_INIT=true) and on scheduled warm-up events. "all" = every cinema.
+PREFETCH_ON_INIT = os.getenv("PREFETCH_ON_INIT", "false").lower() == "true"
+_prefetch_cinemas = [c.strip() for c in os.getenv("PREFETCH_CINEMAS", "all").split(",") if c.strip()]
+PREFETCH_CINEMAS = (
+    list(CINEMAS)
+    if _prefetch_cinemas == ["all"]
+    else [c for c in _prefetch_cinemas if c in CINEMAS]
+)
+
+# Presigned image URLs are reused for a fixed, clock-aligned window and stay
+# valid for a grace period after it ends (see shared/presigned_urls.py)
+PRESIGNED_URL_WINDOW_SECONDS = int(os.getenv("PRESIGNED_URL_WINDOW_SECONDS", "3600"))
+PRESIGNED_URL_GRACE_SECONDS = int(os.getenv("PRESIGNED_URL_GRACE_SECONDS", "600"))
+PRESIGNED_URL_CACHE_MAX_ENTRIES = int(
+    os.getenv("PRESIGNED_URL_CACHE_MAX_ENTRIES", "5000")
+)
+# Sign presigned URLs in-process (SigV4 signing key derived once per day, one
+# HMAC per URL) instead of through boto3 for each one; falls back to boto3
+# when the client's credentials can't be read
+FAST_PRESIGN = os.getenv("FAST_PRESIGN", "true").lower() == "true"
+
+# Optional per-cinema list of good/ image keys written by the image pipeline;
+# read instead of paging list_objects_v2 when present
+IMAGE_MANIFESTS_ENABLED = os.getenv("IMAGE_MANIFESTS_ENABLED", "true").lower() == "true"
 
-s3 = set_s3_client(AWS_REGION)
+# Pre-generated image sizes, each in a good/<size>/ subfolder with the same
+# file stems as good/. visual_listings `image_size=<size>` serves these (webp
+# preferred when both exist), falling back to the original per image.
+IMAGE_SIZE_VARIANTS = tuple(
+    v.strip() for v in os.getenv("IMAGE_SIZE_VARIANTS", "thumb,medium").split(",") if v.strip()
+)
+IMAGE_VARIANT_PREFER_WEBP = (
+    os.getenv("IMAGE_VARIANT_PREFER_WEBP", "true").lower() == "true"
+)
+# visual_listings titles with no exact / prefix image match take the most
+# similar image stem (character trigram Dice score, ignoring articles, format
+# and year tags) scoring at least this; above 1 disables fuzzy matching
+IMAGE_FUZZY_MATCH_THRESHOLD = float(os.getenv("IMAGE_FUZZY_MATCH_THRESHOLD", "0.8"))
+
+# Edge/browser caching. max-age for visual_listings is additionally capped by
+# how long the presigned image URLs in the response stay valid.
+ROUTE_CACHE_MAX_AGE_SECONDS = {
+    "listings": int(os.getenv("LISTINGS_CACHE_MAX_AGE", "300")),
+    "visual_listings": int(os.getenv("VISUAL_LISTINGS_CACHE_MAX_AGE", "300")),
+    "pan_cinema_listings": int(os.getenv("PAN_CINEMA_LISTINGS_CACHE_MAX_AGE", "300")),
+    "upcoming_showings": int(os.getenv("UPCOMING_SHOWINGS_CACHE_MAX_AGE", "60")),
+    "search": int(os.getenv("SEARCH_CACHE_MAX_AGE", "300")),
+}
+# 301 non-canonical listings queries (e.g. cinemas=b,a) to their canonical URL
+CANONICAL_QUERY_REDIRECT = (
+    os.getenv("CANONICAL_QUERY_REDIRECT", "false").lower() == "true"
+)
+
+# Responses precomputed by materialize.py, served on an exact canonical-query
+# match. MATERIALIZED_STORE: "" (off), "s3" (LISTING_BUCKET/MATERIALIZED_PREFIX)
+# or a local directory. Entries older than MATERIALIZED_MAX_AGE_SECONDS, or
+# whose presigned URLs lapse within MATERIALIZED_MIN_VALIDITY_SECONDS, are
+# recomputed instead.
+MATERIALIZED_STORE = os.getenv("MATERIALIZED_STORE", "")
+MATERIALIZED_PREFIX = os.getenv("MATERIALIZED_PREFIX", f"{LISTING_PREFIX}/materialized")
+MATERIALIZED_CACHE_TTL_SECONDS = int(os.getenv("MATERIALIZED_CACHE_TTL_SECONDS", "60"))
+MATERIALIZED_MAX_AGE_SECONDS = int(os.getenv("MATERIALIZED_MAX_AGE_SECONDS", "900"))
+MATERIALIZED_MIN_VALIDITY_SECONDS = int(
+    os.getenv("MATERIALIZED_MIN_VALIDITY_SECONDS", "300")
+)
+
+# Per-request deadline: S3 work stops waiting this long before the Lambda
+# timeout, and cinemas not loaded by then are returned as timed out
+REQUEST_DEADLINE_MARGIN_MS = int(os.getenv("REQUEST_DEADLINE_MARGIN_MS", "1500"))
+DEADLINE_FETCH_WORKERS = int(os.getenv("DEADLINE_FETCH_WORKERS", "16"))
+# botocore per-call limits
+S3_CONNECT_TIMEOUT_SECONDS = float(os.getenv("S3_CONNECT_TIMEOUT_SECONDS", "2"))
+S3_READ_TIMEOUT_SECONDS = float(os.getenv("S3_READ_TIMEOUT_SECONDS", "5"))
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "2"))
+
+# Hedged S3 GETs: a duplicate GET is sent once the first has taken longer than
+# the key's HEDGE_PERCENTILE latency (clamped to HEDGE_MIN/MAX_DELAY_MS;
+# HEDGE_DEFAULT_DELAY_MS until HEDGE_MIN_SAMPLES are seen). Each GET earns
+# HEDGE_BUDGET_RATIO hedges, banked up to HEDGE_BUDGET_BURST.
+HEDGED_GETS_ENABLED = os.getenv("HEDGED_GETS_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY_MS = float(os.getenv("HEDGE_DEFAULT_DELAY_MS", "200"))
+HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", "20"))
+HEDGE_MAX_DELAY_MS = float(os.getenv("HEDGE_MAX_DELAY_MS", "1000"))
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.05"))
+HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", "5"))
+
+# tracemalloc per-stage memory report for each request (slow; diagnostics only)
+MEMORY_PROFILE = os.getenv("MEMORY_PROFILE", "false").lower() == "true"
+# cProfile this fraction of invocations (0 disables, with no overhead) and log
+# the top PROFILE_TOP_N functions by cumulative time; full pstats files are
+# also written to PROFILE_SAVE_DIR (e.g. /tmp) when set
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "15"))
+PROFILE_SAVE_DIR = os.getenv("PROFILE_SAVE_DIR", "")
+
+s3 = set_s3_client(
+    AWS_REGION,
+    connect_timeout=S3_CONNECT_TIMEOUT_SECONDS,
+    read_timeout=S3_READ_TIMEOUT_SECONDS,
+    max_attempts=S3_MAX_ATTEMPTS,
+)
 
 
 def get_cinemas_image_folder_path(cinema: str) -> str:
     return f"{IMAGE_PREFIX}/{cinema}/good/"
 
 
+def get_cinemas_image_manifest_path(cinema: str) -> str:
+    return f"{get_cinemas_image_folder_path(cinema)}manifest.json"
+
+
 def get_cinemas_active_listings_path(cinema: str) -> str:
     return f"{LISTING_PREFIX}/{cinema}/active_listings.json"
@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional, TypedDict
+from typing import List, Dict, NamedTuple, Optional, TypedDict
 
 class StructuredDateStrings(TypedDict):
     Weekday: str  # e.g., "Sunday"
@@ -78,4 +78,10 @@ CinemasCleanedCompactListings = dict[str, CleanedCompactListing]
 # str keys are cinema names
 CleanMatchedFilmsCinemaListings = dict[str, CleanedCompactListing]
 # int keys are db_id's
-PanCinemaCleanedCompactedListings = dict[int, CleanMatchedFilmsCinemaListings]
\ No newline at end of file
+PanCinemaCleanedCompactedListings = dict[int, CleanMatchedFilmsCinemaListings]
+
+
+class DateRange(NamedTuple):
+    """Inclusive YYYY-MM-DD bounds for from/to/days queries."""
+    start: str
+    end: str
@@ -0,0 +1,110 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+from shared.config import REQUEST_DEADLINE_MARGIN_MS, DEADLINE_FETCH_WORKERS
+
+# time.monotonic() by which the current request's S3 work must be done, or
+# None when there is no deadline (local runs, tests, warm-up)
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+# Fetches that outlive their request keep running here and still populate the
+# caches for the next request. They run without the request's deadline (see
+# `_without_deadline`), so an abandoned fetch isn't cut short part way.
+_executor = ThreadPoolExecutor(
+    max_workers=DEADLINE_FETCH_WORKERS, thread_name_prefix="deadline-fetch"
+)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before the work finished."""
+
+
+@contextmanager
+def request_deadline(context, margin_ms: float | None = None):
+    """
+    Set the deadline for the current request from the Lambda `context`:
+    remaining invocation time less `margin_ms` (REQUEST_DEADLINE_MARGIN_MS),
+    kept back to serialize and return whatever has loaded.
+    """
+    if margin_ms is None:
+        margin_ms = REQUEST_DEADLINE_MARGIN_MS
+
+    get_remaining = getattr(context, "get_remaining_time_in_millis", None)
+    deadline = None
+    if callable(get_remaining):
+        budget_ms = max(get_remaining() - margin_ms, 0)
+        deadline = time.monotonic() + budget_ms / 1000
+
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+
+def _remaining_seconds() -> float | None:
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def _check_deadline():
+    """Raise DeadlineExceeded if the request's budget is spent; call before S3 calls."""
+    remaining = _remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def _without_deadline(fn, *args):
+    """`fn(*args)` with no request deadline set; run in a copied context."""
+    _deadline.set(None)
+    return fn(*args)
+
+
+def _call_with_deadline(fn, *args):
+    """
+    `fn(*args)`, waiting no longer than the request's remaining budget.
+
+    Raises:
+        DeadlineExceeded: if the budget ran out first (fn keeps running)
+    """
+    remaining = _remaining_seconds()
+    if remaining is None:
+        return fn(*args)
+
+    _check_deadline()
+    future = _executor.submit(copy_context().run, _without_deadline, fn, *args)
+    done, _ = wait([future], timeout=remaining)
+    if not done:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return future.result()
+
+
+def _map_with_deadline(fn, items: list) -> dict:
+    """
+    {item: fn(item)} for the items that finished within the request's budget,
+    run concurrently. Items that did not finish are left out. Without a
+    deadline every item runs inline, in order.
+    """
+    remaining = _remaining_seconds()
+    if remaining is None:
+        return {item: fn(item) for item in items}
+
+    futures = {
+        item: _executor.submit(copy_context().run, _without_deadline, fn, item)
+        for item in items
+    }
+    wait(futures.values(), timeout=remaining)
+    return {item: f.result() for item, f in futures.items() if f.done()}
+
+
+def _timed_out_entry(message: str) -> dict:
+    """Per-cinema marker for data that missed the deadline; sits alongside {"error": ...} entries."""
+    return {"error": message, "timed_out": True}
+
+
+def _is_timed_out(entry) -> bool:
+    return isinstance(entry, dict) and entry.get("timed_out") is True
@@ -0,0 +1,162 @@
+import time
+from bisect import bisect_left
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+
+from shared.config import (
+    HEDGED_GETS_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_DEFAULT_DELAY_MS,
+    HEDGE_MIN_DELAY_MS,
+    HEDGE_MAX_DELAY_MS,
+    HEDGE_BUDGET_RATIO,
+    HEDGE_BUDGET_BURST,
+)
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open
+LATENCY_BUCKETS_MS = (5, 10, 20, 35, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 2000, 5000)
+# Counts are halved once a histogram holds this many samples, so it follows
+# changes in S3 latency rather than averaging over the container's lifetime
+_HISTOGRAM_DECAY_AT = 500
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedged-get")
+
+
+class LatencyHistogram:
+    """Bucketed GET latencies for one key; bounded size, approximate percentiles."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+
+    def record(self, latency_ms: float):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+        self.total += 1
+        if self.total >= _HISTOGRAM_DECAY_AT:
+            self.counts = [c // 2 for c in self.counts]
+            self.total = sum(self.counts)
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile sample."""
+        threshold = self.total * pct / 100
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= threshold and count:
+                return float(LATENCY_BUCKETS_MS[min(i, len(LATENCY_BUCKETS_MS) - 1)])
+        return float(LATENCY_BUCKETS_MS[-1])
+
+
+# (bucket, key) -> LatencyHistogram, plus one across all keys for cold keys
+_histograms: dict[tuple[str, str], LatencyHistogram] = {}
+_overall = LatencyHistogram()
+# Extra-request budget: each primary GET earns HEDGE_BUDGET_RATIO tokens (up to
+# HEDGE_BUDGET_BURST); each hedge spends one
+_budget_tokens = float(HEDGE_BUDGET_BURST)
+_stats = {"primary": 0, "hedged": 0, "hedge_won": 0, "budget_denied": 0}
+_lock = Lock()
+
+
+def _record_latency(bucket: str, key: str, latency_ms: float):
+    with _lock:
+        _histograms.setdefault((bucket, key), LatencyHistogram()).record(latency_ms)
+        _overall.record(latency_ms)
+
+
+def _hedge_delay_ms(bucket: str, key: str) -> float:
+    """HEDGE_PERCENTILE of the key's observed latency (or all keys' while it is cold)."""
+    with _lock:
+        histogram = _histograms.get((bucket, key))
+        if histogram is None or histogram.total < HEDGE_MIN_SAMPLES:
+            histogram = _overall
+        if histogram.total < HEDGE_MIN_SAMPLES:
+            delay_ms = HEDGE_DEFAULT_DELAY_MS
+        else:
+            delay_ms = histogram.percentile(HEDGE_PERCENTILE)
+    return min(max(delay_ms, HEDGE_MIN_DELAY_MS), HEDGE_MAX_DELAY_MS)
+
+
+def _earn_hedge_budget():
+    global _budget_tokens
+    with _lock:
+        _stats["primary"] += 1
+        _budget_tokens = min(_budget_tokens + HEDGE_BUDGET_RATIO, HEDGE_BUDGET_BURST)
+
+
+def _spend_hedge_budget() -> bool:
+    global _budget_tokens
+    with _lock:
+        if _budget_tokens < 1:
+            _stats["budget_denied"] += 1
+            return False
+        _budget_tokens -= 1
+        _stats["hedged"] += 1
+        return True
+
+
+def _timed_get(s3_client, bucket: str, key: str) -> dict:
+    started = time.perf_counter()
+    response = s3_client.get_object(Bucket=bucket, Key=key)
+    _record_latency(bucket, key, (time.perf_counter() - started) * 1000)
+    return response
+
+
+def _discard_response(future):
+    """Close the losing GET's body so its connection goes back to the pool."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    body = future.result().get("Body")
+    if body is not None and hasattr(body, "close"):
+        body.close()
+
+
+def _hedged_get_object(s3_client, bucket: str, key: str) -> dict:
+    """
+    `s3_client.get_object(Bucket=bucket, Key=key)`, hedged when
+    HEDGED_GETS_ENABLED: if the GET has not returned after the key's
+    HEDGE_PERCENTILE latency, a duplicate is sent (budget permitting) and the
+    first successful response wins. The loser is cancelled if it has not
+    started, otherwise its body is closed when it returns.
+
+    Raises:
+        Exception: the primary's error if every attempt failed
+    """
+    if not HEDGED_GETS_ENABLED:
+        return s3_client.get_object(Bucket=bucket, Key=key)
+
+    _earn_hedge_budget()
+    primary = _executor.submit(_timed_get, s3_client, bucket, key)
+    done, _ = wait([primary], timeout=_hedge_delay_ms(bucket, key) / 1000)
+    if done or not _spend_hedge_budget():
+        return primary.result()
+
+    hedge = _executor.submit(_timed_get, s3_client, bucket, key)
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    if not loser.cancel():
+                        loser.add_done_callback(_discard_response)
+                if future is hedge:
+                    with _lock:
+                        _stats["hedge_won"] += 1
+                return future.result()
+    return primary.result()
+
+
+def _hedging_stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+def _clear_hedging_state():
+    global _budget_tokens, _overall
+    with _lock:
+        _histograms.clear()
+        _overall = LatencyHistogram()
+        _budget_tokens = float(HEDGE_BUDGET_BURST)
+        for name in _stats:
+            _stats[name] = 0
@@ -1,16 +1,146 @@
+import base64
 import json
+from urllib.parse import quote
 
+from shared.config import ROUTE_CACHE_MAX_AGE_SECONDS, STREAM_GZIP_RESPONSES
+from shared.json_stream import encode_json_stream
+from shared.presigned_urls import _presigned_urls_valid_for
 
-def build_response(status_code, body):
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+
+
+def build_response(status_code, body, headers=None):
     """Standard JSON + CORS response"""
 
+    return build_raw_response(status_code, json.dumps(body), headers=headers)
+
+
+def build_raw_response(status_code, raw_body, content_encoding=None, headers=None):
+    """
+    JSON + CORS response for a body that is already serialized.
+
+    `raw_body` is a JSON str, or bytes when `content_encoding` (e.g. "gzip")
+    is set — bytes are base64 encoded as API Gateway requires.
+    """
+    response_headers = {"Content-Type": "application/json", **CORS_HEADERS}
+    response_headers["Cache-Control"] = "no-store"
+    if headers:
+        response_headers.update(headers)
+    response = {"statusCode": status_code, "headers": response_headers}
+
+    if isinstance(raw_body, bytes):
+        if content_encoding:
+            response_headers["Content-Encoding"] = content_encoding
+            response["body"] = base64.b64encode(raw_body).decode("ascii")
+            response["isBase64Encoded"] = True
+            return response
+        raw_body = raw_body.decode("utf-8")
+
+    response["body"] = raw_body
+    return response
+
+
+def build_streamed_response(
+    status_code, body: dict, headers=None, request_headers=None, release=False, depth=1
+):
+    """
+    JSON + CORS response for a large dict, serialized entry by entry, `depth`
+    levels down (see `encode_json_stream`), and gzipped on the fly when
+    STREAM_GZIP_RESPONSES is on and the client accepts it. `release` frees
+    `body`'s entries, down to `depth` levels, as they are written.
+    """
+    gzipped = STREAM_GZIP_RESPONSES and accepts_gzip(request_headers)
+    raw_body = encode_json_stream(body, gzipped=gzipped, depth=depth, release=release)
+    return build_raw_response(
+        status_code,
+        raw_body,
+        content_encoding="gzip" if gzipped else None,
+        headers=headers,
+    )
+
+
+def build_redirect_response(location: str):
+    """
+    Permanent redirect. Only for query -> canonical query mappings that
+    don't depend on config (sorting, de-duplication), since it's cached.
+    """
     return {
-        "statusCode": status_code,
+        "statusCode": 301,
         "headers": {
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET,POST,OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type",
+            **CORS_HEADERS,
+            "Location": location,
+            "Cache-Control": "public, max-age=86400",
         },
-        "body": json.dumps(body),
+        "body": "",
     }
+
+
+def cache_headers(
+    route_type: str, now: float | None = None, valid_for: float | None = None
+) -> dict:
+    """
+    Cache-Control/Vary for a successful response of `route_type`. `valid_for`
+    caps max-age for bodies that go stale sooner (e.g. precomputed ones).
+    """
+    max_age = ROUTE_CACHE_MAX_AGE_SECONDS.get(route_type, 0)
+    if route_type == "visual_listings":
+        # Never let a cached response outlive the image URLs inside it
+        max_age = min(max_age, _presigned_urls_valid_for(now))
+    if valid_for is not None:
+        max_age = min(max_age, int(valid_for))
+    if max_age <= 0:
+        return {"Cache-Control": "no-store"}
+    return {
+        "Cache-Control": f"public, max-age={max_age}, s-maxage={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+
+
+def canonical_query_string(params: dict) -> str:
+    """
+    Stable query string for a set of already-canonical params: names sorted,
+    list values comma-joined, empty values dropped.
+    """
+    parts = []
+    for name in sorted(params):
+        value = params[name]
+        if isinstance(value, (list, tuple)):
+            value = ",".join(value)
+        if value is None or value == "":
+            continue
+        parts.append(f"{quote(name)}={quote(str(value), safe=',')}")
+    return "&".join(parts)
+
+
+def get_header(headers, name: str):
+    """Case-insensitive header lookup (API Gateway v2 lower-cases names, v1 doesn't)."""
+    if not headers:
+        return None
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def accepts_gzip(headers) -> bool:
+    """Whether `Accept-Encoding` lists gzip with a non-zero q-value."""
+    accept_encoding = get_header(headers, "Accept-Encoding") or ""
+    for coding in accept_encoding.lower().split(","):
+        name, *params = (part.strip() for part in coding.split(";"))
+        if name not in ("gzip", "x-gzip"):
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        return q > 0
+    return False
@@ -0,0 +1,59 @@
+import json
+import zlib
+
+# Same output as json.dumps(obj) with default arguments
+_encoder = json.JSONEncoder()
+
+
+def _iter_json_fragments(obj, depth: int = 1, release: bool = False):
+    """
+    Yield `obj` as JSON text in fragments: dicts down to `depth` levels are
+    written entry by entry, anything deeper in one encoder call, so no
+    fragment is larger than one such entry.
+
+    With `release`, entries of every dict written entry by entry (those
+    within `depth` levels) are popped as they are written, so the caller's
+    copy is freed as the body grows. Only use it on dicts the caller owns
+    down to that depth; values encoded whole are never modified.
+    """
+    if depth <= 0 or not isinstance(obj, dict):
+        yield _encoder.encode(obj)
+        return
+
+    yield "{"
+    first = True
+    for key in list(obj):
+        value = obj.pop(key) if release else obj[key]
+        yield ("" if first else ", ") + _encoder.encode(str(key)) + ": "
+        yield from _iter_json_fragments(value, depth - 1, release)
+        first = False
+        del value
+    yield "}"
+
+
+def encode_json_stream(
+    obj, gzipped: bool = False, depth: int = 1, release: bool = False
+) -> str | bytes:
+    """
+    Serialize `obj` fragment by fragment (see `_iter_json_fragments`),
+    producing the same JSON as `json.dumps(obj)`.
+
+    Fragments are fed straight into a gzip compressor when `gzipped`, so
+    peak memory is the largest fragment plus the compressed output instead
+    of the object graph plus the whole serialized string. Uncompressed
+    bodies are joined at the end; with `release` the graph is freed while
+    they are built.
+
+    Returns:
+        str | bytes: JSON text, or gzip-compressed UTF-8 bytes
+    """
+    fragments = _iter_json_fragments(obj, depth=depth, release=release)
+    if not gzipped:
+        return "".join(fragments)
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    compressed = bytearray()
+    for fragment in fragments:
+        compressed += compressor.compress(fragment.encode("utf-8"))
+    compressed += compressor.flush()
+    return bytes(compressed)
@@ -0,0 +1,113 @@
+from shared.config import ALL_CINEMAS_LISTINGS_KEY, get_cinemas_active_listings_path
+from shared.snapshot_cache import _get_snapshot_history
+
+# Length of the ETag prefix used in version tokens (S3 ETags are MD5 hex)
+VERSION_TAG_LENGTH = 12
+
+_MISSING = object()
+
+
+def _version_tag(etag: str) -> str:
+    return etag.strip('"')[:VERSION_TAG_LENGTH]
+
+
+def _listings_version(cinema_etags: dict) -> str:
+    """
+    Version token for a listings response: `cinema:<etag prefix>` per cinema,
+    sorted and comma-joined. Cinemas without a known ETag are left out.
+    """
+    return ",".join(
+        f"{cinema}:{_version_tag(etag)}"
+        for cinema, etag in sorted(cinema_etags.items())
+        if etag
+    )
+
+
+def _parse_listings_version(version: str) -> dict[str, str]:
+    """
+    {cinema: etag prefix} from a `since=` token.
+
+    Raises:
+        ValueError: if the token is malformed
+    """
+    tags = {}
+    for part in version.split(","):
+        cinema, sep, tag = part.strip().partition(":")
+        if not (sep and cinema and tag):
+            raise ValueError(f"Malformed version: {version!r}")
+        tags[cinema] = tag
+    return tags
+
+
+def _find_cinema_listings_version(cinema: str, tag: str) -> dict | None:
+    """
+    A cinema's listings as they were at version `tag`, from the snapshot
+    history of its own object or of the combined file. None once aged out.
+    """
+    for etag, data in _get_snapshot_history(get_cinemas_active_listings_path(cinema)).items():
+        if _version_tag(etag) == tag:
+            return data
+    for etag, data in _get_snapshot_history(ALL_CINEMAS_LISTINGS_KEY).items():
+        if _version_tag(etag) == tag and isinstance(data, dict):
+            cinema_listings = data.get(cinema)
+            return cinema_listings if isinstance(cinema_listings, dict) else None
+    return None
+
+
+def _when_by_date(listing: dict) -> dict:
+    when_entries = listing.get("when")
+    if not isinstance(when_entries, list):
+        return {}
+    return {w.get("date"): w for w in when_entries if isinstance(w, dict)}
+
+
+def _diff_listing(old: dict, new: dict) -> dict | None:
+    """
+    Patch turning `old` into `new`: `set` (new or changed fields), `unset`
+    (removed fields) and, per show date, `when.upserted` / `when.removed`.
+    None when they are equal.
+    """
+    patch = {}
+
+    set_fields = {
+        k: v for k, v in new.items() if k != "when" and old.get(k, _MISSING) != v
+    }
+    if set_fields:
+        patch["set"] = set_fields
+    unset_fields = sorted(k for k in old if k != "when" and k not in new)
+    if unset_fields:
+        patch["unset"] = unset_fields
+
+    old_when = _when_by_date(old)
+    new_when = _when_by_date(new)
+    upserted = [w for d, w in new_when.items() if old_when.get(d) != w]
+    removed = sorted(d for d in old_when if d not in new_when)
+    if upserted or removed:
+        patch["when"] = {}
+        if upserted:
+            patch["when"]["upserted"] = upserted
+        if removed:
+            patch["when"]["removed"] = removed
+
+    return patch or None
+
+
+def _diff_cinema_listings(old: dict, new: dict) -> dict:
+    """`added` and `changed` listings and `removed` titles; {} when unchanged."""
+    added = {t: listing for t, listing in new.items() if t not in old}
+    changed = {}
+    for title, listing in new.items():
+        if title in old:
+            patch = _diff_listing(old[title], listing)
+            if patch:
+                changed[title] = patch
+    removed = sorted(t for t in old if t not in new)
+
+    diff = {}
+    if added:
+        diff["added"] = added
+    if changed:
+        diff["changed"] = changed
+    if removed:
+        diff["removed"] = removed
+    return diff
@@ -1,58 +1,348 @@
 import json
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
 
-from shared.config import s3, LISTING_BUCKET, get_cinemas_active_listings_path
+from shared.config import (
+    s3,
+    LISTING_BUCKET,
+    LISTINGS_CACHE_TTL_SECONDS,
+    COMPACT_SNAPSHOTS,
+    ALL_CINEMAS_LISTINGS_KEY,
+    COMBINED_LISTINGS_MIN_CINEMAS,
+    get_cinemas_active_listings_path,
+)
+from shared.data_types import CleanedCompactListing, DateRange
+from shared.snapshot_cache import Snapshot, _get_snapshot, _get_derived
+from shared.compact_listings import _compact_listings_tree
+from shared.hedging import _hedged_get_object
+from shared.deadline import (
+    DeadlineExceeded,
+    _call_with_deadline,
+    _map_with_deadline,
+    _timed_out_entry,
+    _is_timed_out,
+)
 
+REDACTED_LISTING_FIELDS = frozenset(
+    {
+        "image_to_download",
+        "isImageGood",
+        "s3ImageURL",
+    }
+)
 
-def _get_cinemas_raw_listings(cinemas: list[str]) -> dict:
+# Top-level fields a client may ask for with `fields=`; `image_url` is only
+# present on visual_listings. Nested `_additional_info.<key>` is also allowed.
+PROJECTABLE_LISTING_FIELDS = (
+    frozenset(CleanedCompactListing.__annotations__) - REDACTED_LISTING_FIELDS
+) | {"image_url"}
+# Accepted in `fields=` but never projected: the title is each listing's dict
+# key, so it's always returned
+KEY_LISTING_FIELDS = frozenset({"title"})
+
+
+def _is_error_entry(entry) -> bool:
+    """A cinema's {"error": ...} entry in place of its listings (or images), timed out or not."""
+    return isinstance(entry, dict) and isinstance(entry.get("error"), str)
+
+
+def _failed_cinemas(listings_by_cinema: dict) -> list[str]:
+    """Cinemas that failed to load for a reason other than the request deadline."""
+    return [
+        cinema
+        for cinema, listings in listings_by_cinema.items()
+        if _is_error_entry(listings) and not _is_timed_out(listings)
+    ]
+
+
+def _normalize_name(name: str) -> str:
+    name = name.lower().strip()
+    name = re.sub(r"[^a-z0-9]+", "_", name)
+    return name.strip("_")
+
+
+def _load_listings_snapshot(key: str, listing_depth: int = 1) -> Snapshot:
+    response = _hedged_get_object(s3, LISTING_BUCKET, key)
+    listings_data = json.loads(response["Body"].read().decode("utf-8"))
+    if COMPACT_SNAPSHOTS:
+        listings_data = _compact_listings_tree(listings_data, listing_depth)
+    return Snapshot(data=listings_data, etag=response.get("ETag"))
+
+
+def _get_combined_listings() -> Snapshot | None:
+    """
+    The combined {cinema: listings} snapshot, or None if it is missing or
+    unreadable (callers then fall back to per-cinema objects).
+    """
+    try:
+        snapshot = _get_snapshot(
+            ALL_CINEMAS_LISTINGS_KEY,
+            lambda: _load_listings_snapshot(ALL_CINEMAS_LISTINGS_KEY, listing_depth=2),
+            LISTINGS_CACHE_TTL_SECONDS,
+            keep_history=True,  # for `since` diffs
+            # unchanged cinemas keep their objects, and so their indexes
+            share_unchanged_values=True,
+        )
+    except Exception as e:
+        print(f"Combined listings snapshot unavailable, fetching per cinema: {e}")
+        return None
+
+    if not isinstance(snapshot.data, dict):
+        print("Combined listings snapshot is malformed, fetching per cinema")
+        return None
+    return snapshot
+
+
+def _load_cinema_listings(cinema: str) -> tuple[dict, str | None]:
+    cinema_json_key = get_cinemas_active_listings_path(cinema)
+    try:
+        snapshot = _get_snapshot(
+            cinema_json_key,
+            lambda: _load_listings_snapshot(cinema_json_key),
+            LISTINGS_CACHE_TTL_SECONDS,
+            keep_history=True,  # for `since` diffs
+        )
+        return snapshot.data, snapshot.etag
+    except s3.exceptions.NoSuchKey:
+        return {"error": f"No active listings found for {cinema}"}, None
+    except Exception as e:
+        return {"error": f"Failed to load listings for {cinema}: {str(e)}"}, None
+
+
+def _get_cinemas_versioned_listings(cinemas: list[str]) -> tuple[dict, dict]:
+    """
+    Parsed active listings per cinema, plus the ETag of the S3 object each
+    cinema's listings came from (None when unknown or failed to load).
+
+    Snapshots are cached for LISTINGS_CACHE_TTL_SECONDS and shared between
+    requests, so callers must copy before modifying them. Large requests are
+    sliced from the combined snapshot (one GET); cinemas missing from it are
+    fetched individually, concurrently, within the request deadline. Cinemas
+    that miss it get a timed-out entry.
+    """
     cinema_listings = {}
+    cinema_etags = {}
 
-    for cinema in cinemas:
-        cinema_json_key = get_cinemas_active_listings_path(cinema)
+    combined = None
+    if len(set(cinemas)) >= COMBINED_LISTINGS_MIN_CINEMAS:
         try:
-            response = s3.get_object(Bucket=LISTING_BUCKET, Key=cinema_json_key)
-            listings_data = json.loads(response["Body"].read().decode("utf-8"))
-            cinema_listings[cinema] = listings_data
-        except s3.exceptions.NoSuchKey:
-            cinema_listings[cinema] = {
-                "error": f"No active listings found for {cinema}"
-            }
-        except Exception as e:
-            cinema_listings[cinema] = {
-                "error": f"Failed to load listings for {cinema}: {str(e)}"
+            combined = _call_with_deadline(_get_combined_listings)
+        except DeadlineExceeded:
+            print("Combined listings snapshot missed the deadline, fetching per cinema")
+
+    to_fetch = []
+    for cinema in cinemas:
+        if combined is not None and isinstance(combined.data.get(cinema), dict):
+            cinema_listings[cinema] = combined.data[cinema]
+            cinema_etags[cinema] = combined.etag
+        else:
+            to_fetch.append(cinema)
+
+    fetched = _map_with_deadline(_load_cinema_listings, to_fetch)
+    for cinema in to_fetch:
+        if cinema in fetched:
+            cinema_listings[cinema], cinema_etags[cinema] = fetched[cinema]
+        else:
+            cinema_listings[cinema] = _timed_out_entry(
+                f"Timed out loading listings for {cinema}"
+            )
+            cinema_etags[cinema] = None
+
+    # Keep the requested cinema order
+    return {c: cinema_listings[c] for c in cinemas}, cinema_etags
+
+
+def _get_cinemas_raw_listings(cinemas: list[str]) -> dict:
+    """Parsed active listings per cinema; see _get_cinemas_versioned_listings."""
+    return _get_cinemas_versioned_listings(cinemas)[0]
+
+
+def _parse_fields_param(raw_fields) -> tuple[str, ...] | None:
+    """
+    Parse a `fields=` query param into a canonical (sorted, de-duplicated)
+    tuple of field paths. Returns None when no projection was requested.
+
+    Raises:
+        ValueError: if any field is not a projectable listing field
+    """
+    if isinstance(raw_fields, str):
+        raw_fields = raw_fields.split(",")
+    fields = {f.strip() for f in raw_fields or [] if isinstance(f, str) and f.strip()}
+    if not fields:
+        return None
+
+    for field in fields:
+        if field in KEY_LISTING_FIELDS:
+            continue
+        parent, dot, child = field.partition(".")
+        if parent not in PROJECTABLE_LISTING_FIELDS or (dot and not child):
+            raise ValueError(f"Unknown field: {field}")
+        if child and parent != "_additional_info":
+            raise ValueError(f"Field does not support sub-fields: {field}")
+
+    return tuple(sorted(fields))
+
+
+@lru_cache(maxsize=64)
+def _compile_listing_projector(fields: tuple[str, ...] | None = None):
+    """
+    Compile a field projection into a reusable `listing -> dict` function.
+    Redacted fields are always dropped; `None` keeps every other field.
+    """
+    if fields is None:
+
+        def _project_all(listing: dict) -> dict:
+            return {
+                k: v for k, v in listing.items() if k not in REDACTED_LISTING_FIELDS
             }
 
-    return cinema_listings
+        return _project_all
 
+    whole_fields = tuple(
+        f
+        for f in fields
+        if "." not in f
+        and f not in REDACTED_LISTING_FIELDS
+        and f not in KEY_LISTING_FIELDS
+    )
+    sub_fields = {}
+    for field in fields:
+        parent, _, child = field.partition(".")
+        if child and parent not in whole_fields:
+            sub_fields.setdefault(parent, set()).add(child)
+    sub_fields = tuple((parent, frozenset(c)) for parent, c in sub_fields.items())
 
-def _redact_listings_fields(listings_with_good_images: dict) -> dict:
-    FIELDS_TO_REMOVE = {
-        "image_to_download",
-        "isImageGood",
-        "s3ImageURL",
-    }
+    def _project(listing: dict) -> dict:
+        projected = {k: listing[k] for k in whole_fields if k in listing}
+        for parent, children in sub_fields:
+            nested = listing.get(parent)
+            if isinstance(nested, dict):
+                projected[parent] = {
+                    k: v for k, v in nested.items() if k in children
+                }
+        return projected
+
+    return _project
+
+
+# ===== COMPACT RESPONSE FORMAT =====
+# format=compact: each distinct `when` date (with its structured strings and
+# year/month/day) is listed once in a top-level table, and `when` becomes
+# [[date index, showtimes], ...]. format=columnar: `when` is parallel
+# {"date": [date index, ...], "time": [showtime, ...]} arrays, one per showtime.
+RESPONSE_FORMATS = ("compact", "columnar")
+
+
+class DateTable:
+    """Distinct `when` dates of one compact response, in first-seen order."""
+
+    def __init__(self):
+        self.entries: list[dict] = []
+        self._indexes: dict[str, int] = {}
+
+    def index_of(self, when: dict) -> int:
+        show_date = when.get("date")
+        index = self._indexes.get(show_date)
+        if index is None:
+            index = self._indexes[show_date] = len(self.entries)
+            self.entries.append({k: v for k, v in when.items() if k != "showtimes"})
+        return index
+
+
+def _compile_when_encoder(response_format: str | None, date_table: DateTable | None):
+    """`when` list -> its `response_format` form, or None to leave it verbose."""
+    if response_format is None:
+        return None
+    index_of = date_table.index_of
+
+    if response_format == "columnar":
+
+        def _encode_columnar(when_entries: list) -> dict:
+            dates, times = [], []
+            for when in when_entries:
+                if not isinstance(when, dict):
+                    continue
+                index = index_of(when)
+                for showtime in when.get("showtimes") or []:
+                    dates.append(index)
+                    times.append(showtime)
+            return {"date": dates, "time": times}
+
+        return _encode_columnar
+
+    def _encode_compact(when_entries: list) -> list:
+        return [
+            [index_of(when), when.get("showtimes") or []]
+            for when in when_entries
+            if isinstance(when, dict)
+        ]
+
+    return _encode_compact
+
+
+def _compact_response(
+    listings_by_cinema: dict, response_format: str, date_table: DateTable
+) -> dict:
+    """Wrap compact-encoded listings with their date table."""
+    response = {"format": response_format, "dates": date_table.entries}
+    timed_out = [c for c, v in listings_by_cinema.items() if _is_timed_out(v)]
+    if timed_out:
+        response["timed_out_cinemas"] = timed_out
+    failed = _failed_cinemas(listings_by_cinema)
+    if failed:
+        response["failed_cinemas"] = failed
+    response["listings"] = listings_by_cinema
+    return response
+
+
+def _redact_listings_fields(
+    listings_with_good_images: dict,
+    fields: tuple[str, ...] | None = None,
+    encode_when=None,
+) -> dict:
+    """
+    Drop redacted fields (or project to `fields`) in every cinema's listings.
+    With `encode_when` (see `_compile_when_encoder`), each projected listing's
+    `when` is written in that form instead of copied verbatim.
+    """
+    project = _compile_listing_projector(fields)
 
     redacted = {}
 
     for cinema, listings in listings_with_good_images.items():
+        if _is_error_entry(listings):
+            redacted[cinema] = listings
+            continue
         cleaned_listings = {}
         for title, data in listings.items():
             if not isinstance(data, dict):
                 continue
-            cleaned = {k: v for k, v in data.items() if k not in FIELDS_TO_REMOVE}
-            if cleaned:
-                cleaned_listings[title] = cleaned
+            # Listings with nothing left after redaction are dropped; an
+            # explicit projection never drops a listing on its own.
+            if not any(k not in REDACTED_LISTING_FIELDS for k in data):
+                continue
+            projected = project(data)
+            if encode_when is not None and isinstance(projected.get("when"), list):
+                projected["when"] = encode_when(projected["when"])
+            cleaned_listings[title] = projected
         if cleaned_listings:
             redacted[cinema] = cleaned_listings
 
     return redacted
 
 
-def _filter_listings_by_dates(cinema_listings: dict, dates: list[str]) -> dict:
+def _filter_listings_by_dates(cinema_listings: dict, dates: list[str] | DateRange) -> dict:
     if not dates:
         return cinema_listings
+    if isinstance(dates, DateRange):
+        return _filter_listings_by_date_range(cinema_listings, dates)
 
+    dates = frozenset(dates)
     filtered = {}
     for title, listing_data in cinema_listings.items():
+        if not isinstance(listing_data, dict):
+            continue  # e.g. the {"error": ...} entry for a cinema that failed to load
         when_entries = listing_data.get("when", [])
         if not isinstance(when_entries, list):
             continue
@@ -66,14 +356,132 @@ def _filter_listings_by_dates(cinema_listings: dict, dates: list[str]) -> dict:
     return filtered
 
 
+def _filter_listing_by_dates(listing_data, dates: list[str] | DateRange) -> dict | None:
+    """
+    One listing trimmed to its showings on `dates`, or None if it has none.
+    Scans its `when` entries directly: no per-cinema date index is built for
+    a single listing.
+    """
+    when_entries = listing_data.get("when") if isinstance(listing_data, dict) else None
+    if not isinstance(when_entries, list):
+        return None
+
+    if isinstance(dates, DateRange):
+        filtered_when = [
+            w for w in when_entries
+            if isinstance(w, dict)
+            and isinstance(w.get("date"), str)
+            and dates.start <= w["date"] <= dates.end
+        ]
+    else:
+        dates = frozenset(dates)
+        filtered_when = [
+            w for w in when_entries if isinstance(w, dict) and w.get("date") in dates
+        ]
+    if not filtered_when:
+        return None
+    filtered_listing = listing_data.copy()
+    filtered_listing["when"] = filtered_when
+    return filtered_listing
+
+
+def _build_date_index(cinema_listings: dict) -> tuple[list[str], list[list[tuple]]]:
+    """
+    Sorted distinct show dates, and for each date the (title, when entry)
+    pairs showing on it, so a date range is answered with one slice.
+    """
+    entries_by_date = {}
+    for title, listing_data in cinema_listings.items():
+        when_entries = listing_data.get("when") if isinstance(listing_data, dict) else None
+        if not isinstance(when_entries, list):
+            continue
+        for when in when_entries:
+            show_date = when.get("date") if isinstance(when, dict) else None
+            if isinstance(show_date, str):
+                entries_by_date.setdefault(show_date, []).append((title, when))
+
+    sorted_dates = sorted(entries_by_date)
+    return sorted_dates, [entries_by_date[d] for d in sorted_dates]
+
+
+def _filter_listings_by_date_range(cinema_listings: dict, date_range: DateRange) -> dict:
+    sorted_dates, entries = _get_derived(cinema_listings, "date_index", _build_date_index)
+    lo = bisect_left(sorted_dates, date_range.start)
+    hi = bisect_right(sorted_dates, date_range.end)
+
+    when_by_title = {}
+    for date_entries in entries[lo:hi]:
+        for title, when in date_entries:
+            when_by_title.setdefault(title, []).append(when)
+
+    filtered = {}
+    for title, filtered_when in when_by_title.items():
+        filtered_listing = cinema_listings[title].copy()
+        filtered_listing["when"] = filtered_when
+        filtered[title] = filtered_listing
+
+    return filtered
+
+
+_SHOWTIME_RE = re.compile(r"^\d{2}:\d{2}$")
+
+
+def _build_showtime_index(cinema_listings: dict) -> tuple[list[str], list[tuple]]:
+    """
+    Every showing in a cinema's listings as (start, title, showtime) rows
+    sorted by start ("YYYY-MM-DDTHH:MM", which sorts chronologically as a
+    string), plus the parallel list of starts to bisect on.
+    """
+    rows = []
+    for title, listing_data in cinema_listings.items():
+        when_entries = listing_data.get("when") if isinstance(listing_data, dict) else None
+        if not isinstance(when_entries, list):
+            continue
+        for when in when_entries:
+            if not isinstance(when, dict):
+                continue
+            show_date = when.get("date")
+            showtimes = when.get("showtimes")
+            if not isinstance(show_date, str) or not isinstance(showtimes, list):
+                continue
+            for showtime in showtimes:
+                if isinstance(showtime, str) and _SHOWTIME_RE.match(showtime):
+                    rows.append((f"{show_date}T{showtime}", title, showtime))
+
+    rows.sort()
+    return [row[0] for row in rows], rows
+
+
+def _showings_between(cinema_listings: dict, start: str, end: str) -> list[tuple]:
+    """(start, title, showtime) rows with `start` <= row start < `end`, in order."""
+    starts, rows = _get_derived(cinema_listings, "showtime_index", _build_showtime_index)
+    return rows[bisect_left(starts, start) : bisect_left(starts, end)]
+
+
 def _filter_cinemas_listings_by_dates(
-    listings_by_cinema: dict, dates: list[str]
+    listings_by_cinema: dict, dates: list[str] | DateRange
 ) -> dict:
     filtered_all = {}
     for cinema, listings in listings_by_cinema.items():
         if not isinstance(listings, dict):
             continue
+        if _is_error_entry(listings):
+            # Surfaced in the response so clients can tell "nothing showing"
+            # from "didn't load" (or "didn't load in time")
+            filtered_all[cinema] = listings
+            continue
         filtered_listings = _filter_listings_by_dates(listings, dates)
         if filtered_listings:
             filtered_all[cinema] = filtered_listings
     return filtered_all
+
+
+def _listing_counts_by_cinema(listings_by_cinema: dict) -> dict:
+    """Compact log form: number of listings (or images) per cinema, or its error entry."""
+    counts = {}
+    for cinema, listings in listings_by_cinema.items():
+        if isinstance(listings, dict) and "error" in listings:
+            counts[cinema] = listings
+        elif isinstance(listings, (dict, list)):
+            counts[cinema] = len(listings)
+    return counts
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import time
+from typing import NamedTuple
+
+from shared.config import (
+    s3,
+    LISTING_BUCKET,
+    MATERIALIZED_STORE,
+    MATERIALIZED_PREFIX,
+    MATERIALIZED_CACHE_TTL_SECONDS,
+    MATERIALIZED_MAX_AGE_SECONDS,
+    MATERIALIZED_MIN_VALIDITY_SECONDS,
+)
+from shared.snapshot_cache import Snapshot, _get_snapshot
+
+
+class MaterializedResponse(NamedTuple):
+    """A precomputed response body plus what's needed to serve it."""
+
+    body: bytes
+    content_encoding: str | None = None
+    headers: dict | None = None  # extra response headers, e.g. X-Listings-Version
+    generated_at: float = 0.0
+    expires_at: float | None = None  # e.g. when presigned URLs in the body lapse
+
+
+# Stored objects are one JSON header line (everything but the body) followed by
+# the body bytes, so serving an entry is a single read with no body parsing
+_HEADER_END = b"\n"
+
+
+def _entry_key(canonical_qs: str) -> str:
+    digest = hashlib.sha256(canonical_qs.encode("utf-8")).hexdigest()[:32]
+    return f"{MATERIALIZED_PREFIX}/{digest}.bin"
+
+
+def _index_key() -> str:
+    return f"{MATERIALIZED_PREFIX}/index.json"
+
+
+def _encode_entry(entry: MaterializedResponse) -> bytes:
+    header = {
+        "content_encoding": entry.content_encoding,
+        "headers": entry.headers,
+        "generated_at": entry.generated_at,
+        "expires_at": entry.expires_at,
+    }
+    return json.dumps(header).encode("utf-8") + _HEADER_END + entry.body
+
+
+def _decode_entry(raw: bytes) -> MaterializedResponse:
+    header, _, body = raw.partition(_HEADER_END)
+    return MaterializedResponse(body=body, **json.loads(header.decode("utf-8")))
+
+
+# ===== STORE I/O =====
+# MATERIALIZED_STORE is "s3" (LISTING_BUCKET under MATERIALIZED_PREFIX) or a
+# local directory path (tests, local runs)
+def _read_store_object(key: str, store: str | None = None) -> Snapshot:
+    store = MATERIALIZED_STORE if store is None else store
+    if store == "s3":
+        response = s3.get_object(Bucket=LISTING_BUCKET, Key=key)
+        return Snapshot(data=response["Body"].read(), etag=response.get("ETag"))
+    with open(os.path.join(store, key), "rb") as f:
+        return Snapshot(data=f.read())
+
+
+def _write_store_object(key: str, data: bytes, store: str | None = None):
+    store = MATERIALIZED_STORE if store is None else store
+    if store == "s3":
+        s3.put_object(Bucket=LISTING_BUCKET, Key=key, Body=data)
+        return
+    path = os.path.join(store, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _put_materialized_responses(
+    entries: dict[str, MaterializedResponse], store: str | None = None
+):
+    """Write `entries` ({canonical query: response}), then the index naming them."""
+    for canonical_qs, entry in entries.items():
+        _write_store_object(_entry_key(canonical_qs), _encode_entry(entry), store)
+    index = {qs: _entry_key(qs) for qs in sorted(entries)}
+    _write_store_object(_index_key(), json.dumps(index).encode("utf-8"), store)
+
+
+# ===== LOOKUP =====
+def _get_materialized_index() -> dict:
+    snapshot = _get_snapshot(
+        f"materialized:{_index_key()}",
+        lambda: Snapshot(data=json.loads(_read_store_object(_index_key()).data)),
+        MATERIALIZED_CACHE_TTL_SECONDS,
+    )
+    return snapshot.data
+
+
+def _get_materialized_response(
+    canonical_qs: str, now: float | None = None
+) -> MaterializedResponse | None:
+    """
+    The stored response for exactly `canonical_qs`, or None on a miss: not in
+    the index, unreadable, older than MATERIALIZED_MAX_AGE_SECONDS, or about
+    to expire. The index and entries are cached like any other snapshot.
+    """
+    if not MATERIALIZED_STORE:
+        return None
+    try:
+        key = _get_materialized_index().get(canonical_qs)
+        if key is None:
+            return None
+        entry = _get_snapshot(
+            f"materialized:{key}",
+            lambda: Snapshot(data=_decode_entry(_read_store_object(key).data)),
+            MATERIALIZED_CACHE_TTL_SECONDS,
+        ).data
+    except Exception as e:
+        print(f"Materialized response unavailable for {canonical_qs}: {e}")
+        return None
+
+    now = time.time() if now is None else now
+    if now - entry.generated_at > MATERIALIZED_MAX_AGE_SECONDS:
+        print(f"Materialized response for {canonical_qs} is too old, recomputing")
+        return None
+    if entry.expires_at is not None and entry.expires_at - now < MATERIALIZED_MIN_VALIDITY_SECONDS:
+        print(f"Materialized response for {canonical_qs} is about to expire, recomputing")
+        return None
+    return entry
@@ -0,0 +1,74 @@
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from shared.config import MEMORY_PROFILE
+
+_TOP_ALLOCATIONS = 3
+
+# Per-thread profile of the request in flight: list of stage records, or None
+_local = threading.local()
+
+
+@contextmanager
+def memory_profile(route: str, enabled: bool | None = None):
+    """
+    Profile one request with tracemalloc when MEMORY_PROFILE is on. Stages
+    are marked with `_memory_checkpoint`; on exit a per-stage report of
+    current/peak traced memory and the top new allocation sites is printed.
+
+    Yields the list of stage records (empty when profiling is off).
+    """
+    if enabled is None:
+        enabled = MEMORY_PROFILE
+    if not enabled:
+        yield []
+        return
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    _local.stages = []
+    _local.baseline = baseline
+    _local.last_snapshot = tracemalloc.take_snapshot()
+    try:
+        yield _local.stages
+    finally:
+        stages = _local.stages
+        _local.stages = None
+        _local.last_snapshot = None
+        if started_tracing:
+            tracemalloc.stop()
+        print(f"Memory profile for {route}:")
+        for stage in stages:
+            print(
+                f"  {stage['stage']}: current={stage['current_kb']}KB "
+                f"peak={stage['peak_kb']}KB top={stage['top_allocations']}"
+            )
+
+
+def _memory_checkpoint(stage: str):
+    """Record memory at the end of `stage`; a no-op unless profiling."""
+    stages = getattr(_local, "stages", None)
+    if stages is None:
+        return
+
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    top = snapshot.compare_to(_local.last_snapshot, "lineno")[:_TOP_ALLOCATIONS]
+    stages.append(
+        {
+            "stage": stage,
+            "current_kb": round((current - _local.baseline) / 1024, 1),
+            "peak_kb": round((peak - _local.baseline) / 1024, 1),
+            "top_allocations": [
+                f"{stat.traceback[0].filename.rsplit('/', 1)[-1]}:"
+                f"{stat.traceback[0].lineno} {stat.size_diff // 1024:+}KB"
+                for stat in top
+            ],
+        }
+    )
+    _local.last_snapshot = snapshot
+    tracemalloc.reset_peak()
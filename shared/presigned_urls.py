@@ -0,0 +1,117 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from shared.aws import _generate_presigned_url
+from shared.sigv4 import _client_signing_context, presign_s3_get_urls
+from shared.config import (
+    FAST_PRESIGN,
+    PRESIGNED_URL_WINDOW_SECONDS,
+    PRESIGNED_URL_GRACE_SECONDS,
+    PRESIGNED_URL_CACHE_MAX_ENTRIES,
+)
+
+# (bucket, key) -> (url, window_start). Ordered oldest-used first for LRU eviction.
+_presigned_url_cache: OrderedDict = OrderedDict()
+_presigned_url_cache_lock = Lock()
+
+
+def _presign_window(now: float | None = None) -> tuple[int, int]:
+    """Return the (start, end) epoch seconds of the window containing `now`."""
+    now = int(time.time() if now is None else now)
+    window_start = now - now % PRESIGNED_URL_WINDOW_SECONDS
+    return window_start, window_start + PRESIGNED_URL_WINDOW_SECONDS
+
+
+def _presigned_urls_valid_for(now: float | None = None) -> int:
+    """Seconds every URL handed out at `now` is still guaranteed to be valid."""
+    now = int(time.time() if now is None else now)
+    _, window_end = _presign_window(now)
+    return window_end + PRESIGNED_URL_GRACE_SECONDS - now
+
+
+def _sign_urls(
+    s3_client, bucket: str, keys: list[str], now: int
+) -> dict[str, str | None]:
+    """
+    Fresh URLs for `keys`, valid until the current window's end plus grace.
+
+    With FAST_PRESIGN and a boto3 client that presigns with SigV4, they are
+    signed in one batch with the client's credentials, dated at the window
+    start: every URL of a window is then identical however often it's
+    re-signed, and the SigV4 key is derived once per day. Otherwise each
+    goes through boto3.
+    """
+    window_start, window_end = _presign_window(now)
+    context = _client_signing_context(s3_client, bucket) if FAST_PRESIGN else None
+    if context is not None:
+        return presign_s3_get_urls(
+            context.credentials,
+            context.region,
+            context.base_url,
+            keys,
+            expires_in=window_end + PRESIGNED_URL_GRACE_SECONDS - window_start,
+            signed_at=window_start,
+        )
+
+    expires_in = window_end + PRESIGNED_URL_GRACE_SECONDS - now
+    return {
+        key: _generate_presigned_url(s3_client, bucket, key, expires_in=expires_in)
+        for key in keys
+    }
+
+
+def _get_presigned_urls(
+    s3_client, bucket: str, keys: list[str], now: float | None = None
+) -> dict[str, str | None]:
+    """
+    Presigned GET URLs for `keys`, reusing those issued earlier in the
+    current window so browsers and CDNs see stable URLs. Keys not yet signed
+    this window are signed together (see `_sign_urls`).
+
+    A new URL is signed once per window; it expires a grace period after the
+    window ends, so a URL served at the end of a window is still usable.
+
+    Returns:
+        dict: {key: url, or None if signing failed (not cached)}
+    """
+    now = int(time.time() if now is None else now)
+    window_start, _ = _presign_window(now)
+
+    urls = {}
+    missing = []
+    with _presigned_url_cache_lock:
+        for key in keys:
+            cached = _presigned_url_cache.get((bucket, key))
+            if cached is not None and cached[1] == window_start:
+                _presigned_url_cache.move_to_end((bucket, key))
+                urls[key] = cached[0]
+            else:
+                missing.append(key)
+    if not missing:
+        return urls
+
+    signed = _sign_urls(s3_client, bucket, list(dict.fromkeys(missing)), now)
+    urls.update(signed)
+    with _presigned_url_cache_lock:
+        for key, url in signed.items():
+            if url is None:
+                continue
+            _presigned_url_cache[(bucket, key)] = (url, window_start)
+            _presigned_url_cache.move_to_end((bucket, key))
+        while len(_presigned_url_cache) > PRESIGNED_URL_CACHE_MAX_ENTRIES:
+            _presigned_url_cache.popitem(last=False)
+
+    return urls
+
+
+def _get_presigned_url(
+    s3_client, bucket: str, key: str, now: float | None = None
+) -> str | None:
+    """Presigned GET URL for one key; see `_get_presigned_urls`."""
+    return _get_presigned_urls(s3_client, bucket, [key], now=now)[key]
+
+
+def _clear_presigned_url_cache():
+    with _presigned_url_cache_lock:
+        _presigned_url_cache.clear()
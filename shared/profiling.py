@@ -0,0 +1,96 @@
+import cProfile
+import functools
+import os
+import pstats
+import random
+import time
+
+from shared.config import PROFILE_SAMPLE_RATE, PROFILE_TOP_N, PROFILE_SAVE_DIR
+
+
+def _format_top_functions(profiler: cProfile.Profile, top_n: int) -> list[str]:
+    """One compact line per function, highest cumulative time first."""
+    stats = pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE)
+    lines = []
+    for func in stats.fcn_list[:top_n]:
+        _, calls, tottime, cumtime, _ = stats.stats[func]
+        filename, lineno, name = func
+        location = f"{filename.rsplit('/', 1)[-1]}:{lineno}" if lineno else filename
+        lines.append(
+            f"{cumtime * 1000:8.1f}ms cum {tottime * 1000:8.1f}ms own "
+            f"{calls:>6}x {location}({name})"
+        )
+    return lines
+
+
+def _save_profile(profiler: cProfile.Profile, save_dir: str, context) -> str | None:
+    request_id = getattr(context, "aws_request_id", None) or "local"
+    path = os.path.join(save_dir, f"profile-{int(time.time() * 1000)}-{request_id}.pstats")
+    try:
+        os.makedirs(save_dir, exist_ok=True)
+        profiler.dump_stats(path)
+    except OSError as e:
+        print(f"Could not save profile to {path}: {e}")
+        return None
+    return path
+
+
+def sampled_profile(
+    handler=None,
+    *,
+    sample_rate: float | None = None,
+    top_n: int | None = None,
+    save_dir: str | None = None,
+):
+    """
+    Decorate a Lambda handler so `sample_rate` (PROFILE_SAMPLE_RATE) of its
+    invocations run under cProfile. After a profiled invocation the top
+    `top_n` functions by cumulative time are printed, and the full stats are
+    dumped to `save_dir` when set.
+
+    Only the handler's thread is profiled: time spent waiting on the S3 worker
+    pools shows up as the wait, not as the workers' own calls. With sampling
+    off the handler is returned undecorated.
+    """
+    if handler is None:
+        return functools.partial(
+            sampled_profile, sample_rate=sample_rate, top_n=top_n, save_dir=save_dir
+        )
+    sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+    top_n = PROFILE_TOP_N if top_n is None else top_n
+    save_dir = PROFILE_SAVE_DIR if save_dir is None else save_dir
+    if sample_rate <= 0:
+        return handler
+
+    @functools.wraps(handler)
+    def _profiled_handler(event, context):
+        if random.random() >= sample_rate:
+            return handler(event, context)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another profiler is active (e.g. a concurrent invocation in a
+            # local load test on Python 3.12+)
+            print(f"Profiling skipped: {e}")
+            return handler(event, context)
+
+        started = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            profiler.disable()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(
+                f"Profile of {handler.__name__} ({elapsed_ms:.1f}ms), "
+                f"top {top_n} by cumulative time:"
+            )
+            for line in _format_top_functions(profiler, top_n):
+                print("  " + line)
+            if save_dir:
+                path = _save_profile(profiler, save_dir, context)
+                if path:
+                    print("Full profile saved to:", path)
+
+    return _profiled_handler
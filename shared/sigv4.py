@@ -0,0 +1,206 @@
+import hashlib
+import hmac
+import time
+from threading import Lock
+from typing import NamedTuple
+from urllib.parse import parse_qs, quote, urlsplit
+
+ALGORITHM = "AWS4-HMAC-SHA256"
+# Presigned GETs sign only the host header and never the payload
+_SIGNED_HEADERS = "host"
+_UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+# (access key, datestamp, region, service) -> derived signing key. A key is
+# valid for one UTC day, so only a couple of entries are ever live.
+_signing_keys: dict[tuple[str, str, str, str], bytes] = {}
+_signing_keys_lock = Lock()
+_SIGNING_KEYS_MAX_ENTRIES = 8
+
+
+class SigningCredentials(NamedTuple):
+    access_key: str
+    secret_key: str
+    token: str | None = None
+
+
+def _hmac_sha256(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _derive_signing_key(
+    secret_key: str, datestamp: str, region: str, service: str = "s3"
+) -> bytes:
+    """kSigning = HMAC(HMAC(HMAC(HMAC("AWS4" + secret, date), region), service), "aws4_request")"""
+    key = _hmac_sha256(f"AWS4{secret_key}".encode("utf-8"), datestamp)
+    key = _hmac_sha256(key, region)
+    key = _hmac_sha256(key, service)
+    return _hmac_sha256(key, "aws4_request")
+
+
+def _get_signing_key(
+    credentials: SigningCredentials, datestamp: str, region: str, service: str = "s3"
+) -> bytes:
+    """The derived signing key, computed once per day, region and credential set."""
+    cache_key = (credentials.access_key, datestamp, region, service)
+    with _signing_keys_lock:
+        signing_key = _signing_keys.get(cache_key)
+    if signing_key is not None:
+        return signing_key
+
+    signing_key = _derive_signing_key(credentials.secret_key, datestamp, region, service)
+    with _signing_keys_lock:
+        if len(_signing_keys) >= _SIGNING_KEYS_MAX_ENTRIES:
+            _signing_keys.clear()
+        _signing_keys[cache_key] = signing_key
+    return signing_key
+
+
+def _quote_query_value(value: str) -> str:
+    return quote(value, safe="-_.~")
+
+
+def presign_s3_get_urls(
+    credentials: SigningCredentials,
+    region: str,
+    base_url: str,
+    keys: list[str],
+    expires_in: int,
+    signed_at: float | None = None,
+) -> dict[str, str]:
+    """
+    SigV4 query-string presigned GET URLs for `keys` under `base_url` (the
+    bucket's URL up to and including the "/" before the key, e.g.
+    "https://bucket.s3.amazonaws.com/"), in the same form as boto3's
+    `generate_presigned_url("get_object", ...)`.
+
+    Everything but the per-key canonical request and final HMAC is computed
+    once per call, and the signing key once per day (see `_get_signing_key`).
+    `signed_at` (epoch seconds, default now) becomes X-Amz-Date; URLs are
+    valid from then for `expires_in` seconds.
+
+    Returns:
+        dict: {key: url}
+    """
+    signed_at = time.time() if signed_at is None else signed_at
+    amz_date = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(signed_at))
+    datestamp = amz_date[:8]
+    scope = f"{datestamp}/{region}/s3/aws4_request"
+    signing_key = _get_signing_key(credentials, datestamp, region)
+
+    params = {
+        "X-Amz-Algorithm": ALGORITHM,
+        "X-Amz-Credential": f"{credentials.access_key}/{scope}",
+        "X-Amz-Date": amz_date,
+        "X-Amz-Expires": str(int(expires_in)),
+        "X-Amz-SignedHeaders": _SIGNED_HEADERS,
+    }
+    if credentials.token:
+        params["X-Amz-Security-Token"] = credentials.token
+    encoded = [
+        (name, f"{_quote_query_value(name)}={_quote_query_value(value)}")
+        for name, value in params.items()
+    ]
+    # Signed sorted by name; written in boto3's order (token last)
+    canonical_query = "&".join(param for _, param in sorted(encoded))
+    url_query = "&".join(param for _, param in encoded)
+
+    base = urlsplit(base_url)
+    request_tail = (
+        f"\n{canonical_query}\nhost:{base.netloc}\n\n"
+        f"{_SIGNED_HEADERS}\n{_UNSIGNED_PAYLOAD}"
+    )
+    string_to_sign_head = f"{ALGORITHM}\n{amz_date}\n{scope}\n"
+    url_head = f"{base.scheme}://{base.netloc}"
+    url_tail = f"?{url_query}&X-Amz-Signature="
+
+    urls = {}
+    for key in keys:
+        path = base.path + quote(key, safe="/~")
+        canonical_request = "GET\n" + path + request_tail
+        string_to_sign = string_to_sign_head + hashlib.sha256(
+            canonical_request.encode("utf-8")
+        ).hexdigest()
+        signature = hmac.new(
+            signing_key, string_to_sign.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        urls[key] = url_head + path + url_tail + signature
+    return urls
+
+
+class SigningContext(NamedTuple):
+    credentials: SigningCredentials
+    region: str  # as in boto3's X-Amz-Credential scope
+    base_url: str
+
+
+# (id(client), bucket) -> (client, region, base_url), or (client, None, None)
+# when boto3 doesn't presign that bucket with SigV4
+_probes: dict[tuple[int, str], tuple] = {}
+_probes_lock = Lock()
+_PROBE_KEY = "_"
+
+
+def _probe_bucket_url(s3_client, bucket: str) -> tuple[str | None, str | None]:
+    """
+    (signing region, base URL) boto3 uses for presigned GETs in `bucket`,
+    read off one URL it presigns, so the addressing style, host and region
+    match whatever the client is configured with. (None, None) unless it
+    signs with SigV4.
+    """
+    url = s3_client.generate_presigned_url(
+        "get_object", Params={"Bucket": bucket, "Key": _PROBE_KEY}, ExpiresIn=60
+    )
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    credential = (query.get("X-Amz-Credential") or [""])[0].split("/")
+    if query.get("X-Amz-Algorithm") != [ALGORITHM] or len(credential) != 5:
+        return None, None
+    if not parts.path.endswith("/" + _PROBE_KEY):
+        return None, None
+    base_path = parts.path[: -len(_PROBE_KEY)]
+    return credential[2], f"{parts.scheme}://{parts.netloc}{base_path}"
+
+
+def _client_signing_context(s3_client, bucket: str) -> SigningContext | None:
+    """
+    What `presign_s3_get_urls` needs to sign like `s3_client` does for
+    `bucket`, or None if that can't be worked out (e.g. a stand-in client,
+    or boto3 presigns with SigV2), in which case callers sign through boto3.
+    """
+    try:
+        frozen = s3_client._request_signer._credentials.get_frozen_credentials()
+    except Exception:
+        return None
+    credentials = SigningCredentials(
+        frozen.access_key, frozen.secret_key, getattr(frozen, "token", None)
+    )
+    if not (
+        isinstance(credentials.access_key, str)
+        and isinstance(credentials.secret_key, str)
+        and (credentials.token is None or isinstance(credentials.token, str))
+    ):
+        return None
+
+    probe_key = (id(s3_client), bucket)
+    with _probes_lock:
+        probe = _probes.get(probe_key)
+    if probe is None or probe[0] is not s3_client:
+        try:
+            region, base_url = _probe_bucket_url(s3_client, bucket)
+        except Exception as e:
+            print(f"Can't presign {bucket} in-process, using boto3: {e}")
+            region, base_url = None, None
+        probe = (s3_client, region, base_url)
+        with _probes_lock:
+            _probes[probe_key] = probe
+
+    if probe[1] is None:
+        return None
+    return SigningContext(credentials, probe[1], probe[2])
+
+
+def _clear_signing_keys():
+    with _signing_keys_lock:
+        _signing_keys.clear()
+    with _probes_lock:
+        _probes.clear()
@@ -0,0 +1,280 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock, Thread
+
+from shared.deadline import DeadlineExceeded
+from shared.config import (
+    SNAPSHOT_MAX_STALE_SECONDS,
+    SNAPSHOT_ERROR_BACKOFF_SECONDS,
+    SNAPSHOT_ERROR_BACKOFF_MAX_SECONDS,
+    SNAPSHOT_MISSING_TTL_SECONDS,
+    SNAPSHOT_HISTORY_SIZE,
+)
+
+
+@dataclass
+class Snapshot:
+    """One loaded copy of an S3 object (parsed or raw) plus its version."""
+
+    data: object
+    etag: str | None = None
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+# cache key (usually the S3 key) -> Snapshot
+_snapshots: dict[str, Snapshot] = {}
+# cache key -> (consecutive failures, retry not before (monotonic), last error)
+_failures: dict[str, tuple[int, float, Exception]] = {}
+# cache key -> background refresh thread in flight
+_refreshing: dict[str, Thread] = {}
+# cache key -> {etag: data} for the last SNAPSHOT_HISTORY_SIZE versions loaded
+_history: dict[str, OrderedDict] = {}
+_snapshots_lock = Lock()
+
+# (id(obj), name) -> (obj, value). Holding obj keeps its id from being reused.
+_derived: OrderedDict = OrderedDict()
+_derived_lock = Lock()
+_DERIVED_MAX_ENTRIES = 256
+
+# S3 error codes meaning the object isn't there (GET / HEAD), as opposed to a
+# transient failure
+_MISSING_KEY_ERROR_CODES = {"NoSuchKey", "NoSuchBucket", "404", "NotFound"}
+
+
+def _is_missing_key_error(e: Exception) -> bool:
+    response = getattr(e, "response", None)
+    if not isinstance(response, dict):
+        return False
+    return response.get("Error", {}).get("Code") in _MISSING_KEY_ERROR_CODES
+
+
+def _get_snapshot(
+    cache_key: str,
+    loader,
+    ttl_seconds: float,
+    max_stale_seconds: float | None = None,
+    keep_history: bool = False,
+    share_unchanged_values: bool = False,
+) -> Snapshot:
+    """
+    Return the cached snapshot for `cache_key`, calling `loader()` to fetch a
+    new one when there is none or it is older than `ttl_seconds`.
+
+    Stale-while-revalidate: a snapshot less than `max_stale_seconds` past its
+    TTL is returned immediately while one background thread refreshes it.
+    Older snapshots are reloaded synchronously.
+
+    Failed loads back off exponentially per key: no background refresh is
+    started, and a synchronous load re-raises the last error without calling
+    S3, until the backoff has passed. Missing keys are negatively cached the
+    same way for a flat SNAPSHOT_MISSING_TTL_SECONDS.
+
+    With `keep_history`, the last SNAPSHOT_HISTORY_SIZE versions loaded are
+    kept by ETag (see `_get_snapshot_history`); other keys only hold their
+    current snapshot.
+
+    With `share_unchanged_values`, a reloaded dict keeps the previous
+    snapshot's value objects for keys whose value is unchanged, so what was
+    derived from them (see `_get_derived`) survives the reload.
+
+    `loader` returns a Snapshot and raises on failure; failures never replace
+    a cached snapshot.
+    """
+    if max_stale_seconds is None:
+        max_stale_seconds = SNAPSHOT_MAX_STALE_SECONDS
+
+    with _snapshots_lock:
+        snapshot = _snapshots.get(cache_key)
+        failure = _failures.get(cache_key)
+
+    now = time.monotonic()
+    if snapshot is not None:
+        age = now - snapshot.loaded_at
+        if age < ttl_seconds:
+            return snapshot
+        if age < ttl_seconds + max_stale_seconds:
+            _start_background_refresh(
+                cache_key, loader, keep_history, share_unchanged_values
+            )
+            return snapshot
+
+    if failure is not None and now < failure[1]:
+        # Drop the frames of earlier re-raises so they don't pile up
+        raise failure[2].with_traceback(None)
+    return _load_snapshot(cache_key, loader, keep_history, share_unchanged_values)
+
+
+def _share_unchanged_values(previous_data, data):
+    """Point `data`'s keys at `previous_data`'s value objects where they're equal."""
+    if not isinstance(previous_data, dict) or not isinstance(data, dict):
+        return
+    for key, value in data.items():
+        previous_value = previous_data.get(key)
+        if previous_value is not value and previous_value == value:
+            data[key] = previous_value
+
+
+def _load_snapshot(
+    cache_key: str,
+    loader,
+    keep_history: bool = False,
+    share_unchanged_values: bool = False,
+) -> Snapshot:
+    try:
+        snapshot = loader()
+    except DeadlineExceeded:
+        # The request ran out of time, S3 didn't fail: nothing to back off from
+        raise
+    except Exception as e:
+        with _snapshots_lock:
+            failures = _failures.get(cache_key, (0, 0.0, e))[0] + 1
+            if _is_missing_key_error(e):
+                backoff = SNAPSHOT_MISSING_TTL_SECONDS
+            else:
+                backoff = min(
+                    SNAPSHOT_ERROR_BACKOFF_SECONDS * 2 ** (failures - 1),
+                    SNAPSHOT_ERROR_BACKOFF_MAX_SECONDS,
+                )
+            _failures[cache_key] = (failures, time.monotonic() + backoff, e)
+        raise
+
+    if share_unchanged_values:
+        with _snapshots_lock:
+            previous = _snapshots.get(cache_key)
+        # Compared outside the lock: it walks both versions
+        if previous is not None and previous.etag != snapshot.etag:
+            _share_unchanged_values(previous.data, snapshot.data)
+
+    replaced = None
+    with _snapshots_lock:
+        previous = _snapshots.get(cache_key)
+        if (
+            previous is not None
+            and snapshot.etag is not None
+            and previous.etag == snapshot.etag
+        ):
+            # Unchanged object: keep the existing data so indexes derived
+            # from it stay valid
+            snapshot.data = previous.data
+        elif previous is not None and previous.data is not snapshot.data:
+            replaced = previous.data
+        _snapshots[cache_key] = snapshot
+        _failures.pop(cache_key, None)
+        if keep_history and snapshot.etag is not None and SNAPSHOT_HISTORY_SIZE > 0:
+            versions = _history.setdefault(cache_key, OrderedDict())
+            versions[snapshot.etag] = snapshot.data
+            versions.move_to_end(snapshot.etag)
+            while len(versions) > SNAPSHOT_HISTORY_SIZE:
+                versions.popitem(last=False)
+    if replaced is not None:
+        _drop_derived(replaced, keep=snapshot.data)
+    return snapshot
+
+
+def _get_snapshot_history(cache_key: str) -> dict:
+    """{etag: data} of recently loaded versions of `cache_key`, oldest first."""
+    with _snapshots_lock:
+        return dict(_history.get(cache_key, {}))
+
+
+def _start_background_refresh(
+    cache_key: str,
+    loader,
+    keep_history: bool = False,
+    share_unchanged_values: bool = False,
+):
+    with _snapshots_lock:
+        if cache_key in _refreshing:
+            return
+        failure = _failures.get(cache_key)
+        if failure is not None and time.monotonic() < failure[1]:
+            return
+        thread = Thread(
+            target=_refresh_in_background,
+            args=(cache_key, loader, keep_history, share_unchanged_values),
+            daemon=True,
+        )
+        _refreshing[cache_key] = thread
+    thread.start()
+
+
+def _refresh_in_background(
+    cache_key: str,
+    loader,
+    keep_history: bool = False,
+    share_unchanged_values: bool = False,
+):
+    try:
+        _load_snapshot(cache_key, loader, keep_history, share_unchanged_values)
+    except Exception as e:
+        print(f"Background refresh of {cache_key} failed, serving stale: {e}")
+    finally:
+        with _snapshots_lock:
+            _refreshing.pop(cache_key, None)
+
+
+def _get_derived(obj, name: str, builder):
+    """
+    Return `builder(obj)`, built once per object. Used for indexes over a
+    cached snapshot's data: a new snapshot is a new object, so its indexes
+    are rebuilt, and the old ones are dropped when the snapshot is replaced
+    (see `_drop_derived`) or age out of the bounded LRU.
+    """
+    derived_key = (id(obj), name)
+    with _derived_lock:
+        cached = _derived.get(derived_key)
+        if cached is not None and cached[0] is obj:
+            _derived.move_to_end(derived_key)
+            return cached[1]
+
+    value = builder(obj)
+    with _derived_lock:
+        _derived[derived_key] = (obj, value)
+        while len(_derived) > _DERIVED_MAX_ENTRIES:
+            _derived.popitem(last=False)
+    return value
+
+
+def _drop_derived(data, keep=None):
+    """
+    Forget everything derived from a replaced snapshot's `data`, so the LRU
+    doesn't keep old generations alive. Covers values derived from `data`,
+    from its top-level values (per-cinema listings of a combined file), and
+    from those derived values in turn (e.g. indexes over a parsed raw file).
+    Top-level values still in use by the new snapshot's `keep` are spared.
+    """
+    # id -> object; holding the objects keeps their ids unique meanwhile
+    sources = {id(data): data}
+    if isinstance(data, dict):
+        kept = {id(value) for value in keep.values()} if isinstance(keep, dict) else set()
+        sources.update(
+            (id(value), value) for value in data.values() if id(value) not in kept
+        )
+
+    with _derived_lock:
+        found = True
+        while found:
+            found = False
+            for derived_key, (obj, value) in list(_derived.items()):
+                if sources.get(id(obj)) is obj:
+                    del _derived[derived_key]
+                    sources[id(value)] = value
+                    found = True
+
+
+def _wait_for_background_refreshes(timeout: float | None = None):
+    with _snapshots_lock:
+        threads = list(_refreshing.values())
+    for thread in threads:
+        thread.join(timeout)
+
+
+def _clear_snapshot_cache():
+    _wait_for_background_refreshes()
+    with _snapshots_lock:
+        _snapshots.clear()
+        _failures.clear()
+        _history.clear()
+    with _derived_lock:
+        _derived.clear()
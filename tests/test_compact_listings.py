@@ -0,0 +1,105 @@
+import copy
+import json
+import tracemalloc
+
+from shared.compact_listings import _compact_listings_tree, _share
+
+
+def _when(d, showtimes):
+    return {
+        "date": d,
+        "structured_date_strings": {"Weekday": "Monday", "Month": "January", "day_str": "15th"},
+        "year": 2024,
+        "month": 1,
+        "day": 15,
+        "showtimes": showtimes,
+    }
+
+
+def _listings():
+    return {
+        "Film A": {
+            "screeningType": "standard",
+            "when": [_when("2024-01-15", ["18:00"]), _when("2024-01-16", ["20:00"])],
+            "_additional_info": {"countries": ["UK"], "year": 1999},
+        },
+        "Film B": {
+            "screeningType": "standard",
+            "when": [_when("2024-01-15", ["18:00"])],
+            "_additional_info": {"countries": ["UK"], "year": 1999},
+        },
+    }
+
+
+# ===== _share =====
+
+def test_share_returns_one_object_per_distinct_value():
+    table = {}
+    a, _ = _share({"x": [1, 2]}, table)
+    b, _ = _share({"x": [1, 2]}, table)
+    c, _ = _share({"x": [1, 3]}, table)
+    assert a is b
+    assert a is not c
+
+
+def test_share_keeps_bool_and_int_distinct():
+    table = {}
+    assert _share([True], table)[0] is not _share([1], table)[0]
+    assert _share([True], table)[0] == [True]
+
+
+# ===== _compact_listings_tree =====
+
+def test_compact_listings_tree_preserves_values():
+    listings = _listings()
+    expected = copy.deepcopy(listings)
+    assert _compact_listings_tree(listings, listing_depth=1) == expected
+
+
+def test_compact_listings_tree_shares_identical_when_entries():
+    listings = _compact_listings_tree(_listings(), listing_depth=1)
+    when_a = listings["Film A"]["when"][0]
+    when_b = listings["Film B"]["when"][0]
+    assert when_a is when_b
+    assert when_a["structured_date_strings"] is listings["Film A"]["when"][1]["structured_date_strings"]
+    assert listings["Film A"]["_additional_info"] is listings["Film B"]["_additional_info"]
+
+
+def test_compact_listings_tree_keeps_listing_dicts_distinct():
+    listings = _compact_listings_tree(
+        {"Film A": {"url": None}, "Film B": {"url": None}}, listing_depth=1
+    )
+    assert listings["Film A"] is not listings["Film B"]
+
+
+def test_compact_listings_tree_handles_nested_depth_and_error_entries():
+    data = {
+        "bfi": {"Film A": {"when": [_when("2024-01-15", ["18:00"])]}},
+        "barbican": {"Film A": {"when": [_when("2024-01-15", ["18:00"])]}},
+        "rio": {"error": "No active listings found for rio"},
+    }
+    compacted = _compact_listings_tree(data, listing_depth=2)
+    assert compacted["bfi"]["Film A"]["when"][0] is compacted["barbican"]["Film A"]["when"][0]
+    assert compacted["rio"] == {"error": "No active listings found for rio"}
+
+
+def test_compact_listings_tree_reduces_retained_memory():
+    from load_test import LocalS3, build_dataset
+    from shared.config import LISTING_BUCKET, get_cinemas_active_listings_path
+
+    s3 = LocalS3()
+    build_dataset(s3, films_per_cinema=40, days=14, seed=0)
+    raw = s3.objects[(LISTING_BUCKET, get_cinemas_active_listings_path("bfi_southbank"))]
+
+    def _retained_kb(compact: bool) -> float:
+        tracemalloc.start()
+        data = json.loads(raw)
+        if compact:
+            data = _compact_listings_tree(data, listing_depth=1)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return current / 1024
+
+    # warm interpreter-level tables (sys.intern, dict key caches) before measuring
+    _compact_listings_tree(json.loads(raw), listing_depth=1)
+    assert _retained_kb(compact=True) < 0.9 * _retained_kb(compact=False)
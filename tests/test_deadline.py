@@ -0,0 +1,202 @@
+import json
+import time
+from threading import Event
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import lambda_function
+from routes.get_image_listings.utils import (
+    _get_cinemas_good_images,
+    _match_and_attach_images_to_listings,
+)
+from shared.config import get_cinemas_image_folder_path
+from routes.get_pan_cinema_listings import handle_pan_cinema_listings_route
+from shared import snapshot_cache
+from shared.deadline import (
+    DeadlineExceeded,
+    request_deadline,
+    _timed_out_entry,
+    _call_with_deadline,
+    _map_with_deadline,
+    _remaining_seconds,
+)
+
+
+class _Context:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+# ===== request_deadline =====
+
+def test_request_deadline_subtracts_margin():
+    with request_deadline(_Context(3000), margin_ms=1000):
+        assert 1.9 < _remaining_seconds() <= 2.0
+    assert _remaining_seconds() is None
+
+
+def test_request_deadline_without_context_has_no_deadline():
+    with request_deadline(None):
+        assert _remaining_seconds() is None
+
+
+# ===== _call_with_deadline / _map_with_deadline =====
+
+def test_call_with_deadline_raises_when_budget_runs_out():
+    release = Event()
+    with request_deadline(_Context(50), margin_ms=0):
+        with pytest.raises(DeadlineExceeded):
+            _call_with_deadline(release.wait, 5)
+    release.set()
+
+
+def test_call_with_deadline_runs_inline_without_deadline():
+    assert _call_with_deadline(lambda x: x * 2, 21) == 42
+
+
+def test_map_with_deadline_returns_finished_items_only():
+    release = Event()
+
+    def _fetch(item):
+        if item == "slow":
+            release.wait(5)
+        return item.upper()
+
+    with request_deadline(_Context(100), margin_ms=0):
+        result = _map_with_deadline(_fetch, ["a", "slow", "b"])
+    release.set()
+
+    assert result == {"a": "A", "b": "B"}
+
+
+def test_map_with_deadline_runs_workers_without_request_deadline():
+    with request_deadline(_Context(1000), margin_ms=0):
+        result = _map_with_deadline(lambda _: _remaining_seconds(), ["a"])
+        assert _remaining_seconds() is not None
+    assert result["a"] is None
+
+
+def test_snapshot_load_past_deadline_is_not_backed_off():
+    loader = MagicMock(
+        side_effect=[DeadlineExceeded("Request deadline exceeded"), snapshot_cache.Snapshot(1)]
+    )
+
+    with pytest.raises(DeadlineExceeded):
+        snapshot_cache._get_snapshot("key", loader, ttl_seconds=60)
+
+    assert snapshot_cache._get_snapshot("key", loader, ttl_seconds=60).data == 1
+    assert "key" not in snapshot_cache._failures
+
+
+@patch("routes.get_image_listings.utils._get_presigned_urls")
+@patch("routes.get_image_listings.utils._read_cinema_image_manifest", return_value=None)
+@patch("routes.get_image_listings.utils.s3")
+def test_abandoned_image_listing_finishes_and_fills_cache(mock_s3, _manifest, mock_presign):
+    folder = get_cinemas_image_folder_path("rio")
+    pages = [
+        {"Contents": [{"Key": folder + "a.jpg"}], "IsTruncated": True, "NextContinuationToken": "t"},
+        {"Contents": [{"Key": folder + "b.jpg"}]},
+    ]
+
+    def _list_objects_v2(**params):
+        if "ContinuationToken" not in params:
+            time.sleep(0.3)
+        return pages[1 if "ContinuationToken" in params else 0]
+
+    mock_s3.list_objects_v2.side_effect = _list_objects_v2
+    mock_presign.side_effect = lambda client, bucket, keys: {k: "http://url" for k in keys}
+
+    with request_deadline(_Context(100), margin_ms=0):
+        first = _get_cinemas_good_images(["rio"])
+    assert first["rio"]["timed_out"] is True
+
+    wait_until = time.monotonic() + 2
+    while time.monotonic() < wait_until and not any(
+        key.startswith("images:") for key in snapshot_cache._snapshots
+    ):
+        time.sleep(0.01)
+    with request_deadline(_Context(60_000), margin_ms=0):
+        second = _get_cinemas_good_images(["rio"])
+
+    assert [image["name"] for image in second["rio"]] == ["a.jpg", "b.jpg"]
+    assert mock_s3.list_objects_v2.call_count == 2
+
+
+# ===== partial responses =====
+
+@pytest.fixture
+def slow_rio_s3():
+    release = Event()
+    listings = {"Film A": {"url": "a", "when": [{"date": "2024-01-15", "showtimes": ["18:00"]}]}}
+
+    def _get_object(Bucket, Key, **kwargs):
+        if "/rio/" in Key:
+            release.wait(5)
+        body = MagicMock()
+        body.read.return_value = json.dumps(listings).encode("utf-8")
+        return {"Body": body, "ETag": '"0123456789abcdef"'}
+
+    with patch("shared.listings_utils.s3") as mock_s3:
+        mock_s3.get_object.side_effect = _get_object
+        yield mock_s3
+    release.set()
+    # Let the abandoned fetch land in the cache before the next test clears it
+    wait_until = time.monotonic() + 2
+    while time.monotonic() < wait_until and not any(
+        "/rio/" in key for key in snapshot_cache._snapshots
+    ):
+        time.sleep(0.01)
+
+
+def test_listings_returns_loaded_cinemas_and_timed_out_marker(slow_rio_s3):
+    event = {
+        "httpMethod": "GET",
+        "queryStringParameters": {
+            "route_type": "listings",
+            "cinemas": "bfi_southbank,rio",
+            "dates": "2024-01-15",
+        },
+    }
+
+    started = time.monotonic()
+    with patch("shared.deadline.REQUEST_DEADLINE_MARGIN_MS", 0):
+        response = lambda_function.lambda_handler(event, _Context(200))
+    elapsed = time.monotonic() - started
+
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 200
+    assert elapsed < 2
+    assert body["bfi_southbank"]["Film A"]["url"] == "a"
+    assert body["rio"]["timed_out"] is True
+    assert "error" in body["rio"]
+    assert response["headers"]["Cache-Control"] == "no-store"
+
+
+def test_match_images_passes_timed_out_entries_through():
+    marker = _timed_out_entry("Timed out fetching good images for rio")
+    result = _match_and_attach_images_to_listings(
+        {"rio": {"Film A": {}}}, {"rio": marker}, ["rio"]
+    )
+    assert result["rio"] is marker
+
+
+def test_match_images_passes_image_errors_through():
+    error = {"error": "Failed to fetch good images for rio: SlowDown"}
+    result = _match_and_attach_images_to_listings(
+        {"rio": {"Film A": {}}}, {"rio": error}, ["rio"]
+    )
+    assert result["rio"] is error
+
+
+@patch("routes.get_pan_cinema_listings._call_with_deadline")
+def test_pan_cinema_listings_returns_504_when_deadline_exceeded(mock_call):
+    mock_call.side_effect = DeadlineExceeded("Request deadline exceeded")
+
+    response = handle_pan_cinema_listings_route({})
+
+    assert response["statusCode"] == 504
+    assert json.loads(response["body"])["timed_out"] is True
@@ -1,6 +1,7 @@
 from unittest.mock import patch
 
 from routes.get_image_listings import get_image_listings
+from routes.get_image_listings.utils import _get_cinema_image_match_index
 
 CINEMAS = ["bfi_southbank"]
 DATES = ["2024-01-15"]
@@ -24,9 +25,16 @@ def test_get_image_listings_calls_pipeline_in_order(
 
     mock_raw.assert_called_once_with(CINEMAS)
     mock_filter.assert_called_once_with(mock_raw.return_value, DATES)
-    mock_images.assert_called_once_with(CINEMAS)
-    mock_match.assert_called_once_with(mock_filter.return_value, mock_images.return_value, CINEMAS)
-    mock_redact.assert_called_once_with(mock_match.return_value)
+    mock_images.assert_called_once_with(CINEMAS, image_size=None)
+    mock_match.assert_called_once_with(
+        mock_filter.return_value,
+        mock_images.return_value,
+        CINEMAS,
+        match_index_for=_get_cinema_image_match_index,
+    )
+    mock_redact.assert_called_once_with(
+        mock_match.return_value, fields=None, encode_when=None
+    )
     assert result == mock_redact.return_value
 
 
@@ -66,8 +74,10 @@ def test_get_image_listings_passes_multiple_cinemas_and_dates(
 
     mock_raw.assert_called_once_with(cinemas)
     mock_filter.assert_called_once_with({}, dates)
-    mock_images.assert_called_once_with(cinemas)
-    mock_match.assert_called_once_with({}, {}, cinemas)
+    mock_images.assert_called_once_with(cinemas, image_size=None)
+    mock_match.assert_called_once_with(
+        {}, {}, cinemas, match_index_for=_get_cinema_image_match_index
+    )
 
 
 @patch("routes.get_image_listings._redact_listings_fields")
@@ -1,11 +1,18 @@
 import json
 from unittest.mock import patch, MagicMock
 
+import pytest
+
 from routes.get_image_listings.utils import (
     _normalize_name,
     _filter_cinema_listings_by_images,
     _match_and_attach_images_to_listings,
+    _build_image_match_index,
+    _get_cinema_image_match_index,
+    _fuzzy_match,
     _get_cinemas_good_images,
+    _read_cinema_image_manifest,
+    _group_image_keys,
 )
 
 
@@ -142,6 +149,132 @@ def test_match_processes_multiple_cinemas():
     assert result["barbican"]["Film B"]["image_url"] == "http://b"
 
 
+@pytest.mark.parametrize(
+    "title, image",
+    [
+        ("The Godfather (35mm)", "godfather.jpg"),
+        ("Godfather", "the_godfather_1972.jpg"),
+        ("Kiki's Delivery Service", "kikis_delivery_service.jpg"),
+        ("The Lord of the Rings: The Two Towers", "lord_of_the_rings_the_two_towers_2002.jpg"),
+        ("Spirited Away - IMAX", "spirited_away.jpg"),
+        ("Paris, Texas", "paris_texas_4k.png"),
+    ],
+)
+def test_match_falls_back_to_fuzzy_match(title, image):
+    listings = {"bfi_southbank": {title: {"when": []}}}
+    images = {
+        "bfi_southbank": [
+            _make_image(image, "http://fuzzy"),
+            _make_image("unrelated_film.jpg", "http://other"),
+        ]
+    }
+
+    result = _match_and_attach_images_to_listings(listings, images, ["bfi_southbank"])
+
+    assert result["bfi_southbank"][title]["image_url"] == "http://fuzzy"
+
+
+def test_match_fuzzy_rejects_dissimilar_titles():
+    listings = {"bfi_southbank": {"Aliens": {"when": []}, "Plan A": {"when": []}}}
+    images = {
+        "bfi_southbank": [
+            _make_image("alien_1979.jpg", "http://alien"),
+            _make_image("plan_b.jpg", "http://plan_b"),
+        ]
+    }
+
+    result = _match_and_attach_images_to_listings(listings, images, ["bfi_southbank"])
+
+    assert result["bfi_southbank"] == {}
+
+
+def test_match_prefers_exact_and_prefix_over_fuzzy():
+    listings = {"bfi_southbank": {"Heat": {"when": []}, "Her": {"when": []}}}
+    images = {
+        "bfi_southbank": [
+            _make_image("heat_1995.jpg", "http://fuzzy_heat"),
+            _make_image("heat.jpg", "http://heat"),
+            _make_image("her_en.jpg", "http://her_en"),
+            _make_image("the_her.jpg", "http://fuzzy_her"),
+        ]
+    }
+
+    result = _match_and_attach_images_to_listings(listings, images, ["bfi_southbank"])
+
+    assert result["bfi_southbank"]["Heat"]["image_url"] == "http://heat"
+    assert result["bfi_southbank"]["Her"]["image_url"] == "http://her_en"
+
+
+@patch("routes.get_image_listings.utils.IMAGE_FUZZY_MATCH_THRESHOLD", 1.1)
+def test_match_fuzzy_disabled_above_one():
+    listings = {"bfi_southbank": {"The Godfather (35mm)": {"when": []}}}
+    images = {"bfi_southbank": [_make_image("godfather.jpg", "http://img")]}
+
+    result = _match_and_attach_images_to_listings(listings, images, ["bfi_southbank"])
+
+    assert result["bfi_southbank"] == {}
+
+
+@pytest.mark.parametrize(
+    "title, image",
+    [
+        ("Toy Story 3", "toy_story_2.jpg"),
+        ("Kill Bill: Vol. 2", "kill_bill_vol_1.jpg"),
+        ("The Godfather Part III", "the_godfather_part_ii.jpg"),
+        ("Blade Runner 2049", "blade_runner.jpg"),
+        ("Blade Runner", "blade_runner_2049.jpg"),
+        ("Toy Story", "toy_story_2_en.jpg"),
+        ("Heat (1995)", "heat_1986.jpg"),
+        ("Heat (1995)", "heat_1986_en.jpg"),
+    ],
+)
+def test_match_never_attaches_another_films_numbers(title, image):
+    listings = {"bfi_southbank": {title: {"when": []}}}
+    images = {"bfi_southbank": [_make_image(image, "http://wrong")]}
+
+    result = _match_and_attach_images_to_listings(listings, images, ["bfi_southbank"])
+
+    assert result["bfi_southbank"] == {}
+
+
+@pytest.mark.parametrize(
+    "title, image",
+    [
+        ("Toy Story 3 (35mm)", "toy_story_3_2010.jpg"),
+        ("The Godfather Part II", "godfather_part_ii.jpg"),
+        ("Heat (1995)", "heat.jpg"),
+        ("Nosferatu", "nosferatu_1922_en.jpg"),
+        ("Paddington", "paddington_2024_en.jpg"),
+        ("Heat (1995)", "heat_1995_en.jpg"),
+    ],
+)
+def test_match_fuzzy_accepts_same_numbers_and_one_sided_year(title, image):
+    listings = {"bfi_southbank": {title: {"when": []}}}
+    images = {"bfi_southbank": [_make_image(image, "http://right")]}
+
+    result = _match_and_attach_images_to_listings(listings, images, ["bfi_southbank"])
+
+    assert result["bfi_southbank"][title]["image_url"] == "http://right"
+
+
+def test_match_uses_match_index_for_cinema():
+    index = _build_image_match_index(["kung_fu_panda", "film_b"])
+    listings = {"bfi_southbank": {"The Kung Fu Panda": {"when": []}}}
+    images = {"bfi_southbank": [_make_image("kung_fu_panda.jpg", "http://img")]}
+    lookups = []
+
+    result = _match_and_attach_images_to_listings(
+        listings,
+        images,
+        ["bfi_southbank"],
+        match_index_for=lambda cinema: lookups.append(cinema) or index,
+    )
+
+    assert result["bfi_southbank"]["The Kung Fu Panda"]["image_url"] == "http://img"
+    assert lookups == ["bfi_southbank"]
+    assert _fuzzy_match(index, "the_kung_fu_panda", 0.8) == "kung_fu_panda"
+
+
 # ===== _get_cinemas_good_images =====
 
 def _make_s3_list_response(keys, truncated=False):
@@ -152,13 +285,13 @@ def _make_s3_list_response(keys, truncated=False):
     }
 
 
-@patch("routes.get_image_listings.utils._generate_presigned_url")
+@patch("routes.get_image_listings.utils._get_presigned_urls")
 @patch("routes.get_image_listings.utils.s3")
 def test_get_cinemas_good_images_returns_image_list(mock_s3, mock_presign):
     mock_s3.list_objects_v2.return_value = _make_s3_list_response(
         ["cinema_listings_images/bfi_southbank/good/film_a.jpg"]
     )
-    mock_presign.return_value = "http://presigned"
+    mock_presign.side_effect = lambda client, bucket, keys: {k: "http://presigned" for k in keys}
 
     result = _get_cinemas_good_images(["bfi_southbank"])
 
@@ -169,7 +302,7 @@ def test_get_cinemas_good_images_returns_image_list(mock_s3, mock_presign):
     assert images[0]["url"] == "http://presigned"
 
 
-@patch("routes.get_image_listings.utils._generate_presigned_url")
+@patch("routes.get_image_listings.utils._get_presigned_urls")
 @patch("routes.get_image_listings.utils.s3")
 def test_get_cinemas_good_images_filters_non_image_files(mock_s3, mock_presign):
     mock_s3.list_objects_v2.return_value = _make_s3_list_response(
@@ -178,7 +311,7 @@ def test_get_cinemas_good_images_filters_non_image_files(mock_s3, mock_presign):
             "cinema_listings_images/bfi_southbank/good/readme.txt",
         ]
     )
-    mock_presign.return_value = "http://presigned"
+    mock_presign.side_effect = lambda client, bucket, keys: {k: "http://presigned" for k in keys}
 
     result = _get_cinemas_good_images(["bfi_southbank"])
 
@@ -186,7 +319,7 @@ def test_get_cinemas_good_images_filters_non_image_files(mock_s3, mock_presign):
     assert result["bfi_southbank"][0]["name"] == "film_a.jpg"
 
 
-@patch("routes.get_image_listings.utils._generate_presigned_url")
+@patch("routes.get_image_listings.utils._get_presigned_urls")
 @patch("routes.get_image_listings.utils.s3")
 def test_get_cinemas_good_images_handles_empty_bucket(mock_s3, mock_presign):
     mock_s3.list_objects_v2.return_value = {"Contents": [], "IsTruncated": False}
@@ -196,7 +329,7 @@ def test_get_cinemas_good_images_handles_empty_bucket(mock_s3, mock_presign):
     assert result["bfi_southbank"] == []
 
 
-@patch("routes.get_image_listings.utils._generate_presigned_url")
+@patch("routes.get_image_listings.utils._get_presigned_urls")
 @patch("routes.get_image_listings.utils.s3")
 def test_get_cinemas_good_images_returns_error_dict_on_exception(mock_s3, mock_presign):
     mock_s3.list_objects_v2.side_effect = Exception("S3 error")
@@ -206,7 +339,7 @@ def test_get_cinemas_good_images_returns_error_dict_on_exception(mock_s3, mock_p
     assert "error" in result["bfi_southbank"]
 
 
-@patch("routes.get_image_listings.utils._generate_presigned_url")
+@patch("routes.get_image_listings.utils._get_presigned_urls")
 @patch("routes.get_image_listings.utils.s3")
 def test_get_cinemas_good_images_paginates(mock_s3, mock_presign):
     page1 = {
@@ -219,9 +352,161 @@ def test_get_cinemas_good_images_paginates(mock_s3, mock_presign):
         "IsTruncated": False,
     }
     mock_s3.list_objects_v2.side_effect = [page1, page2]
-    mock_presign.return_value = "http://presigned"
+    mock_presign.side_effect = lambda client, bucket, keys: {k: "http://presigned" for k in keys}
 
     result = _get_cinemas_good_images(["bfi_southbank"])
 
     assert len(result["bfi_southbank"]) == 2
     assert mock_s3.list_objects_v2.call_count == 2
+
+
+# ===== _read_cinema_image_manifest / manifest fast path =====
+
+def _make_s3_body(data):
+    body = MagicMock()
+    body.read.return_value = json.dumps(data).encode("utf-8")
+    return {"Body": body}
+
+
+@patch("routes.get_image_listings.utils.s3")
+def test_read_cinema_image_manifest_returns_full_keys(mock_s3):
+    mock_s3.get_object.return_value = _make_s3_body(
+        {
+            "images": [
+                {"key": "film_a.jpg", "etag": "a"},
+                {"key": "cinema_listings_images/bfi_southbank/good/film_b.png", "etag": "b"},
+                {"etag": "no key"},
+            ]
+        }
+    )
+
+    result = _read_cinema_image_manifest("bfi_southbank")
+
+    assert result == [
+        "cinema_listings_images/bfi_southbank/good/film_a.jpg",
+        "cinema_listings_images/bfi_southbank/good/film_b.png",
+    ]
+
+
+@patch("routes.get_image_listings.utils.s3")
+def test_read_cinema_image_manifest_missing_returns_none(mock_s3):
+    mock_s3.get_object.side_effect = Exception("NoSuchKey")
+
+    assert _read_cinema_image_manifest("bfi_southbank") is None
+
+
+@patch("routes.get_image_listings.utils.s3")
+def test_read_cinema_image_manifest_malformed_returns_none(mock_s3):
+    mock_s3.get_object.return_value = _make_s3_body({"not_images": []})
+
+    assert _read_cinema_image_manifest("bfi_southbank") is None
+
+
+@patch("routes.get_image_listings.utils._get_presigned_urls")
+@patch("routes.get_image_listings.utils.s3")
+def test_get_cinemas_good_images_uses_manifest_without_listing(mock_s3, mock_presign):
+    mock_s3.get_object.return_value = _make_s3_body({"images": [{"key": "film_a.jpg"}]})
+    mock_presign.side_effect = lambda client, bucket, keys: {k: "http://presigned" for k in keys}
+
+    result = _get_cinemas_good_images(["bfi_southbank"])
+
+    assert result["bfi_southbank"] == [{"name": "film_a.jpg", "url": "http://presigned"}]
+    mock_s3.list_objects_v2.assert_not_called()
+
+
+@patch("routes.get_image_listings.utils._get_presigned_urls")
+@patch("routes.get_image_listings.utils.s3")
+def test_get_cinemas_good_images_falls_back_to_listing_without_manifest(mock_s3, mock_presign):
+    mock_s3.get_object.side_effect = Exception("NoSuchKey")
+    mock_s3.list_objects_v2.return_value = _make_s3_list_response(
+        ["cinema_listings_images/bfi_southbank/good/film_a.jpg"]
+    )
+    mock_presign.side_effect = lambda client, bucket, keys: {k: "http://presigned" for k in keys}
+
+    result = _get_cinemas_good_images(["bfi_southbank"])
+
+    assert result["bfi_southbank"][0]["name"] == "film_a.jpg"
+    mock_s3.list_objects_v2.assert_called_once()
+
+
+@patch("routes.get_image_listings.utils._get_presigned_urls")
+@patch("routes.get_image_listings.utils.s3")
+def test_get_cinemas_good_images_caches_image_keys(mock_s3, mock_presign):
+    mock_s3.get_object.return_value = _make_s3_body({"images": [{"key": "film_a.jpg"}]})
+
+    _get_cinemas_good_images(["bfi_southbank"])
+    _get_cinemas_good_images(["bfi_southbank"])
+
+    assert mock_s3.get_object.call_count == 1
+    assert mock_presign.call_count == 2  # URLs still come from the presign cache per request
+
+
+@patch("routes.get_image_listings.utils.s3")
+def test_cinema_image_match_index_is_built_once_per_cached_key_set(mock_s3):
+    mock_s3.get_object.return_value = _make_s3_body(
+        {"images": [{"key": "kung_fu_panda.jpg"}, {"key": "small/kung_fu_panda.webp"}]}
+    )
+
+    with patch(
+        "routes.get_image_listings.utils._build_image_match_index",
+        wraps=_build_image_match_index,
+    ) as mock_build:
+        first = _get_cinema_image_match_index("bfi_southbank")
+        second = _get_cinema_image_match_index("bfi_southbank")
+
+    assert first is second
+    assert first.stems == ["kung_fu_panda"]
+    assert mock_build.call_count == 1
+
+
+# ===== size variants =====
+
+GOOD = "cinema_listings_images/bfi_southbank/good/"
+
+
+def test_group_image_keys_separates_base_and_variants():
+    grouped = _group_image_keys(
+        [
+            GOOD + "Film A.jpg",
+            GOOD + "thumb/film_a.jpg",
+            GOOD + "thumb/film_a.webp",
+            GOOD + "medium/film_a.png",
+            GOOD + "archive/film_a.jpg",
+            GOOD + "thumb/nested/film_a.jpg",
+            GOOD + "thumb/notes.txt",
+        ],
+        GOOD,
+    )
+
+    assert grouped["base"] == [GOOD + "Film A.jpg"]
+    assert grouped["variants"]["thumb"] == {"film_a": GOOD + "thumb/film_a.webp"}
+    assert grouped["variants"]["medium"] == {"film_a": GOOD + "medium/film_a.png"}
+
+
+@patch("routes.get_image_listings.utils._get_presigned_urls")
+@patch("routes.get_image_listings.utils.s3")
+def test_get_cinemas_good_images_resolves_size_variant_or_original(mock_s3, mock_presign):
+    mock_s3.list_objects_v2.return_value = _make_s3_list_response(
+        [GOOD + "film_a.jpg", GOOD + "film_b.jpg", GOOD + "thumb/film_a.webp"]
+    )
+    mock_presign.side_effect = lambda client, bucket, keys: {k: f"http://{k}" for k in keys}
+
+    result = _get_cinemas_good_images(["bfi_southbank"], image_size="thumb")
+
+    assert result["bfi_southbank"] == [
+        {"name": "film_a.jpg", "url": f"http://{GOOD}thumb/film_a.webp"},
+        {"name": "film_b.jpg", "url": f"http://{GOOD}film_b.jpg"},
+    ]
+
+
+@patch("routes.get_image_listings.utils._get_presigned_urls")
+@patch("routes.get_image_listings.utils.s3")
+def test_get_cinemas_good_images_ignores_variants_without_image_size(mock_s3, mock_presign):
+    mock_s3.list_objects_v2.return_value = _make_s3_list_response(
+        [GOOD + "film_a.jpg", GOOD + "thumb/film_a.webp"]
+    )
+    mock_presign.side_effect = lambda client, bucket, keys: {k: f"http://{k}" for k in keys}
+
+    result = _get_cinemas_good_images(["bfi_southbank"])
+
+    assert result["bfi_southbank"] == [{"name": "film_a.jpg", "url": f"http://{GOOD}film_a.jpg"}]
@@ -18,7 +18,9 @@ def test_get_listings_calls_pipeline_in_order(mock_raw, mock_filter, mock_redact
 
     mock_raw.assert_called_once_with(CINEMAS)
     mock_filter.assert_called_once_with(mock_raw.return_value, DATES)
-    mock_redact.assert_called_once_with(mock_filter.return_value)
+    mock_redact.assert_called_once_with(
+        mock_filter.return_value, fields=None, encode_when=None
+    )
     assert result == mock_redact.return_value
 
 
@@ -61,3 +63,71 @@ def test_get_listings_empty_result_propagates(mock_raw, mock_filter, mock_redact
     result = get_listings(CINEMAS, DATES)
 
     assert result == {}
+
+
+# ===== format=compact / columnar =====
+
+def _when(date, day, showtimes):
+    return {
+        "date": date,
+        "structured_date_strings": {"Weekday": "Monday", "Month": "January", "day_str": f"{day}th"},
+        "year": 2024,
+        "month": 1,
+        "day": day,
+        "showtimes": showtimes,
+    }
+
+
+_RAW = {
+    "bfi_southbank": {
+        "Film A": {"url": "a", "when": [_when("2024-01-15", 15, ["18:00", "20:30"]), _when("2024-01-16", 16, ["14:00"])]},
+        "Film B": {"url": "b", "when": [_when("2024-01-16", 16, ["19:00"])]},
+    },
+    "barbican": {"Film C": {"url": "c", "when": [_when("2024-01-15", 15, ["12:00"])]}},
+}
+
+
+@patch("routes.get_listings._get_cinemas_raw_listings", return_value=_RAW)
+def test_get_listings_compact_lists_each_date_once(_mock_raw):
+    dates = ["2024-01-15", "2024-01-16"]
+    verbose = get_listings(list(_RAW), dates)
+    compact = get_listings(list(_RAW), dates, response_format="compact")
+
+    assert compact["format"] == "compact"
+    assert [d["date"] for d in compact["dates"]] == ["2024-01-15", "2024-01-16"]
+    assert "showtimes" not in compact["dates"][0]
+    assert compact["listings"]["bfi_southbank"]["Film A"]["when"] == [
+        [0, ["18:00", "20:30"]],
+        [1, ["14:00"]],
+    ]
+    assert compact["listings"]["barbican"]["Film C"] == {"url": "c", "when": [[0, ["12:00"]]]}
+    # Decoding the compact form gives back the verbose listings
+    for cinema, listings in compact["listings"].items():
+        for title, listing in listings.items():
+            decoded = [
+                {**compact["dates"][i], "showtimes": times} for i, times in listing["when"]
+            ]
+            assert decoded == verbose[cinema][title]["when"]
+    assert _RAW["bfi_southbank"]["Film A"]["when"][0]["showtimes"] == ["18:00", "20:30"]
+
+
+@patch("routes.get_listings._get_cinemas_raw_listings", return_value=_RAW)
+def test_get_listings_columnar_has_one_row_per_showtime(_mock_raw):
+    columnar = get_listings(["bfi_southbank"], ["2024-01-16", "2024-01-15"], response_format="columnar")
+
+    assert columnar["listings"]["bfi_southbank"]["Film A"]["when"] == {
+        "date": [0, 0, 1],
+        "time": ["18:00", "20:30", "14:00"],
+    }
+    assert columnar["listings"]["bfi_southbank"]["Film B"]["when"] == {"date": [1], "time": ["19:00"]}
+
+
+@patch("routes.get_listings._get_cinemas_raw_listings")
+def test_get_listings_compact_reports_timed_out_cinemas(mock_raw):
+    from shared.deadline import _timed_out_entry
+
+    mock_raw.return_value = {"bfi_southbank": _timed_out_entry("slow")}
+
+    compact = get_listings(["bfi_southbank"], ["2024-01-15"], response_format="compact")
+
+    assert compact["timed_out_cinemas"] == ["bfi_southbank"]
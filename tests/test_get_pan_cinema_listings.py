@@ -1,7 +1,15 @@
 import json
 from unittest.mock import patch, MagicMock
 
-from routes.get_pan_cinema_listings import get_pan_cinema_listings, handle_pan_cinema_listings_route
+import base64
+import gzip
+
+from routes.get_pan_cinema_listings import (
+    get_pan_cinema_film_ids,
+    get_pan_cinema_listings,
+    get_pan_cinema_listings_raw,
+    handle_pan_cinema_listings_route,
+)
 
 
 def _make_s3_response(data: dict) -> dict:
@@ -48,6 +56,17 @@ def test_get_pan_cinema_listings_calls_s3_with_correct_bucket_and_key(mock_s3):
     )
 
 
+@patch("routes.get_pan_cinema_listings.s3")
+def test_get_pan_cinema_listings_reads_and_parses_once_while_cached(mock_s3):
+    mock_s3.get_object.return_value = _make_s3_response(_ALL_LISTINGS)
+
+    first = get_pan_cinema_listings()
+    second = get_pan_cinema_listings()
+
+    assert first is second
+    mock_s3.get_object.assert_called_once()
+
+
 @patch("routes.get_pan_cinema_listings.s3")
 def test_get_pan_cinema_listings_returns_error_dict_on_exception(mock_s3):
     mock_s3.get_object.side_effect = Exception("network error")
@@ -74,14 +93,67 @@ def test_get_pan_cinema_listings_error_dict_does_not_raise(mock_s3):
 
 
 @patch("routes.get_pan_cinema_listings.get_pan_cinema_listings")
-def test_pan_cinema_no_id_returns_all_listings(mock_get):
-    """No id param → backwards-compatible: returns all listings."""
-    mock_get.return_value = _ALL_LISTINGS
+@patch("routes.get_pan_cinema_listings.get_pan_cinema_listings_raw")
+def test_pan_cinema_no_id_returns_all_listings(mock_raw, mock_get):
+    """No id param → backwards-compatible: returns all listings, without parsing them."""
+    mock_raw.return_value = (json.dumps(_ALL_LISTINGS).encode("utf-8"), None)
 
     response = handle_pan_cinema_listings_route(_make_qs())
 
     assert response["statusCode"] == 200
     assert json.loads(response["body"]) == _ALL_LISTINGS
+    mock_get.assert_not_called()
+
+
+@patch("routes.get_pan_cinema_listings.get_pan_cinema_listings_raw")
+def test_pan_cinema_no_id_s3_error_returns_500(mock_raw):
+    mock_raw.side_effect = Exception("network error")
+
+    response = handle_pan_cinema_listings_route(_make_qs())
+
+    assert response["statusCode"] == 500
+    assert "network error" in json.loads(response["body"])["error"]
+
+
+@patch("routes.get_pan_cinema_listings.PAN_CINEMA_SERVE_PRECOMPRESSED", True)
+@patch("routes.get_pan_cinema_listings.get_pan_cinema_listings_raw")
+def test_pan_cinema_no_id_serves_precompressed_when_accepted(mock_raw):
+    compressed = gzip.compress(json.dumps(_ALL_LISTINGS).encode("utf-8"))
+    mock_raw.return_value = (compressed, "gzip")
+
+    response = handle_pan_cinema_listings_route(
+        _make_qs(), headers={"accept-encoding": "gzip, br"}
+    )
+
+    mock_raw.assert_called_once_with(gzipped=True)
+    assert response["headers"]["Content-Encoding"] == "gzip"
+    assert response["isBase64Encoded"] is True
+    body = gzip.decompress(base64.b64decode(response["body"]))
+    assert json.loads(body) == _ALL_LISTINGS
+
+
+@patch("routes.get_pan_cinema_listings.PAN_CINEMA_SERVE_PRECOMPRESSED", True)
+@patch("routes.get_pan_cinema_listings.get_pan_cinema_listings_raw")
+def test_pan_cinema_no_id_skips_precompressed_without_accept_encoding(mock_raw):
+    mock_raw.return_value = (b"{}", None)
+
+    handle_pan_cinema_listings_route(_make_qs())
+
+    mock_raw.assert_called_once_with(gzipped=False)
+
+
+@patch("routes.get_pan_cinema_listings.s3")
+def test_get_pan_cinema_listings_raw_falls_back_to_plain_file(mock_s3):
+    from shared.config import PAN_CINEMA_LISTINGS_KEY
+
+    plain = _make_s3_response(_ALL_LISTINGS)
+    mock_s3.get_object.side_effect = [Exception("NoSuchKey"), plain]
+
+    raw_body, content_encoding = get_pan_cinema_listings_raw(gzipped=True)
+
+    assert content_encoding is None
+    assert json.loads(raw_body) == _ALL_LISTINGS
+    assert mock_s3.get_object.call_args.kwargs["Key"] == PAN_CINEMA_LISTINGS_KEY
 
 
 @patch("routes.get_pan_cinema_listings.get_pan_cinema_listings")
@@ -107,6 +179,40 @@ def test_pan_cinema_unknown_id_returns_404(mock_get):
     assert body["error"] == "Film Not showing on KL"
 
 
+@patch("routes.get_pan_cinema_listings.s3")
+def test_get_pan_cinema_film_ids_are_sorted_ints(mock_s3):
+    mock_s3.get_object.return_value = _make_s3_response({**_ALL_LISTINGS, "n/a": {}})
+
+    assert list(get_pan_cinema_film_ids()) == [_FILM_ID, 99999]
+
+
+@patch("routes.get_pan_cinema_listings._parse_pan_cinema_listings")
+@patch("routes.get_pan_cinema_listings.get_pan_cinema_listings")
+@patch("routes.get_pan_cinema_listings.s3")
+def test_pan_cinema_unknown_id_404s_from_id_filter_without_listings(
+    mock_s3, mock_get, mock_parse
+):
+    mock_s3.get_object.return_value = _make_s3_response(_ALL_LISTINGS)
+
+    for _ in range(3):
+        response = handle_pan_cinema_listings_route(_make_qs(id_param="424242"))
+        assert response["statusCode"] == 404
+
+    mock_get.assert_not_called()
+    mock_parse.assert_not_called()
+    mock_s3.get_object.assert_called_once()
+
+
+@patch("routes.get_pan_cinema_listings.s3")
+def test_pan_cinema_known_id_passes_id_filter(mock_s3):
+    mock_s3.get_object.return_value = _make_s3_response(_ALL_LISTINGS)
+
+    response = handle_pan_cinema_listings_route(_make_qs(id_param=str(_FILM_ID)))
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"]) == _FILM_LISTINGS
+
+
 @patch("routes.get_pan_cinema_listings.get_pan_cinema_listings")
 def test_pan_cinema_non_integer_id_returns_400(mock_get):
     """Non-integer id → 400 before S3 is ever called."""
@@ -128,3 +234,28 @@ def test_pan_cinema_s3_error_with_id_returns_500(mock_get):
     assert response["statusCode"] == 500
     body = json.loads(response["body"])
     assert "error" in body
+
+
+@patch("routes.get_pan_cinema_listings.get_pan_cinema_listings")
+def test_pan_cinema_fields_projects_film_listings(mock_get):
+    """fields param → each cinema's listing is projected and redacted."""
+    mock_get.return_value = {
+        str(_FILM_ID): {
+            "bfi_southbank": {"url": "u", "description": "d", "s3ImageURL": "x"}
+        }
+    }
+
+    response = handle_pan_cinema_listings_route(
+        {"id": str(_FILM_ID), "fields": "url"}
+    )
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"]) == {"bfi_southbank": {"url": "u"}}
+
+
+@patch("routes.get_pan_cinema_listings.get_pan_cinema_listings")
+def test_pan_cinema_invalid_fields_returns_400(mock_get):
+    response = handle_pan_cinema_listings_route({"fields": "not_a_field"})
+
+    assert response["statusCode"] == 400
+    mock_get.assert_not_called()
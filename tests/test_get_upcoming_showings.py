@@ -0,0 +1,100 @@
+from unittest.mock import patch
+
+from routes.get_upcoming_showings import get_upcoming_showings
+from shared.listings_utils import _build_showtime_index, _showings_between
+
+
+def _listing(*when):
+    return {"when": [{"date": d, "showtimes": list(times)} for d, times in when]}
+
+
+BFI = {
+    "Film A": _listing(("2024-01-15", ["18:00", "20:30"]), ("2024-01-16", ["14:00"])),
+    "Film B": _listing(("2024-01-15", ["19:15"])),
+}
+BARBICAN = {
+    "Film C": _listing(("2024-01-15", ["18:00", "23:45"])),
+}
+
+
+# ===== _build_showtime_index / _showings_between =====
+
+def test_build_showtime_index_sorts_by_start():
+    starts, rows = _build_showtime_index(BFI)
+    assert starts == [
+        "2024-01-15T18:00",
+        "2024-01-15T19:15",
+        "2024-01-15T20:30",
+        "2024-01-16T14:00",
+    ]
+    assert rows[1] == ("2024-01-15T19:15", "Film B", "19:15")
+
+
+def test_build_showtime_index_skips_malformed_entries():
+    listings = {
+        "Film A": {"when": [{"date": "2024-01-15", "showtimes": ["18:00", "tbc", None]}]},
+        "Film B": {"when": "soon"},
+        "Film C": "not_a_dict",
+        "Film D": {"when": [{"showtimes": ["18:00"]}]},
+    }
+    starts, _ = _build_showtime_index(listings)
+    assert starts == ["2024-01-15T18:00"]
+
+
+def test_showings_between_is_half_open():
+    rows = _showings_between(BFI, "2024-01-15T18:00", "2024-01-15T20:30")
+    assert [r[0] for r in rows] == ["2024-01-15T18:00", "2024-01-15T19:15"]
+
+
+def test_showings_between_crosses_midnight():
+    rows = _showings_between(BFI, "2024-01-15T20:00", "2024-01-16T15:00")
+    assert [r[1] for r in rows] == ["Film A", "Film A"]
+
+
+# ===== get_upcoming_showings =====
+
+@patch("routes.get_upcoming_showings._get_cinemas_raw_listings")
+def test_get_upcoming_showings_merges_cinemas_in_start_order(mock_raw):
+    mock_raw.return_value = {"barbican": BARBICAN, "bfi_southbank": BFI}
+
+    result = get_upcoming_showings(
+        ["barbican", "bfi_southbank"], "2024-01-15T18:00", "2024-01-15T21:00"
+    )
+
+    mock_raw.assert_called_once_with(["barbican", "bfi_southbank"])
+    assert result["from"] == "2024-01-15T18:00"
+    assert result["to"] == "2024-01-15T21:00"
+    assert [(s["start"], s["cinema"], s["title"]) for s in result["showings"]] == [
+        ("2024-01-15T18:00", "barbican", "Film C"),
+        ("2024-01-15T18:00", "bfi_southbank", "Film A"),
+        ("2024-01-15T19:15", "bfi_southbank", "Film B"),
+        ("2024-01-15T20:30", "bfi_southbank", "Film A"),
+    ]
+    assert result["showings"][0]["showtime"] == "18:00"
+
+
+@patch("routes.get_upcoming_showings._get_cinemas_raw_listings")
+def test_get_upcoming_showings_skips_failed_cinemas(mock_raw):
+    mock_raw.return_value = {
+        "barbican": {"error": "No active listings found for barbican"},
+        "bfi_southbank": BFI,
+    }
+
+    result = get_upcoming_showings(
+        ["barbican", "bfi_southbank"], "2024-01-16T00:00", "2024-01-17T00:00"
+    )
+
+    assert [s["cinema"] for s in result["showings"]] == ["bfi_southbank"]
+
+
+@patch("routes.get_upcoming_showings._get_cinemas_raw_listings")
+def test_get_upcoming_showings_reuses_index_per_snapshot(mock_raw):
+    mock_raw.return_value = {"bfi_southbank": BFI}
+
+    with patch(
+        "shared.listings_utils._build_showtime_index", wraps=_build_showtime_index
+    ) as mock_build:
+        get_upcoming_showings(["bfi_southbank"], "2024-01-15T00:00", "2024-01-16T00:00")
+        get_upcoming_showings(["bfi_southbank"], "2024-01-16T00:00", "2024-01-17T00:00")
+
+    assert mock_build.call_count == 1
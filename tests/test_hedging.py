@@ -0,0 +1,138 @@
+import time
+from threading import Event
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from shared import hedging
+from shared.hedging import (
+    LatencyHistogram,
+    _hedge_delay_ms,
+    _hedged_get_object,
+    _hedging_stats,
+    _record_latency,
+)
+
+
+class _SlowThenFastS3:
+    """First get_object call blocks until released; later calls return at once."""
+
+    def __init__(self):
+        self.release = Event()
+        self.calls = 0
+        self.bodies = []
+
+    def get_object(self, Bucket, Key):
+        self.calls += 1
+        call = self.calls
+        if call == 1:
+            self.release.wait(5)
+        body = MagicMock()
+        self.bodies.append(body)
+        return {"Body": body, "call": call}
+
+
+@pytest.fixture
+def hedging_enabled():
+    with patch("shared.hedging.HEDGED_GETS_ENABLED", True), patch(
+        "shared.hedging.HEDGE_DEFAULT_DELAY_MS", 20
+    ), patch("shared.hedging.HEDGE_MIN_DELAY_MS", 1):
+        yield
+
+
+# ===== LatencyHistogram =====
+
+def test_histogram_percentile_returns_bucket_upper_bound():
+    histogram = LatencyHistogram()
+    for _ in range(95):
+        histogram.record(8)
+    for _ in range(5):
+        histogram.record(400)
+
+    assert histogram.percentile(50) == 10
+    assert histogram.percentile(99) == 500
+
+
+def test_histogram_decays_counts():
+    histogram = LatencyHistogram()
+    for _ in range(hedging._HISTOGRAM_DECAY_AT):
+        histogram.record(8)
+    assert histogram.total == hedging._HISTOGRAM_DECAY_AT // 2
+
+
+# ===== _hedge_delay_ms =====
+
+def test_hedge_delay_uses_default_until_enough_samples():
+    with patch("shared.hedging.HEDGE_DEFAULT_DELAY_MS", 123):
+        assert _hedge_delay_ms("b", "k") == 123
+
+
+def test_hedge_delay_follows_per_key_percentile_within_bounds():
+    for _ in range(50):
+        _record_latency("b", "fast", 8)
+        _record_latency("b", "slow", 700)
+
+    assert _hedge_delay_ms("b", "fast") == 20  # clamped to HEDGE_MIN_DELAY_MS
+    assert _hedge_delay_ms("b", "slow") == 750
+
+
+# ===== _hedged_get_object =====
+
+def test_disabled_hedging_calls_client_directly():
+    s3 = MagicMock()
+    _hedged_get_object(s3, "b", "k")
+    s3.get_object.assert_called_once_with(Bucket="b", Key="k")
+    assert _hedging_stats()["primary"] == 0
+
+
+def test_slow_primary_is_hedged_and_hedge_wins(hedging_enabled):
+    s3 = _SlowThenFastS3()
+
+    started = time.monotonic()
+    response = _hedged_get_object(s3, "b", "k")
+    elapsed = time.monotonic() - started
+    s3.release.set()
+
+    assert response["call"] == 2
+    assert elapsed < 1
+    assert _hedging_stats() == {"primary": 1, "hedged": 1, "hedge_won": 1, "budget_denied": 0}
+    # The loser's body is closed once it returns
+    deadline = time.monotonic() + 2
+    while len(s3.bodies) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert s3.bodies[1].close.called
+
+
+def test_fast_primary_is_not_hedged(hedging_enabled):
+    s3 = MagicMock()
+    s3.get_object.return_value = {"Body": MagicMock()}
+
+    _hedged_get_object(s3, "b", "k")
+
+    assert s3.get_object.call_count == 1
+    assert _hedging_stats()["hedged"] == 0
+
+
+def test_hedges_stop_when_budget_is_spent(hedging_enabled):
+    s3 = MagicMock()
+    s3.get_object.side_effect = lambda Bucket, Key: time.sleep(0.1) or {"Body": None}
+
+    with patch("shared.hedging._budget_tokens", 0.0):
+        _hedged_get_object(s3, "b", "k")
+
+    assert s3.get_object.call_count == 1
+    assert _hedging_stats()["budget_denied"] == 1
+
+
+def test_failed_primary_error_is_raised_when_hedge_also_fails(hedging_enabled):
+    s3 = MagicMock()
+
+    def _fail(Bucket, Key):
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    s3.get_object.side_effect = _fail
+
+    with pytest.raises(RuntimeError, match="boom"):
+        _hedged_get_object(s3, "b", "k")
@@ -0,0 +1,126 @@
+import base64
+import gzip
+import json
+from unittest.mock import patch
+
+import pytest
+
+from shared.http_utils import (
+    accepts_gzip,
+    build_response,
+    build_raw_response,
+    build_streamed_response,
+    build_redirect_response,
+    cache_headers,
+    canonical_query_string,
+    get_header,
+)
+
+
+# ===== build_response / build_raw_response =====
+
+def test_build_response_serializes_body_and_sets_cors():
+    response = build_response(200, {"a": 1})
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"]) == {"a": 1}
+    assert response["headers"]["Access-Control-Allow-Origin"] == "*"
+
+
+def test_build_response_defaults_to_no_store():
+    assert build_response(500, {})["headers"]["Cache-Control"] == "no-store"
+
+
+def test_build_response_merges_extra_headers():
+    response = build_response(200, {}, headers={"Cache-Control": "public, max-age=1"})
+    assert response["headers"]["Cache-Control"] == "public, max-age=1"
+
+
+def test_build_raw_response_base64_encodes_compressed_body():
+    response = build_raw_response(200, b"\x1f\x8b", content_encoding="gzip")
+    assert response["isBase64Encoded"] is True
+    assert base64.b64decode(response["body"]) == b"\x1f\x8b"
+    assert response["headers"]["Content-Encoding"] == "gzip"
+
+
+def test_build_raw_response_decodes_plain_bytes():
+    assert build_raw_response(200, b'{"a": 1}')["body"] == '{"a": 1}'
+
+
+def test_build_redirect_response_sets_location():
+    response = build_redirect_response("?cinemas=a,b")
+    assert response["statusCode"] == 301
+    assert response["headers"]["Location"] == "?cinemas=a,b"
+
+
+# ===== cache_headers =====
+
+@patch.dict("shared.http_utils.ROUTE_CACHE_MAX_AGE_SECONDS", {"listings": 120})
+def test_cache_headers_uses_route_max_age():
+    headers = cache_headers("listings")
+    assert headers["Cache-Control"] == "public, max-age=120, s-maxage=120"
+    assert headers["Vary"] == "Accept-Encoding"
+
+
+@patch.dict("shared.http_utils.ROUTE_CACHE_MAX_AGE_SECONDS", {"visual_listings": 900})
+@patch("shared.http_utils._presigned_urls_valid_for", return_value=650)
+def test_cache_headers_caps_visual_listings_by_presigned_url_lifetime(_mock_valid_for):
+    assert cache_headers("visual_listings")["Cache-Control"] == (
+        "public, max-age=650, s-maxage=650"
+    )
+
+
+@patch.dict("shared.http_utils.ROUTE_CACHE_MAX_AGE_SECONDS", {"listings": 0})
+def test_cache_headers_zero_max_age_is_no_store():
+    assert cache_headers("listings") == {"Cache-Control": "no-store"}
+
+
+# ===== canonical_query_string / get_header =====
+
+def test_canonical_query_string_sorts_names_and_drops_empty():
+    qs = canonical_query_string(
+        {"route_type": "listings", "dates": ["2024-01-15"], "cinemas": ["a", "b"], "fields": None}
+    )
+    assert qs == "cinemas=a,b&dates=2024-01-15&route_type=listings"
+
+
+def test_get_header_is_case_insensitive():
+    assert get_header({"Accept-Encoding": "gzip"}, "accept-encoding") == "gzip"
+    assert get_header(None, "accept-encoding") is None
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip", True),
+        ("br, GZIP;q=0.5", True),
+        ("deflate, x-gzip", True),
+        ("gzip;q=0", False),
+        ("gzip; q=0.0, br", False),
+        ("br, deflate", False),
+        ("", False),
+    ],
+)
+def test_accepts_gzip_honours_q_values(accept_encoding, expected):
+    assert accepts_gzip({"Accept-Encoding": accept_encoding}) is expected
+
+
+# ===== build_streamed_response =====
+
+def test_build_streamed_response_is_plain_json_without_gzip():
+    response = build_streamed_response(200, {"a": {"b": 1}}, headers={"X-Test": "1"})
+
+    assert json.loads(response["body"]) == {"a": {"b": 1}}
+    assert response["headers"]["X-Test"] == "1"
+    assert "Content-Encoding" not in response["headers"]
+
+
+def test_build_streamed_response_gzips_when_enabled_and_accepted():
+    with patch("shared.http_utils.STREAM_GZIP_RESPONSES", True):
+        gzipped = build_streamed_response(
+            200, {"a": {}}, request_headers={"accept-encoding": "gzip, br"}
+        )
+        plain = build_streamed_response(200, {"a": {}}, request_headers={})
+
+    assert gzipped["isBase64Encoded"] is True
+    assert json.loads(gzip.decompress(base64.b64decode(gzipped["body"]))) == {"a": {}}
+    assert json.loads(plain["body"]) == {"a": {}}
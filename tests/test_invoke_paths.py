@@ -1,11 +1,23 @@
+import json
+from datetime import date, datetime, timezone
 from unittest.mock import patch
 
+import pytest
+
 import lambda_function
+from shared.data_types import DateRange
 
 VALID_CINEMA = "bfi_southbank"
 VALID_DATE = "2024-01-15"
 
 
+@pytest.fixture(autouse=True)
+def _no_listings_version():
+    # get_listings is mocked per test; keep the version lookup off S3 too
+    with patch("lambda_function.get_listings_version", return_value="") as mock_version:
+        yield mock_version
+
+
 def _event(method="GET", route_type=None, cinemas=None, dates=None):
     qs_single = {}
     qs_multi = {}
@@ -65,21 +77,21 @@ def test_invalid_route_type_calls_build_response_400(mock_listings, mock_image,
 
 # --- pan_cinema_listings ---
 
-@patch("lambda_function.build_response")
-@patch("lambda_function.get_pan_cinema_listings")
+@patch("lambda_function.handle_pan_cinema_listings_route")
 @patch("lambda_function.get_image_listings")
 @patch("lambda_function.get_listings")
-def test_pan_cinema_listings_calls_get_pan_cinema_listings(mock_listings, mock_image, mock_pan, mock_build):
-    lambda_function.lambda_handler(_event(route_type="pan_cinema_listings"), None)
-    mock_pan.assert_called_once_with()
+def test_pan_cinema_listings_calls_pan_cinema_route(mock_listings, mock_image, mock_pan_route):
+    event = _event(route_type="pan_cinema_listings")
+    response = lambda_function.lambda_handler(event, None)
+    mock_pan_route.assert_called_once_with(event["queryStringParameters"], None)
     mock_listings.assert_not_called()
     mock_image.assert_not_called()
-    assert mock_build.call_args[0][0] == 200
+    assert response is mock_pan_route.return_value
 
 
 # --- listings ---
 
-@patch("lambda_function.build_response")
+@patch("lambda_function.build_streamed_response")
 @patch("lambda_function.get_pan_cinema_listings")
 @patch("lambda_function.get_image_listings")
 @patch("lambda_function.get_listings")
@@ -87,7 +99,7 @@ def test_listings_calls_get_listings_with_cinemas_and_dates(mock_listings, mock_
     cinemas = [VALID_CINEMA]
     dates = [VALID_DATE]
     lambda_function.lambda_handler(_event(route_type="listings", cinemas=cinemas, dates=dates), None)
-    mock_listings.assert_called_once_with(cinemas, dates)
+    mock_listings.assert_called_once_with(cinemas, dates, fields=None, response_format=None)
     mock_image.assert_not_called()
     mock_pan.assert_not_called()
     assert mock_build.call_args[0][0] == 200
@@ -95,7 +107,7 @@ def test_listings_calls_get_listings_with_cinemas_and_dates(mock_listings, mock_
 
 # --- visual_listings ---
 
-@patch("lambda_function.build_response")
+@patch("lambda_function.build_streamed_response")
 @patch("lambda_function.get_pan_cinema_listings")
 @patch("lambda_function.get_image_listings")
 @patch("lambda_function.get_listings")
@@ -103,7 +115,9 @@ def test_visual_listings_calls_get_image_listings_with_cinemas_and_dates(mock_li
     cinemas = [VALID_CINEMA]
     dates = [VALID_DATE]
     lambda_function.lambda_handler(_event(route_type="visual_listings", cinemas=cinemas, dates=dates), None)
-    mock_image.assert_called_once_with(cinemas, dates)
+    mock_image.assert_called_once_with(
+        cinemas, dates, fields=None, image_size=None, response_format=None
+    )
     mock_listings.assert_not_called()
     mock_pan.assert_not_called()
     assert mock_build.call_args[0][0] == 200
@@ -137,3 +151,472 @@ def test_invalid_date_format_calls_build_response_400(mock_listings, mock_image,
     mock_listings.assert_not_called()
     mock_image.assert_not_called()
     mock_pan.assert_not_called()
+
+
+# --- Canonical query handling ---
+
+@patch("lambda_function.get_listings")
+def test_listings_cinemas_and_dates_are_canonicalized(mock_listings):
+    mock_listings.return_value = {}
+    lambda_function.lambda_handler(
+        _event(
+            route_type="listings",
+            cinemas=["prince_charles", VALID_CINEMA, "prince_charles"],
+            dates=["2024-01-16", VALID_DATE],
+        ),
+        None,
+    )
+    args = mock_listings.call_args[0]
+    assert args[0] == [VALID_CINEMA, "prince_charles"]
+    assert args[1] == [VALID_DATE, "2024-01-16"]
+
+
+@patch("lambda_function.CANONICAL_QUERY_REDIRECT", True)
+@patch("lambda_function.get_listings")
+def test_non_canonical_query_redirects_when_enabled(mock_listings):
+    response = lambda_function.lambda_handler(
+        _event(route_type="listings", cinemas=["prince_charles", VALID_CINEMA], dates=[VALID_DATE]),
+        None,
+    )
+    assert response["statusCode"] == 301
+    assert response["headers"]["Location"] == (
+        f"?cinemas={VALID_CINEMA},prince_charles&dates={VALID_DATE}&route_type=listings"
+    )
+    mock_listings.assert_not_called()
+
+
+@patch("lambda_function.get_listings")
+def test_listings_success_sets_cache_control(mock_listings):
+    mock_listings.return_value = {}
+    response = lambda_function.lambda_handler(
+        _event(route_type="listings", cinemas=[VALID_CINEMA], dates=[VALID_DATE]), None
+    )
+    assert response["headers"]["Cache-Control"].startswith("public, max-age=")
+
+
+def _listing_on(date):
+    return {"when": [{"date": date, "year": "2024", "times": ["18:00"]}]}
+
+
+@patch("shared.listings_utils._load_cinema_listings")
+def test_listings_with_failed_cinema_are_not_cacheable(mock_load):
+    mock_load.side_effect = lambda cinema: (
+        ({"error": f"Failed to load listings for {cinema}: SlowDown"}, None)
+        if cinema == "rio"
+        else ({"Film A": _listing_on(VALID_DATE)}, "etag")
+    )
+
+    response = lambda_function.lambda_handler(
+        _event(route_type="listings", cinemas=["barbican", "rio"], dates=[VALID_DATE]), None
+    )
+
+    body = json.loads(response["body"])
+    assert "Film A" in body["barbican"]
+    assert "SlowDown" in body["rio"]["error"]
+    assert response["headers"]["Cache-Control"] == "no-store"
+
+
+@patch("shared.listings_utils._load_cinema_listings")
+def test_listings_fields_accepts_title(mock_load):
+    mock_load.return_value = (
+        {"Film A": {**_listing_on(VALID_DATE), "url": "u", "description": "d"}},
+        "etag",
+    )
+    event = _event(route_type="listings", cinemas=[VALID_CINEMA], dates=[VALID_DATE])
+    event["queryStringParameters"]["fields"] = "title,when,url"
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 200
+    listing = json.loads(response["body"])[VALID_CINEMA]["Film A"]
+    assert listing == {"when": _listing_on(VALID_DATE)["when"], "url": "u"}
+
+
+@patch("lambda_function.get_image_listings")
+def test_visual_listings_with_failed_images_are_not_cacheable(mock_image):
+    mock_image.return_value = {
+        "barbican": {"Film A": {"image_url": "http://a"}},
+        "rio": {"error": "Failed to fetch good images for rio: SlowDown"},
+    }
+
+    response = lambda_function.lambda_handler(
+        _event(route_type="visual_listings", cinemas=["barbican", "rio"], dates=[VALID_DATE]),
+        None,
+    )
+
+    assert response["headers"]["Cache-Control"] == "no-store"
+
+
+@pytest.mark.parametrize("key", ["failed_cinemas", "timed_out_cinemas"])
+def test_is_partial_reads_failed_and_timed_out_cinema_lists(key):
+    assert lambda_function._is_partial({"query": "x", "results": [], key: ["rio"]})
+    assert not lambda_function._is_partial({"query": "x", "results": []})
+
+
+# --- Date ranges ---
+
+def test_listings_today_is_in_listings_timezone():
+    # 00:30 BST on 1 June is still 31 May in UTC
+    now = datetime(2024, 5, 31, 23, 30, tzinfo=timezone.utc)
+    assert lambda_function._listings_today(now) == date(2024, 6, 1)
+
+
+@patch("lambda_function._listings_today", return_value=date(2024, 6, 1))
+def test_date_range_defaults_from_to_listings_today(_mock_today):
+    assert lambda_function._parse_date_range({"days": "7"}) == DateRange(
+        "2024-06-01", "2024-06-07"
+    )
+
+
+@patch("lambda_function.get_listings")
+def test_listings_from_to_passes_date_range(mock_listings):
+    mock_listings.return_value = {}
+    event = _event(route_type="listings", cinemas=[VALID_CINEMA])
+    event["queryStringParameters"].update({"from": "2024-01-15", "to": "2024-01-21"})
+
+    lambda_function.lambda_handler(event, None)
+
+    assert mock_listings.call_args[0][1] == DateRange("2024-01-15", "2024-01-21")
+
+
+@patch("lambda_function.get_listings")
+def test_listings_days_resolves_from_start_date(mock_listings):
+    mock_listings.return_value = {}
+    event = _event(route_type="listings", cinemas=[VALID_CINEMA])
+    event["queryStringParameters"].update({"from": "2024-01-30", "days": "3"})
+
+    lambda_function.lambda_handler(event, None)
+
+    assert mock_listings.call_args[0][1] == DateRange("2024-01-30", "2024-02-01")
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"from": "2024-01-15", "to": "2024-01-14"},
+        {"from": "2024-01-15", "days": "0"},
+        {"from": "2024-01-15", "days": "400"},
+        {"from": "2024-01-15", "to": "2024-01-16", "days": "2"},
+        {"from": "15-01-2024"},
+        {"from": "2024-01-15", "days": "99999999999"},
+        {"from": "9999-12-31", "days": "2"},
+    ],
+)
+@patch("lambda_function.get_listings")
+def test_listings_invalid_date_range_returns_400(mock_listings, params):
+    event = _event(route_type="listings", cinemas=[VALID_CINEMA])
+    event["queryStringParameters"].update(params)
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+    mock_listings.assert_not_called()
+
+
+@patch("lambda_function.get_listings")
+def test_listings_dates_and_range_together_returns_400(mock_listings):
+    event = _event(route_type="listings", cinemas=[VALID_CINEMA], dates=[VALID_DATE])
+    event["queryStringParameters"]["from"] = VALID_DATE
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+    mock_listings.assert_not_called()
+
+
+# --- cinemas=all ---
+
+@patch("lambda_function.get_listings")
+def test_listings_cinemas_all_expands_to_every_cinema(mock_listings):
+    mock_listings.return_value = {}
+    lambda_function.lambda_handler(
+        _event(route_type="listings", cinemas="all", dates=[VALID_DATE]), None
+    )
+    assert mock_listings.call_args[0][0] == sorted(lambda_function.CINEMAS)
+
+
+@patch("lambda_function.CANONICAL_QUERY_REDIRECT", True)
+@patch("lambda_function.get_listings")
+def test_full_cinema_list_redirect_keeps_the_list_explicit(mock_listings):
+    mock_listings.return_value = {}
+    cinemas = sorted(lambda_function.CINEMAS)
+
+    response = lambda_function.lambda_handler(
+        _event(route_type="listings", cinemas=cinemas[::-1], dates=[VALID_DATE]), None
+    )
+    assert response["headers"]["Location"].startswith(f"?cinemas={','.join(cinemas)}&")
+
+    response = lambda_function.lambda_handler(
+        _event(route_type="listings", cinemas=cinemas, dates=[VALID_DATE]), None
+    )
+    assert response["statusCode"] == 200
+
+
+@patch("lambda_function.CANONICAL_QUERY_REDIRECT", True)
+@patch("lambda_function.get_listings")
+def test_redirect_keeps_relative_date_range_relative(mock_listings):
+    event = _event(route_type="listings", cinemas=["rio", "barbican"])
+    event["queryStringParameters"]["days"] = "7"
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 301
+    assert response["headers"]["Location"] == (
+        "?cinemas=barbican,rio&days=7&route_type=listings"
+    )
+
+
+@patch("lambda_function.CANONICAL_QUERY_REDIRECT", True)
+@patch("lambda_function.get_listings")
+def test_redirect_writes_range_with_from_as_absolute_dates(mock_listings):
+    event = _event(route_type="listings", cinemas=["rio", "barbican"])
+    event["queryStringParameters"].update({"from": "2024-01-15", "days": "3"})
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["headers"]["Location"] == (
+        "?cinemas=barbican,rio&from=2024-01-15&route_type=listings&to=2024-01-17"
+    )
+
+
+# --- Warm-up events ---
+
+@pytest.mark.parametrize(
+    "event",
+    [
+        {"warmup": True},
+        {"source": "aws.events", "detail-type": "Scheduled Event"},
+        {"source": "serverless-plugin-warmup"},
+    ],
+)
+@patch("lambda_function._prefetch")
+@patch("lambda_function.get_listings")
+def test_warmup_event_prefetches_and_returns_early(mock_listings, mock_prefetch, event):
+    mock_prefetch.return_value = {"cinemas": 1}
+
+    response = lambda_function.lambda_handler(event, None)
+
+    mock_prefetch.assert_called_once_with(lambda_function.PREFETCH_CINEMAS)
+    assert response == {"warmed": True, "cinemas": 1}
+    mock_listings.assert_not_called()
+
+
+@patch("lambda_function.get_pan_cinema_listings")
+@patch("lambda_function._get_cinemas_good_images")
+@patch("lambda_function._get_cinemas_raw_listings")
+def test_prefetch_loads_listings_images_and_pan_cinema(mock_raw, mock_images, mock_pan):
+    mock_raw.return_value = {VALID_CINEMA: {}, "barbican": {"error": "missing"}}
+    mock_images.return_value = {VALID_CINEMA: [], "barbican": []}
+    mock_pan.return_value = {}
+
+    summary = lambda_function._prefetch([VALID_CINEMA, "barbican"])
+
+    mock_raw.assert_called_once_with([VALID_CINEMA, "barbican"])
+    mock_images.assert_called_once_with([VALID_CINEMA, "barbican"])
+    mock_pan.assert_called_once_with()
+    assert summary["failed_cinemas"] == ["barbican"]
+    assert summary["pan_cinema_loaded"] is True
+
+
+# --- upcoming_showings ---
+
+@patch("lambda_function.get_upcoming_showings")
+def test_upcoming_showings_passes_window(mock_upcoming):
+    mock_upcoming.return_value = {"showings": []}
+    event = _event(route_type="upcoming_showings", cinemas=["rio", VALID_CINEMA])
+    event["queryStringParameters"].update({"start": "2024-01-15T22:30", "hours": "4"})
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 200
+    mock_upcoming.assert_called_once_with(
+        [VALID_CINEMA, "rio"], "2024-01-15T22:30", "2024-01-16T02:30"
+    )
+
+
+@patch("lambda_function.get_upcoming_showings")
+def test_upcoming_showings_defaults_to_now(mock_upcoming):
+    mock_upcoming.return_value = {"showings": []}
+
+    lambda_function.lambda_handler(
+        _event(route_type="upcoming_showings", cinemas=[VALID_CINEMA]), None
+    )
+
+    _, start, end = mock_upcoming.call_args[0]
+    assert lambda_function._parse_showing_window({"start": start}) == (start, end)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"start": "2024-01-15"},
+        {"hours": "0"},
+        {"hours": "1000"},
+        {"hours": "x"},
+        {"start": "9999-12-31T23:00", "hours": "2"},
+    ],
+)
+@patch("lambda_function.get_upcoming_showings")
+def test_upcoming_showings_invalid_window_returns_400(mock_upcoming, params):
+    event = _event(route_type="upcoming_showings", cinemas=[VALID_CINEMA])
+    event["queryStringParameters"].update(params)
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+    mock_upcoming.assert_not_called()
+
+
+# --- search ---
+
+@patch("lambda_function.search_listings")
+def test_search_defaults_to_all_cinemas_and_no_dates(mock_search):
+    mock_search.return_value = {"results": []}
+    event = _event(route_type="search")
+    event["queryStringParameters"]["q"] = "panda"
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 200
+    mock_search.assert_called_once_with(
+        "panda", sorted(lambda_function.CINEMAS), [], fields=None, limit=20
+    )
+
+
+@patch("lambda_function.search_listings")
+def test_search_passes_filters(mock_search):
+    mock_search.return_value = {"results": []}
+    event = _event(route_type="search", cinemas=[VALID_CINEMA])
+    event["queryStringParameters"].update(
+        {"q": "panda", "from": "2024-01-15", "days": "2", "limit": "5"}
+    )
+
+    lambda_function.lambda_handler(event, None)
+
+    mock_search.assert_called_once_with(
+        "panda",
+        [VALID_CINEMA],
+        DateRange("2024-01-15", "2024-01-16"),
+        fields=None,
+        limit=5,
+    )
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{}, {"q": "  "}, {"q": "panda", "limit": "0"}, {"q": "panda", "limit": "x"}],
+)
+@patch("lambda_function.search_listings")
+def test_search_invalid_params_return_400(mock_search, params):
+    event = _event(route_type="search")
+    event["queryStringParameters"].update(params)
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+    mock_search.assert_not_called()
+
+
+# --- since (delta responses) ---
+
+@patch("lambda_function.get_listings")
+@patch("lambda_function.get_listings_changes")
+def test_listings_since_returns_changes_with_version_header(mock_changes, mock_listings):
+    mock_changes.return_value = {"since": "x", "version": "bfi_southbank:abc", "changes": {}}
+    event = _event(route_type="listings", cinemas=[VALID_CINEMA], dates=[VALID_DATE])
+    event["queryStringParameters"]["since"] = "bfi_southbank:aaa"
+
+    response = lambda_function.lambda_handler(event, None)
+
+    mock_changes.assert_called_once_with(
+        [VALID_CINEMA], [VALID_DATE], "bfi_southbank:aaa", fields=None
+    )
+    mock_listings.assert_not_called()
+    assert response["headers"]["X-Listings-Version"] == "bfi_southbank:abc"
+
+
+@patch("lambda_function.get_listings")
+@patch("lambda_function.get_listings_changes")
+def test_listings_since_falls_back_to_full_response(
+    mock_changes, mock_listings, _no_listings_version
+):
+    mock_changes.return_value = None
+    mock_listings.return_value = {}
+    _no_listings_version.return_value = "bfi_southbank:bbb"
+    event = _event(route_type="listings", cinemas=[VALID_CINEMA], dates=[VALID_DATE])
+    event["queryStringParameters"]["since"] = "bfi_southbank:aaa"
+
+    response = lambda_function.lambda_handler(event, None)
+
+    mock_listings.assert_called_once()
+    assert response["headers"]["X-Listings-Version"] == "bfi_southbank:bbb"
+
+
+@pytest.mark.parametrize(
+    "route_type,since", [("listings", "garbage"), ("visual_listings", "bfi_southbank:aaa")]
+)
+@patch("lambda_function.get_listings_changes")
+def test_invalid_since_returns_400(mock_changes, route_type, since):
+    event = _event(route_type=route_type, cinemas=[VALID_CINEMA], dates=[VALID_DATE])
+    event["queryStringParameters"]["since"] = since
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+    mock_changes.assert_not_called()
+
+
+# --- image_size ---
+
+@patch("lambda_function.get_image_listings")
+def test_visual_listings_passes_image_size(mock_image):
+    mock_image.return_value = {}
+    event = _event(route_type="visual_listings", cinemas=[VALID_CINEMA], dates=[VALID_DATE])
+    event["queryStringParameters"]["image_size"] = "thumb"
+
+    lambda_function.lambda_handler(event, None)
+
+    mock_image.assert_called_once_with(
+        [VALID_CINEMA], [VALID_DATE], fields=None, image_size="thumb", response_format=None
+    )
+
+
+@pytest.mark.parametrize(
+    "route_type,image_size", [("visual_listings", "huge"), ("listings", "thumb")]
+)
+@patch("lambda_function.get_image_listings")
+@patch("lambda_function.get_listings")
+def test_invalid_image_size_returns_400(mock_listings, mock_image, route_type, image_size):
+    event = _event(route_type=route_type, cinemas=[VALID_CINEMA], dates=[VALID_DATE])
+    event["queryStringParameters"]["image_size"] = image_size
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+    mock_image.assert_not_called()
+    mock_listings.assert_not_called()
+
+
+# --- format ---
+
+@patch("lambda_function.get_listings", return_value={"format": "compact", "dates": [], "listings": {}})
+def test_listings_passes_format(mock_listings):
+    event = _event(route_type="listings", cinemas=[VALID_CINEMA], dates=[VALID_DATE])
+    event["queryStringParameters"]["format"] = "columnar"
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 200
+    assert mock_listings.call_args.kwargs["response_format"] == "columnar"
+
+
+@pytest.mark.parametrize("extra", [{"format": "tabular"}, {"format": "compact", "since": "x:1"}])
+@patch("lambda_function.get_listings")
+def test_listings_rejects_bad_format(mock_listings, extra):
+    event = _event(route_type="listings", cinemas=[VALID_CINEMA], dates=[VALID_DATE])
+    event["queryStringParameters"].update(extra)
+
+    response = lambda_function.lambda_handler(event, None)
+
+    assert response["statusCode"] == 400
+    mock_listings.assert_not_called()
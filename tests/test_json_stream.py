@@ -0,0 +1,82 @@
+import gzip
+import json
+import tracemalloc
+
+import pytest
+
+from shared.json_stream import encode_json_stream
+
+_PAYLOAD = {
+    "bfi_southbank": {
+        "Film A": {"when": [{"date": "2025-06-01", "time": "18:00"}], "cast": ["Zoë", None]},
+        "Film \"B\"": {"url": "https://example.com/?a=1&b=2", "rating": 4.5, "ok": True},
+    },
+    "barbican": {"error": "No active listings found for barbican"},
+    "empty": {},
+}
+
+
+def _big_payload(cinemas=20, films=200):
+    return {
+        f"cinema_{c}": {
+            f"Film {f}": {"description": "x" * 200, "when": [{"date": "2025-06-01"}] * 5}
+            for f in range(films)
+        }
+        for c in range(cinemas)
+    }
+
+
+@pytest.mark.parametrize("depth", [0, 1, 2, 3])
+def test_matches_json_dumps(depth):
+    assert encode_json_stream(_PAYLOAD, depth=depth) == json.dumps(_PAYLOAD)
+
+
+@pytest.mark.parametrize("value", [[], [1, {"a": 2}], "text", None, 3])
+def test_non_dict_bodies_match_json_dumps(value):
+    assert encode_json_stream(value) == json.dumps(value)
+
+
+def test_gzipped_output_decompresses_to_json_dumps():
+    body = encode_json_stream(_PAYLOAD, gzipped=True)
+
+    assert isinstance(body, bytes)
+    assert gzip.decompress(body).decode("utf-8") == json.dumps(_PAYLOAD)
+
+
+def test_release_empties_only_the_levels_written_entry_by_entry():
+    payload = {"a": {"x": 1}, "b": {"y": 2}}
+    inner = payload["a"]
+
+    assert encode_json_stream(payload, release=True) == '{"a": {"x": 1}, "b": {"y": 2}}'
+    assert payload == {}
+    assert inner == {"x": 1}
+
+
+def test_release_with_depth_empties_nested_dicts():
+    listings = {"bfi": {"Film": {"url": "u"}}}
+    film = listings["bfi"]
+    payload = {"format": "compact", "listings": listings}
+
+    body = encode_json_stream(payload, depth=2, release=True)
+
+    assert json.loads(body) == {"format": "compact", "listings": {"bfi": {"Film": {"url": "u"}}}}
+    assert payload == {}
+    assert listings == {}
+    assert film == {"Film": {"url": "u"}}
+
+
+def test_gzipped_stream_peaks_below_json_dumps_of_the_same_payload():
+    def _peak(encode):
+        payload = _big_payload()
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        encode(payload)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+        return peak
+
+    dumped = _peak(lambda p: gzip.compress(json.dumps(p).encode("utf-8")))
+    streamed = _peak(lambda p: encode_json_stream(p, gzipped=True, release=True))
+
+    assert streamed < dumped * 0.5
@@ -0,0 +1,137 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from routes.get_listings import get_listings_changes, get_listings_version
+from shared.listings_delta import (
+    _listings_version,
+    _parse_listings_version,
+    _diff_listing,
+    _diff_cinema_listings,
+)
+from shared.snapshot_cache import _clear_snapshot_cache
+
+
+def _when(date, *showtimes):
+    return {"date": date, "showtimes": list(showtimes)}
+
+
+# ===== version tokens =====
+
+def test_listings_version_round_trips():
+    version = _listings_version(
+        {"rio": '"0123456789abcdef"', "bfi_southbank": '"fedcba9876543210"', "ica": None}
+    )
+    assert version == "bfi_southbank:fedcba987654,rio:0123456789ab"
+    assert _parse_listings_version(version) == {
+        "bfi_southbank": "fedcba987654",
+        "rio": "0123456789ab",
+    }
+
+
+@pytest.mark.parametrize("version", ["", "rio", "rio:", ":abc", "rio:abc,,ica:def"])
+def test_parse_listings_version_rejects_malformed(version):
+    with pytest.raises(ValueError):
+        _parse_listings_version(version)
+
+
+# ===== diffs =====
+
+def test_diff_listing_reports_fields_and_when_entries():
+    old = {"url": "a", "screen": "1", "when": [_when("2024-01-15", "18:00"), _when("2024-01-16", "18:00")]}
+    new = {"url": "b", "when": [_when("2024-01-15", "20:00"), _when("2024-01-17", "18:00")]}
+
+    assert _diff_listing(old, new) == {
+        "set": {"url": "b"},
+        "unset": ["screen"],
+        "when": {
+            "upserted": [_when("2024-01-15", "20:00"), _when("2024-01-17", "18:00")],
+            "removed": ["2024-01-16"],
+        },
+    }
+
+
+def test_diff_listing_returns_none_when_equal():
+    listing = {"url": "a", "when": [_when("2024-01-15", "18:00")]}
+    assert _diff_listing(listing, json.loads(json.dumps(listing))) is None
+
+
+def test_diff_cinema_listings():
+    old = {"A": {"url": "a"}, "B": {"url": "b"}, "C": {"url": "c"}}
+    new = {"A": {"url": "a"}, "B": {"url": "b2"}, "D": {"url": "d"}}
+
+    assert _diff_cinema_listings(old, new) == {
+        "added": {"D": {"url": "d"}},
+        "changed": {"B": {"set": {"url": "b2"}}},
+        "removed": ["C"],
+    }
+    assert _diff_cinema_listings(old, old) == {}
+
+
+# ===== get_listings_changes =====
+
+def _s3_object(data, etag):
+    body = MagicMock()
+    body.read.return_value = json.dumps(data).encode("utf-8")
+    return {"Body": body, "ETag": etag}
+
+
+V1 = {
+    "Film A": {"url": "a", "isImageGood": True, "when": [_when("2024-01-15", "18:00")]},
+    "Film B": {"url": "b", "when": [_when("2024-01-15", "20:00")]},
+}
+V2 = {
+    "Film A": {"url": "a", "isImageGood": True, "when": [_when("2024-01-15", "18:30")]},
+    "Film C": {"url": "c", "when": [_when("2024-01-15", "21:00")]},
+}
+
+
+@pytest.fixture
+def mock_s3():
+    with patch("shared.listings_utils.s3") as mock_s3, patch(
+        "shared.listings_utils.LISTINGS_CACHE_TTL_SECONDS", 0
+    ), patch("shared.snapshot_cache.SNAPSHOT_MAX_STALE_SECONDS", 0):
+        yield mock_s3
+
+
+def test_get_listings_changes_diffs_against_previous_version(mock_s3):
+    mock_s3.get_object.return_value = _s3_object(V1, '"aaaaaaaaaaaaaaaa"')
+    since = get_listings_version(["bfi_southbank"])
+    mock_s3.get_object.return_value = _s3_object(V2, '"bbbbbbbbbbbbbbbb"')
+
+    result = get_listings_changes(["bfi_southbank"], ["2024-01-15"], since)
+
+    assert result["since"] == "bfi_southbank:aaaaaaaaaaaa"
+    assert result["version"] == "bfi_southbank:bbbbbbbbbbbb"
+    assert result["changes"] == {
+        "bfi_southbank": {
+            "added": {"Film C": V2["Film C"]},
+            "changed": {"Film A": {"when": {"upserted": [_when("2024-01-15", "18:30")]}}},
+            "removed": ["Film B"],
+        }
+    }
+
+
+def test_get_listings_changes_is_empty_for_current_version(mock_s3):
+    mock_s3.get_object.return_value = _s3_object(V1, '"aaaaaaaaaaaaaaaa"')
+    since = get_listings_version(["bfi_southbank"])
+
+    result = get_listings_changes(["bfi_southbank"], ["2024-01-15"], since)
+
+    assert result["changes"] == {}
+
+
+def test_get_listings_changes_returns_none_when_version_aged_out(mock_s3):
+    mock_s3.get_object.return_value = _s3_object(V1, '"aaaaaaaaaaaaaaaa"')
+    since = get_listings_version(["bfi_southbank"])
+    _clear_snapshot_cache()
+    mock_s3.get_object.return_value = _s3_object(V2, '"bbbbbbbbbbbbbbbb"')
+
+    assert get_listings_changes(["bfi_southbank"], ["2024-01-15"], since) is None
+
+
+def test_get_listings_changes_returns_none_for_unknown_cinema_version(mock_s3):
+    mock_s3.get_object.return_value = _s3_object(V1, '"aaaaaaaaaaaaaaaa"')
+
+    assert get_listings_changes(["bfi_southbank"], ["2024-01-15"], "rio:aaaaaaaaaaaa") is None
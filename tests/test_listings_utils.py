@@ -1,12 +1,20 @@
 import json
 from unittest.mock import patch, MagicMock
 
+import pytest
+
 from shared.listings_utils import (
+    _parse_fields_param,
+    _compile_listing_projector,
     _redact_listings_fields,
     _filter_listings_by_dates,
+    _filter_listing_by_dates,
     _filter_cinemas_listings_by_dates,
+    _filter_listings_by_date_range,
+    _build_date_index,
     _get_cinemas_raw_listings,
 )
+from shared.data_types import DateRange
 
 
 # ===== _redact_listings_fields =====
@@ -63,6 +71,84 @@ def test_redact_multiple_cinemas():
     assert result["barbican"]["Film B"] == {"title": "B"}
 
 
+def test_redact_with_fields_projects_listing():
+    listings = {"bfi": {"Film A": {"url": "u", "description": "d", "when": []}}}
+    result = _redact_listings_fields(listings, fields=("url", "when"))
+    assert result["bfi"]["Film A"] == {"url": "u", "when": []}
+
+
+def test_redact_with_fields_never_returns_redacted_fields():
+    listings = {"bfi": {"Film A": {"url": "u", "s3ImageURL": "http://s3"}}}
+    result = _redact_listings_fields(listings, fields=("s3ImageURL", "url"))
+    assert result["bfi"]["Film A"] == {"url": "u"}
+
+
+def test_redact_with_fields_keeps_listing_with_empty_projection():
+    listings = {"bfi": {"Film A": {"description": "d"}}}
+    result = _redact_listings_fields(listings, fields=("url",))
+    assert result["bfi"]["Film A"] == {}
+
+
+# ===== _parse_fields_param / _compile_listing_projector =====
+
+def test_parse_fields_param_none_when_missing():
+    assert _parse_fields_param(None) is None
+    assert _parse_fields_param(" , ") is None
+
+
+def test_parse_fields_param_is_canonical():
+    assert _parse_fields_param("when,url,when") == ("url", "when")
+    assert _parse_fields_param(["url", "when"]) == ("url", "when")
+
+
+def test_parse_fields_param_accepts_additional_info_sub_fields():
+    assert _parse_fields_param("_additional_info.directors") == (
+        "_additional_info.directors",
+    )
+
+
+def test_parse_fields_param_rejects_unknown_field():
+    with pytest.raises(ValueError):
+        _parse_fields_param("url,not_a_field")
+
+
+def test_parse_fields_param_rejects_sub_field_of_plain_field():
+    with pytest.raises(ValueError):
+        _parse_fields_param("when.date")
+
+
+@pytest.mark.parametrize("raw", ["_additional_info.", ".directors", "."])
+def test_parse_fields_param_rejects_empty_field_names(raw):
+    with pytest.raises(ValueError):
+        _parse_fields_param(raw)
+
+
+def test_title_field_is_accepted_but_not_projected():
+    fields = _parse_fields_param("title,url")
+    assert fields == ("title", "url")
+    assert _compile_listing_projector(fields)({"url": "u", "when": []}) == {"url": "u"}
+
+
+def test_compile_listing_projector_is_reused():
+    assert _compile_listing_projector(("url",)) is _compile_listing_projector(("url",))
+
+
+def test_compile_listing_projector_projects_additional_info_sub_fields():
+    project = _compile_listing_projector(("_additional_info.directors", "url"))
+    listing = {
+        "url": "u",
+        "description": "d",
+        "_additional_info": {"directors": ["X"], "cast": ["Y"]},
+    }
+    assert project(listing) == {"url": "u", "_additional_info": {"directors": ["X"]}}
+
+
+def test_compile_listing_projector_whole_field_wins_over_sub_field():
+    project = _compile_listing_projector(("_additional_info", "_additional_info.cast"))
+    listing = {"_additional_info": {"directors": ["X"], "cast": ["Y"]}}
+    assert project(listing) == listing
+
+
 # ===== _filter_listings_by_dates =====
 
 def _listing_with_dates(*dates):
@@ -106,6 +192,69 @@ def test_filter_listings_by_dates_multiple_dates():
     assert "Film C" not in result
 
 
+def test_filter_listings_by_dates_skips_error_entries():
+    listings = {"error": "No active listings found for bfi"}
+    assert _filter_listings_by_dates(listings, ["2024-01-15"]) == {}
+
+
+def test_filter_listings_by_dates_dispatches_date_range():
+    listings = {"Film A": _listing_with_dates("2024-01-15", "2024-01-20")}
+    result = _filter_listings_by_dates(listings, DateRange("2024-01-14", "2024-01-16"))
+    assert [w["date"] for w in result["Film A"]["when"]] == ["2024-01-15"]
+
+
+def test_filter_listing_by_dates_trims_one_listing():
+    listing = _listing_with_dates("2024-01-14", "2024-01-15", "2024-01-17")
+
+    by_range = _filter_listing_by_dates(listing, DateRange("2024-01-15", "2024-01-16"))
+    by_dates = _filter_listing_by_dates(listing, ["2024-01-17"])
+
+    assert [w["date"] for w in by_range["when"]] == ["2024-01-15"]
+    assert [w["date"] for w in by_dates["when"]] == ["2024-01-17"]
+    assert len(listing["when"]) == 3
+    assert _filter_listing_by_dates(listing, ["2024-02-01"]) is None
+
+
+# ===== _build_date_index / _filter_listings_by_date_range =====
+
+def test_build_date_index_sorts_dates_and_groups_entries():
+    listings = {
+        "Film A": _listing_with_dates("2024-01-16", "2024-01-15"),
+        "Film B": _listing_with_dates("2024-01-15"),
+        "Bad": "not_a_dict",
+    }
+    sorted_dates, entries = _build_date_index(listings)
+    assert sorted_dates == ["2024-01-15", "2024-01-16"]
+    assert [title for title, _ in entries[0]] == ["Film A", "Film B"]
+    assert [title for title, _ in entries[1]] == ["Film A"]
+
+
+def test_filter_listings_by_date_range_is_inclusive():
+    listings = {
+        "Film A": _listing_with_dates("2024-01-14", "2024-01-15"),
+        "Film B": _listing_with_dates("2024-01-17"),
+        "Film C": _listing_with_dates("2024-01-18"),
+    }
+    result = _filter_listings_by_date_range(listings, DateRange("2024-01-15", "2024-01-17"))
+    assert [w["date"] for w in result["Film A"]["when"]] == ["2024-01-15"]
+    assert [w["date"] for w in result["Film B"]["when"]] == ["2024-01-17"]
+    assert "Film C" not in result
+
+
+def test_filter_listings_by_date_range_does_not_modify_input():
+    listings = {"Film A": _listing_with_dates("2024-01-14", "2024-01-15")}
+    _filter_listings_by_date_range(listings, DateRange("2024-01-15", "2024-01-15"))
+    assert len(listings["Film A"]["when"]) == 2
+
+
+@patch("shared.listings_utils._build_date_index", wraps=_build_date_index)
+def test_filter_listings_by_date_range_builds_index_once_per_snapshot(mock_build):
+    listings = {"Film A": _listing_with_dates("2024-01-15")}
+    _filter_listings_by_date_range(listings, DateRange("2024-01-15", "2024-01-15"))
+    _filter_listings_by_date_range(listings, DateRange("2024-01-01", "2024-01-31"))
+    assert mock_build.call_count == 1
+
+
 # ===== _filter_cinemas_listings_by_dates =====
 
 def test_filter_cinemas_listings_by_dates_filters_each_cinema():
@@ -163,6 +312,34 @@ def test_get_cinemas_raw_listings_handles_general_exception(mock_s3):
     assert "timeout" in result["bfi_southbank"]["error"]
 
 
+@patch("shared.listings_utils.s3")
+def test_get_cinemas_raw_listings_negatively_caches_missing_cinema(mock_s3):
+    class NoSuchKey(Exception):
+        response = {"Error": {"Code": "NoSuchKey"}}
+
+    mock_s3.exceptions.NoSuchKey = NoSuchKey
+    mock_s3.get_object.side_effect = NoSuchKey("missing")
+
+    first = _get_cinemas_raw_listings(["bfi_southbank"])
+    second = _get_cinemas_raw_listings(["bfi_southbank"])
+
+    assert first == second == {
+        "bfi_southbank": {"error": "No active listings found for bfi_southbank"}
+    }
+    assert mock_s3.get_object.call_count == 1
+
+
+@patch("shared.listings_utils.s3")
+def test_get_cinemas_raw_listings_reuses_cached_snapshot(mock_s3):
+    mock_s3.get_object.return_value = _make_s3_body({"Film A": {"when": []}})
+
+    first = _get_cinemas_raw_listings(["bfi_southbank"])
+    second = _get_cinemas_raw_listings(["bfi_southbank"])
+
+    assert first == second
+    assert mock_s3.get_object.call_count == 1
+
+
 @patch("shared.listings_utils.s3")
 def test_get_cinemas_raw_listings_multiple_cinemas(mock_s3):
     def _side_effect(**kwargs):
@@ -175,3 +352,55 @@ def test_get_cinemas_raw_listings_multiple_cinemas(mock_s3):
 
     assert "bfi_southbank" in result
     assert "barbican" in result
+
+
+# ===== combined all-cinemas snapshot =====
+
+@patch("shared.listings_utils.COMBINED_LISTINGS_MIN_CINEMAS", 2)
+@patch("shared.listings_utils.s3")
+def test_get_cinemas_raw_listings_slices_combined_snapshot(mock_s3):
+    from shared.config import LISTING_BUCKET, ALL_CINEMAS_LISTINGS_KEY
+
+    combined = {
+        "bfi_southbank": {"Film A": {"when": []}},
+        "barbican": {"Film B": {"when": []}},
+    }
+    mock_s3.get_object.return_value = _make_s3_body(combined)
+
+    result = _get_cinemas_raw_listings(["bfi_southbank", "barbican"])
+
+    assert result == combined
+    mock_s3.get_object.assert_called_once_with(
+        Bucket=LISTING_BUCKET, Key=ALL_CINEMAS_LISTINGS_KEY
+    )
+
+
+@patch("shared.listings_utils.COMBINED_LISTINGS_MIN_CINEMAS", 2)
+@patch("shared.listings_utils.s3")
+def test_get_cinemas_raw_listings_fetches_cinemas_missing_from_combined(mock_s3):
+    def _side_effect(**kwargs):
+        if kwargs["Key"].endswith("active_listings_by_cinema.json"):
+            return _make_s3_body({"bfi_southbank": {"Film A": {}}})
+        return _make_s3_body({"Film B": {}})
+
+    mock_s3.get_object.side_effect = _side_effect
+
+    result = _get_cinemas_raw_listings(["bfi_southbank", "barbican"])
+
+    assert result == {"bfi_southbank": {"Film A": {}}, "barbican": {"Film B": {}}}
+    assert mock_s3.get_object.call_count == 2
+
+
+@patch("shared.listings_utils.COMBINED_LISTINGS_MIN_CINEMAS", 2)
+@patch("shared.listings_utils.s3")
+def test_get_cinemas_raw_listings_falls_back_without_combined(mock_s3):
+    def _side_effect(**kwargs):
+        if kwargs["Key"].endswith("active_listings_by_cinema.json"):
+            raise Exception("NoSuchKey")
+        return _make_s3_body({"Film": {}})
+
+    mock_s3.get_object.side_effect = _side_effect
+
+    result = _get_cinemas_raw_listings(["bfi_southbank", "barbican"])
+
+    assert result == {"bfi_southbank": {"Film": {}}, "barbican": {"Film": {}}}
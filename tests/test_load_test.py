@@ -0,0 +1,48 @@
+from load_test import LocalS3, build_dataset, run_load_test, DEFAULT_MIX
+
+
+# ===== LocalS3 =====
+
+def test_local_s3_get_object_missing_key_raises_no_such_key():
+    s3 = LocalS3()
+    try:
+        s3.get_object(Bucket="b", Key="missing")
+    except s3.exceptions.NoSuchKey:
+        pass
+    else:
+        raise AssertionError("expected NoSuchKey")
+
+
+def test_local_s3_list_objects_v2_paginates():
+    s3 = LocalS3()
+    for n in range(5):
+        s3.put_object(Bucket="b", Key=f"prefix/{n}.jpg", Body=b"x")
+
+    page1 = s3.list_objects_v2(Bucket="b", Prefix="prefix/", MaxKeys=3)
+    page2 = s3.list_objects_v2(
+        Bucket="b", Prefix="prefix/", MaxKeys=3, ContinuationToken=page1["NextContinuationToken"]
+    )
+
+    assert len(page1["Contents"]) == 3 and page1["IsTruncated"]
+    assert len(page2["Contents"]) == 2 and not page2["IsTruncated"]
+
+
+def test_build_dataset_writes_listings_and_pan_cinema():
+    s3 = LocalS3()
+    dataset = build_dataset(s3, films_per_cinema=3, days=2)
+    assert dataset["film_ids"]
+    assert len(dataset["dates"]) == 2
+    assert s3.objects
+
+
+# ===== run_load_test =====
+
+def test_run_load_test_reports_every_scenario_without_errors():
+    report = run_load_test(requests=120, concurrency=4, films_per_cinema=5, days=3)
+
+    assert report["overall"]["requests"] == 120
+    assert set(report["scenarios"]) == set(DEFAULT_MIX)
+    for stats in report["scenarios"].values():
+        assert stats["error_rate"] == 0
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert report["s3_calls"]["get_object"] > 0
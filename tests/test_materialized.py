@@ -0,0 +1,156 @@
+import base64
+import gzip
+import json
+import time
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+import lambda_function
+import materialize
+from shared.config import CINEMAS
+from shared.deadline import _timed_out_entry
+from shared.materialized import (
+    MaterializedResponse,
+    _decode_entry,
+    _encode_entry,
+    _get_materialized_response,
+    _put_materialized_responses,
+)
+
+NOW = 1_750_000_000.0
+QS = "cinemas=all&dates=2025-06-01&route_type=listings"
+
+
+@pytest.fixture
+def store(tmp_path):
+    with patch("shared.materialized.MATERIALIZED_STORE", str(tmp_path)):
+        yield str(tmp_path)
+
+
+def _entry(body=b'{"a": {}}', **kwargs):
+    kwargs.setdefault("generated_at", NOW)
+    return MaterializedResponse(body=body, **kwargs)
+
+
+# ===== Store =====
+
+def test_encode_decode_round_trip():
+    entry = _entry(
+        body=b"\x1f\x8b\nbinary\n",
+        content_encoding="gzip",
+        headers={"X-Listings-Version": "v1"},
+        expires_at=NOW + 3600,
+    )
+    assert _decode_entry(_encode_entry(entry)) == entry
+
+
+def test_put_then_get_from_local_store(store):
+    _put_materialized_responses({QS: _entry()}, store)
+
+    assert _get_materialized_response(QS, now=NOW + 1) == _entry()
+    assert _get_materialized_response("cinemas=all&dates=2025-06-02", now=NOW) is None
+
+
+def test_disabled_store_is_always_a_miss(tmp_path):
+    _put_materialized_responses({QS: _entry()}, str(tmp_path))
+    with patch("shared.materialized.MATERIALIZED_STORE", ""):
+        assert _get_materialized_response(QS, now=NOW) is None
+
+
+def test_missing_index_is_a_miss(store):
+    assert _get_materialized_response(QS, now=NOW) is None
+
+
+def test_stale_and_expiring_entries_are_misses(store):
+    with patch("shared.materialized.MATERIALIZED_MAX_AGE_SECONDS", 900), patch(
+        "shared.materialized.MATERIALIZED_MIN_VALIDITY_SECONDS", 300
+    ):
+        _put_materialized_responses(
+            {QS: _entry(), "expiring": _entry(expires_at=NOW + 400)}, store
+        )
+        assert _get_materialized_response(QS, now=NOW + 901) is None
+        assert _get_materialized_response("expiring", now=NOW + 50) is not None
+        assert _get_materialized_response("expiring", now=NOW + 150) is None
+
+
+# ===== lambda_handler =====
+
+def _event(headers=None):
+    return {
+        "httpMethod": "GET",
+        "queryStringParameters": {"route_type": "listings", "cinemas": "all", "dates": "2025-06-01"},
+        "headers": headers or {},
+    }
+
+
+@patch("lambda_function.get_listings")
+def test_lambda_serves_materialized_hit_without_running_pipeline(mock_listings, store):
+    body = json.dumps({"cinema_a": {"Film": {}}}).encode()
+    _put_materialized_responses(
+        {
+            QS: MaterializedResponse(
+                body=gzip.compress(body),
+                content_encoding="gzip",
+                headers={"X-Listings-Version": "cinema_a:abc"},
+                generated_at=time.time(),
+            )
+        },
+        store,
+    )
+
+    gzipped = lambda_function.lambda_handler(_event({"Accept-Encoding": "gzip"}), None)
+    plain = lambda_function.lambda_handler(_event(), None)
+
+    mock_listings.assert_not_called()
+    assert gzipped["headers"]["Content-Encoding"] == "gzip"
+    assert gzip.decompress(base64.b64decode(gzipped["body"])) == body
+    assert gzipped["headers"]["X-Listings-Version"] == "cinema_a:abc"
+    assert "Content-Encoding" not in plain["headers"]
+    assert plain["body"] == body.decode()
+
+
+@patch("lambda_function.get_listings_version", return_value="")
+@patch("lambda_function.get_listings", return_value={})
+def test_lambda_runs_pipeline_on_miss(mock_listings, _mock_version, store):
+    response = lambda_function.lambda_handler(_event(), None)
+
+    mock_listings.assert_called_once()
+    assert response["statusCode"] == 200
+
+
+# ===== materialize.py =====
+
+def test_hot_queries_cover_both_routes_and_three_date_sets():
+    queries = materialize.hot_queries(date(2025, 6, 1))
+
+    assert len(queries) == 6
+    assert {route for route, _ in queries} == {"listings", "visual_listings"}
+    assert ("listings", ["2025-06-02"]) in queries
+
+
+@patch("materialize.get_image_listings", return_value={"cinema_a": {}})
+@patch("materialize.get_listings", return_value={"cinema_a": {}})
+@patch("materialize.get_listings_version", return_value="cinema_a:abc")
+def test_materialize_writes_entries_the_lambda_looks_up(_v, mock_listings, _i, store):
+    sizes = materialize.materialize(date(2025, 6, 1), store)
+
+    assert len(sizes) == 6
+    mock_listings.assert_any_call(sorted(set(CINEMAS)), ["2025-06-01"])
+    entry = _get_materialized_response(QS)
+    assert entry.content_encoding == "gzip"
+    assert json.loads(gzip.decompress(entry.body)) == {"cinema_a": {}}
+    assert entry.headers["X-Listings-Version"] == "cinema_a:abc"
+    assert _get_materialized_response(
+        "cinemas=all&from=2025-06-01&route_type=visual_listings&to=2025-06-07"
+    ).expires_at is not None
+
+
+@patch("materialize.get_image_listings", return_value={"cinema_a": {}})
+@patch("materialize.get_listings", return_value={"cinema_a": _timed_out_entry("slow")})
+@patch("materialize.get_listings_version", return_value="")
+def test_materialize_skips_partial_responses(_v, _l, _i, store):
+    sizes = materialize.materialize(date(2025, 6, 1), store)
+
+    assert sizes and not any("route_type=listings" in qs for qs in sizes)
@@ -0,0 +1,95 @@
+"""
+Peak-memory regression budgets per route, at a fixed synthetic data size
+(13 cinemas x 40 films x 14 days, via load_test's LocalS3). Each request is
+measured warm — cached snapshots are not counted, only what the request
+itself allocates, including serialization.
+"""
+import contextlib
+import os
+import tracemalloc
+
+import pytest
+
+import lambda_function
+from load_test import LocalS3, build_dataset, local_s3_installed
+
+# KB; ~1.3x the measured peak when the budgets were set
+PEAK_MEMORY_BUDGET_KB = {
+    "listings": 5500,
+    "visual_listings": 4500,
+    "pan_cinema_all": 1400,
+    "pan_cinema_id": 400,
+}
+
+
+@pytest.fixture(scope="module")
+def local_s3():
+    s3 = LocalS3()
+    dataset = build_dataset(s3, films_per_cinema=40, days=14, seed=0)
+    return s3, dataset
+
+
+def _event(qs):
+    return {"httpMethod": "GET", "queryStringParameters": qs}
+
+
+def _route_events(dataset):
+    week = ",".join(dataset["dates"][:7])
+    return {
+        "listings": _event({"route_type": "listings", "cinemas": "all", "dates": week}),
+        "visual_listings": _event(
+            {"route_type": "visual_listings", "cinemas": "all", "dates": week}
+        ),
+        "pan_cinema_all": _event({"route_type": "pan_cinema_listings"}),
+        "pan_cinema_id": _event(
+            {"route_type": "pan_cinema_listings", "id": dataset["film_ids"][0]}
+        ),
+    }
+
+
+def _warm_peak_kb(event) -> tuple[int, dict]:
+    lambda_function.lambda_handler(event, None)  # fill caches
+    tracemalloc.start()
+    try:
+        response = lambda_function.lambda_handler(event, None)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak // 1024, response
+
+
+@pytest.mark.parametrize("route", sorted(PEAK_MEMORY_BUDGET_KB))
+def test_route_peak_memory_within_budget(local_s3, route):
+    s3, dataset = local_s3
+    event = _route_events(dataset)[route]
+
+    with local_s3_installed(s3), open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            peak_kb, response = _warm_peak_kb(event)
+
+    assert response["statusCode"] == 200
+    assert peak_kb <= PEAK_MEMORY_BUDGET_KB[route], (
+        f"{route} peaked at {peak_kb}KB, budget {PEAK_MEMORY_BUDGET_KB[route]}KB"
+    )
+
+
+def test_memory_profile_records_each_stage(local_s3):
+    from shared.memory_profile import memory_profile
+
+    s3, dataset = local_s3
+
+    with local_s3_installed(s3), open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull):
+            with memory_profile("visual_listings", enabled=True) as stages:
+                lambda_function.get_image_listings(
+                    lambda_function.CINEMAS, dataset["dates"][:7]
+                )
+
+    assert [s["stage"] for s in stages] == [
+        "load_listings",
+        "filter_dates",
+        "load_images",
+        "match_images",
+        "redact",
+    ]
+    assert all(s["peak_kb"] >= 0 for s in stages)
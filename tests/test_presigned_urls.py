@@ -0,0 +1,80 @@
+from unittest.mock import patch
+
+from shared.config import PRESIGNED_URL_WINDOW_SECONDS, PRESIGNED_URL_GRACE_SECONDS
+from shared.presigned_urls import (
+    _get_presigned_url,
+    _presign_window,
+    _presigned_urls_valid_for,
+    _presigned_url_cache,
+)
+
+WINDOW_START = 1_700_000_000 - 1_700_000_000 % PRESIGNED_URL_WINDOW_SECONDS
+
+
+# ===== _presign_window / _presigned_urls_valid_for =====
+
+def test_presign_window_is_aligned():
+    start, end = _presign_window(WINDOW_START + 17)
+    assert start == WINDOW_START
+    assert end == WINDOW_START + PRESIGNED_URL_WINDOW_SECONDS
+
+
+def test_presigned_urls_valid_for_includes_grace():
+    now = WINDOW_START + PRESIGNED_URL_WINDOW_SECONDS - 1
+    assert _presigned_urls_valid_for(now) == PRESIGNED_URL_GRACE_SECONDS + 1
+
+
+# ===== _get_presigned_url =====
+
+@patch("shared.presigned_urls._generate_presigned_url")
+def test_get_presigned_url_reuses_url_within_window(mock_presign):
+    mock_presign.side_effect = ["http://first", "http://second"]
+
+    first = _get_presigned_url("s3", "bucket", "key.jpg", now=WINDOW_START + 1)
+    second = _get_presigned_url("s3", "bucket", "key.jpg", now=WINDOW_START + 100)
+
+    assert first == second == "http://first"
+    assert mock_presign.call_count == 1
+
+
+@patch("shared.presigned_urls._generate_presigned_url")
+def test_get_presigned_url_expires_after_window_plus_grace(mock_presign):
+    mock_presign.return_value = "http://url"
+
+    _get_presigned_url("s3", "bucket", "key.jpg", now=WINDOW_START + 100)
+
+    expires_in = mock_presign.call_args.kwargs["expires_in"]
+    assert expires_in == PRESIGNED_URL_WINDOW_SECONDS + PRESIGNED_URL_GRACE_SECONDS - 100
+
+
+@patch("shared.presigned_urls._generate_presigned_url")
+def test_get_presigned_url_reissues_in_next_window(mock_presign):
+    mock_presign.side_effect = ["http://first", "http://second"]
+
+    _get_presigned_url("s3", "bucket", "key.jpg", now=WINDOW_START + 1)
+    result = _get_presigned_url(
+        "s3", "bucket", "key.jpg", now=WINDOW_START + PRESIGNED_URL_WINDOW_SECONDS
+    )
+
+    assert result == "http://second"
+
+
+@patch("shared.presigned_urls._generate_presigned_url")
+def test_get_presigned_url_does_not_cache_failures(mock_presign):
+    mock_presign.side_effect = [None, "http://url"]
+
+    assert _get_presigned_url("s3", "bucket", "key.jpg", now=WINDOW_START) is None
+    assert _get_presigned_url("s3", "bucket", "key.jpg", now=WINDOW_START) == "http://url"
+
+
+@patch("shared.presigned_urls.PRESIGNED_URL_CACHE_MAX_ENTRIES", 2)
+@patch("shared.presigned_urls._generate_presigned_url")
+def test_get_presigned_url_evicts_least_recently_used(mock_presign):
+    mock_presign.side_effect = lambda s3, bucket, key, expires_in: f"http://{key}"
+
+    _get_presigned_url("s3", "bucket", "a", now=WINDOW_START)
+    _get_presigned_url("s3", "bucket", "b", now=WINDOW_START)
+    _get_presigned_url("s3", "bucket", "a", now=WINDOW_START)  # a is now most recent
+    _get_presigned_url("s3", "bucket", "c", now=WINDOW_START)
+
+    assert list(_presigned_url_cache) == [("bucket", "a"), ("bucket", "c")]
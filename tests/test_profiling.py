@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+import lambda_function
+from shared.profiling import sampled_profile
+
+
+def _handler(event, context):
+    return sum(i * i for i in range(1000))
+
+
+def test_sampling_off_returns_handler_undecorated():
+    assert sampled_profile(_handler, sample_rate=0) is _handler
+
+
+def test_lambda_handler_is_undecorated_by_default():
+    assert not hasattr(lambda_function.lambda_handler, "__wrapped__")
+
+
+def test_sampled_invocation_logs_top_functions(capsys):
+    profiled = sampled_profile(_handler, sample_rate=1.0, top_n=3, save_dir="")
+
+    assert profiled({}, None) == _handler({}, None)
+
+    out = capsys.readouterr().out
+    assert "Profile of _handler" in out
+    assert len([line for line in out.splitlines() if " cum " in line]) == 3
+    assert "test_profiling.py" in out
+
+
+def test_unsampled_invocation_is_not_profiled(capsys):
+    profiled = sampled_profile(_handler, sample_rate=0.5, save_dir="")
+
+    with patch("shared.profiling.random.random", return_value=0.9):
+        profiled({}, None)
+
+    assert "Profile of" not in capsys.readouterr().out
+
+
+def test_sampled_invocation_saves_full_stats(tmp_path):
+    import pstats
+
+    class Context:
+        aws_request_id = "req-1"
+
+    profiled = sampled_profile(sample_rate=1.0, save_dir=str(tmp_path))(_handler)
+    profiled({}, Context())
+
+    (saved,) = tmp_path.glob("profile-*-req-1.pstats")
+    assert pstats.Stats(str(saved)).total_calls > 0
+
+
+def test_profile_is_reported_when_handler_raises(capsys):
+    def _failing(event, context):
+        raise RuntimeError("boom")
+
+    profiled = sampled_profile(_failing, sample_rate=1.0, save_dir="")
+    try:
+        profiled({}, None)
+    except RuntimeError:
+        pass
+
+    assert "Profile of _failing" in capsys.readouterr().out
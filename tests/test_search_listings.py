@@ -0,0 +1,130 @@
+from unittest.mock import patch
+
+from routes.search_listings import search_listings
+from routes.search_listings.utils import (
+    _build_search_index,
+    _get_search_index,
+    _search_index,
+    _tokenize,
+)
+from shared.data_types import DateRange
+
+
+def _listing(date="2024-01-15", directors=None, cast=None):
+    return {
+        "url": "http://example.com",
+        "isImageGood": True,
+        "when": [{"date": date, "showtimes": ["18:00"]}],
+        "_additional_info": {"directors": directors or [], "cast": cast or []},
+    }
+
+
+BFI = {
+    "Kung Fu Panda": _listing(directors=["Mark Osborne"], cast=["Jack Black"]),
+    "Kung Fu Hustle": _listing(date="2024-01-16", directors=["Stephen Chow"]),
+    "School of Rock": _listing(directors=["Richard Linklater"], cast=["Jack Black"]),
+    "Black Narcissus": _listing(directors=["Michael Powell"]),
+}
+
+
+# ===== index =====
+
+def test_tokenize_normalizes_text():
+    assert _tokenize("Kung-Fu: Panda!") == ["kung", "fu", "panda"]
+    assert _tokenize(None) == []
+
+
+def test_build_search_index_keeps_highest_field_weight():
+    index = _build_search_index(BFI)
+    # "black" is a title token of Black Narcissus, a cast token elsewhere
+    assert index.postings["black"]["Black Narcissus"] == 3.0
+    assert index.postings["black"]["School of Rock"] == 1.0
+    assert index.tokens == sorted(index.postings)
+
+
+def test_get_search_index_is_built_once_per_snapshot():
+    with patch(
+        "routes.search_listings.utils._build_search_index", wraps=_build_search_index
+    ) as mock_build:
+        _get_search_index(BFI)
+        _get_search_index(BFI)
+        _get_search_index(dict(BFI))
+    assert mock_build.call_count == 2
+
+
+# ===== _search_index =====
+
+def test_search_requires_every_token():
+    scores = _search_index(_build_search_index(BFI), "kung fu panda")
+    assert set(scores) == {"Kung Fu Panda"}
+
+
+def test_search_last_token_matches_as_prefix():
+    scores = _search_index(_build_search_index(BFI), "kung fu pa")
+    assert set(scores) == {"Kung Fu Panda"}
+
+
+def test_search_ranks_exact_title_above_people():
+    scores = _search_index(_build_search_index(BFI), "black")
+    ranked = sorted(scores, key=lambda t: -scores[t])
+    assert ranked[0] == "Black Narcissus"
+    assert set(ranked) == {"Black Narcissus", "Kung Fu Panda", "School of Rock"}
+
+
+def test_search_empty_query_matches_nothing():
+    assert _search_index(_build_search_index(BFI), "  !! ") == {}
+
+
+# ===== search_listings =====
+
+@patch("routes.search_listings._get_cinemas_raw_listings")
+def test_search_listings_ranks_across_cinemas(mock_raw):
+    mock_raw.return_value = {
+        "bfi_southbank": BFI,
+        "rio": {"Kung Fu Panda": _listing()},
+        "barbican": {"error": "No active listings found for barbican"},
+    }
+
+    result = search_listings("kung fu", ["barbican", "bfi_southbank", "rio"])
+
+    assert result["query"] == "kung fu"
+    assert [(r["title"], r["cinema"]) for r in result["results"]] == [
+        ("Kung Fu Hustle", "bfi_southbank"),
+        ("Kung Fu Panda", "bfi_southbank"),
+        ("Kung Fu Panda", "rio"),
+    ]
+    assert "isImageGood" not in result["results"][0]["listing"]
+    assert result["failed_cinemas"] == ["barbican"]
+
+
+@patch("routes.search_listings._get_cinemas_raw_listings")
+def test_search_listings_filters_by_dates(mock_raw):
+    mock_raw.return_value = {"bfi_southbank": BFI}
+
+    result = search_listings(
+        "kung fu", ["bfi_southbank"], DateRange("2024-01-16", "2024-01-20")
+    )
+
+    assert [r["title"] for r in result["results"]] == ["Kung Fu Hustle"]
+
+
+@patch("routes.search_listings._get_cinemas_raw_listings")
+def test_search_listings_date_filter_adds_no_derived_indexes(mock_raw):
+    from shared.snapshot_cache import _derived
+
+    mock_raw.return_value = {"bfi_southbank": BFI}
+
+    for dates in (DateRange("2024-01-15", "2024-01-20"), ["2024-01-16"]):
+        search_listings("kung fu", ["bfi_southbank"], dates)
+
+    assert [name for _, name in _derived] == ["search_index"]
+
+
+@patch("routes.search_listings._get_cinemas_raw_listings")
+def test_search_listings_applies_fields_and_limit(mock_raw):
+    mock_raw.return_value = {"bfi_southbank": BFI}
+
+    result = search_listings("kung", ["bfi_southbank"], fields=("url",), limit=1)
+
+    assert len(result["results"]) == 1
+    assert result["results"][0]["listing"] == {"url": "http://example.com"}
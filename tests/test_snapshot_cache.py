@@ -0,0 +1,280 @@
+import gc
+import weakref
+from threading import Event
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from shared.snapshot_cache import (
+    Snapshot,
+    _get_snapshot,
+    _get_derived,
+    _get_snapshot_history,
+    _wait_for_background_refreshes,
+)
+
+
+# ===== _get_snapshot =====
+
+def test_get_snapshot_calls_loader_once_within_ttl():
+    loader = MagicMock(return_value=Snapshot(data={"a": 1}))
+
+    first = _get_snapshot("key", loader, ttl_seconds=60)
+    second = _get_snapshot("key", loader, ttl_seconds=60)
+
+    assert first is second
+    loader.assert_called_once()
+
+
+def test_get_snapshot_reloads_after_ttl_and_staleness():
+    loader = MagicMock(side_effect=[Snapshot(data=1), Snapshot(data=2)])
+
+    _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=0)
+    result = _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=0)
+
+    assert result.data == 2
+
+
+def test_get_snapshot_serves_stale_while_refreshing_in_background():
+    refreshed = Event()
+
+    def _slow_refresh():
+        refreshed.wait(5)
+        return Snapshot(data=2)
+
+    loader = MagicMock(return_value=Snapshot(data=1))
+    _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=60)
+
+    loader.side_effect = _slow_refresh
+    stale = _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=60)
+    assert stale.data == 1  # returned without waiting for the refresh
+
+    refreshed.set()
+    _wait_for_background_refreshes(5)
+    assert _get_snapshot("key", loader, ttl_seconds=60).data == 2
+
+
+def test_get_snapshot_starts_one_background_refresh_per_key():
+    release = Event()
+    loader = MagicMock(return_value=Snapshot(data=1))
+    _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=60)
+
+    def _blocked_refresh():
+        release.wait(5)
+        return Snapshot(data=2)
+
+    loader.side_effect = _blocked_refresh
+    for _ in range(5):
+        _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=60)
+    release.set()
+    _wait_for_background_refreshes(5)
+
+    assert loader.call_count == 2  # initial load + one refresh
+
+
+def test_get_snapshot_keeps_stale_data_when_background_refresh_fails():
+    loader = MagicMock(return_value=Snapshot(data=1))
+    _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=60)
+
+    loader.side_effect = Exception("S3 down")
+    _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=60)
+    _wait_for_background_refreshes(5)
+
+    assert _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=60).data == 1
+
+
+def test_get_snapshot_backs_off_after_failure():
+    loader = MagicMock(side_effect=[Exception("boom"), Snapshot(data=1)])
+
+    with pytest.raises(Exception):
+        _get_snapshot("key", loader, ttl_seconds=60)
+    with pytest.raises(Exception, match="boom"):
+        _get_snapshot("key", loader, ttl_seconds=60)
+
+    assert loader.call_count == 1
+
+
+@patch("shared.snapshot_cache.SNAPSHOT_ERROR_BACKOFF_SECONDS", 0)
+def test_get_snapshot_retries_once_backoff_has_passed():
+    loader = MagicMock(side_effect=[Exception("boom"), Snapshot(data=1)])
+
+    with pytest.raises(Exception):
+        _get_snapshot("key", loader, ttl_seconds=60)
+
+    assert _get_snapshot("key", loader, ttl_seconds=60).data == 1
+
+
+@patch("shared.snapshot_cache.SNAPSHOT_ERROR_BACKOFF_MAX_SECONDS", 100)
+@patch("shared.snapshot_cache.SNAPSHOT_ERROR_BACKOFF_SECONDS", 10)
+@patch("shared.snapshot_cache.time.monotonic")
+def test_get_snapshot_backoff_grows_exponentially_up_to_max(mock_monotonic):
+    from shared.snapshot_cache import _failures
+
+    loader = MagicMock(side_effect=Exception("boom"))
+    retry_delays = []
+    now = 1000.0
+    for _ in range(5):
+        mock_monotonic.return_value = now
+        with pytest.raises(Exception):
+            _get_snapshot("key", loader, ttl_seconds=60)
+        retry_delays.append(_failures["key"][1] - now)
+        now = _failures["key"][1]
+
+    assert retry_delays == [10, 20, 40, 80, 100]
+
+
+class _NoSuchKey(Exception):
+    response = {"Error": {"Code": "NoSuchKey"}}
+
+
+@patch("shared.snapshot_cache.SNAPSHOT_MISSING_TTL_SECONDS", 30)
+@patch("shared.snapshot_cache.SNAPSHOT_ERROR_BACKOFF_SECONDS", 10)
+@patch("shared.snapshot_cache.time.monotonic")
+def test_get_snapshot_negatively_caches_missing_keys_for_flat_ttl(mock_monotonic):
+    from shared.snapshot_cache import _failures
+
+    loader = MagicMock(side_effect=_NoSuchKey("missing"))
+    mock_monotonic.return_value = 1000.0
+    for _ in range(3):
+        with pytest.raises(_NoSuchKey):
+            _get_snapshot("key", loader, ttl_seconds=60)
+        assert _failures["key"][1] - mock_monotonic.return_value == 30
+        mock_monotonic.return_value = _failures["key"][1] - 1
+        with pytest.raises(_NoSuchKey):
+            _get_snapshot("key", loader, ttl_seconds=60)
+        mock_monotonic.return_value += 1
+
+    assert loader.call_count == 3
+
+
+def test_get_snapshot_cached_failure_traceback_does_not_grow():
+    loader = MagicMock(side_effect=_NoSuchKey("missing"))
+    depths = []
+    for _ in range(200):
+        with pytest.raises(_NoSuchKey) as excinfo:
+            _get_snapshot("key", loader, ttl_seconds=60)
+        depth, tb = 0, excinfo.value.__traceback__
+        while tb is not None:
+            depth, tb = depth + 1, tb.tb_next
+        depths.append(depth)
+
+    assert loader.call_count == 1
+    assert max(depths[1:]) == min(depths[1:]) <= depths[0]
+
+
+# ===== snapshot history =====
+
+def test_get_snapshot_history_keeps_recent_versions(monkeypatch):
+    monkeypatch.setattr("shared.snapshot_cache.SNAPSHOT_HISTORY_SIZE", 2)
+    loader = MagicMock(
+        side_effect=[Snapshot(data=i, etag=f'"v{i}"') for i in range(3)]
+    )
+
+    for _ in range(3):
+        _get_snapshot(
+            "key", loader, ttl_seconds=0, max_stale_seconds=0, keep_history=True
+        )
+
+    assert _get_snapshot_history("key") == {'"v1"': 1, '"v2"': 2}
+
+
+def test_get_snapshot_keeps_no_history_unless_asked():
+    loader = MagicMock(
+        side_effect=[Snapshot(data=i, etag=f'"v{i}"') for i in range(3)]
+    )
+
+    for _ in range(3):
+        _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=0)
+
+    assert _get_snapshot_history("key") == {}
+
+
+def test_get_snapshot_keeps_data_when_etag_unchanged():
+    first_data, second_data = {"a": 1}, {"a": 1}
+    loader = MagicMock(
+        side_effect=[
+            Snapshot(data=first_data, etag='"v1"'),
+            Snapshot(data=second_data, etag='"v1"'),
+        ]
+    )
+
+    _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=0)
+    result = _get_snapshot("key", loader, ttl_seconds=0, max_stale_seconds=0)
+
+    assert result.data is first_data
+
+
+# ===== _get_derived =====
+
+def test_get_derived_builds_once_per_object():
+    builder = MagicMock(side_effect=lambda obj: len(obj))
+    data = {"a": 1}
+
+    assert _get_derived(data, "size", builder) == 1
+    assert _get_derived(data, "size", builder) == 1
+    builder.assert_called_once()
+
+
+def test_get_derived_rebuilds_for_new_object():
+    builder = MagicMock(side_effect=lambda obj: len(obj))
+
+    _get_derived({"a": 1}, "size", builder)
+    _get_derived({"a": 1, "b": 2}, "size", builder)
+
+    assert builder.call_count == 2
+
+
+@patch("shared.snapshot_cache._DERIVED_MAX_ENTRIES", 1)
+def test_get_derived_is_bounded():
+    from shared.snapshot_cache import _derived
+
+    _get_derived([1], "size", len)
+    _get_derived([1, 2], "size", len)
+
+    assert len(_derived) == 1
+
+
+class _Data(dict):
+    """dict that can be weakly referenced."""
+
+
+def test_replaced_snapshot_and_its_derived_values_can_be_freed():
+    old = _Data(a=_Data(b=1))
+    _get_snapshot("key", lambda data=old: Snapshot(data=data, etag="1"), ttl_seconds=0)
+    # derived from the data, from one of its values, and from a derived value
+    parsed = _get_derived(old["a"], "parsed", lambda d: _Data(d))
+    _get_derived(parsed, "size", len)
+    _get_derived(old, "size", len)
+    old_ref, parsed_ref = weakref.ref(old), weakref.ref(parsed)
+    del old, parsed
+
+    _get_snapshot(
+        "key", lambda: Snapshot(data={}, etag="2"), ttl_seconds=0, max_stale_seconds=0
+    )
+    gc.collect()
+
+    assert old_ref() is None
+    assert parsed_ref() is None
+
+
+def test_share_unchanged_values_keeps_derived_values_of_unchanged_keys():
+    first = {"rio": {"Film": 1}, "bfi": {"Film": 2}}
+    _get_snapshot("key", lambda: Snapshot(data=first, etag="1"), ttl_seconds=0)
+    rio, bfi = first["rio"], first["bfi"]
+    builder = MagicMock(side_effect=len)
+    _get_derived(rio, "size", builder)
+    _get_derived(bfi, "size", builder)
+
+    reloaded = _get_snapshot(
+        "key",
+        lambda: Snapshot(data={"rio": {"Film": 1}, "bfi": {"Film": 3}}, etag="2"),
+        ttl_seconds=0,
+        max_stale_seconds=0,
+        share_unchanged_values=True,
+    )
+
+    assert reloaded.data["rio"] is rio
+    assert reloaded.data["bfi"] == {"Film": 3}
+    _get_derived(reloaded.data["rio"], "size", builder)
+    _get_derived(reloaded.data["bfi"], "size", builder)
+    assert builder.call_count == 3  # only bfi's was rebuilt